@@ -0,0 +1,106 @@
+import bisect
+import heapq
+import itertools
+import threading
+
+from enums import Priority
+
+# Unprioritized actions sort after LOW
+_RANKS = {Priority.HIGH: 0, Priority.MEDIUM: 1, Priority.LOW: 2}
+_UNRANKED = len(_RANKS)
+
+
+def priority_rank(priority):
+    return _RANKS.get(priority, _UNRANKED)
+
+
+class ActionIndex:
+    """
+    Actions keyed by (assigned_to_role, status), split by priority.
+    Each bucket is a list of (order, action id) kept sorted in timeline
+    order: newest note first, a note's actions in the order they were
+    added. An action keeps its place when it moves bucket (e.g. on
+    resolve). Queries merge buckets, so a queue is read in O(results).
+    """
+
+    def __init__(self):
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._buckets = {} # key -> sorted [(order, action id)]
+            self._entries = {} # action id -> (action, note, key, order)
+            self._note_seqs = {} # note id -> seq of its first indexed action
+
+    def add(self, action, note):
+        """Indexes an action (or re-indexes it after a status/assignee change)."""
+        with self._lock:
+            entry = self._entries.get(action.id)
+            if entry is not None:
+                order = entry[3]
+                self._discard_locked(action.id)
+            else:
+                note_seq = self._note_seqs.setdefault(note.id, next(self._seq))
+                order = (-note_seq, next(self._seq))
+            key = (action.assigned_to_role, action.status, priority_rank(action.priority))
+            bisect.insort(self._buckets.setdefault(key, []), (order, action.id))
+            self._entries[action.id] = (action, note, key, order)
+
+    def update(self, action):
+        with self._lock:
+            entry = self._entries.get(action.id)
+        if entry is not None:
+            self.add(action, entry[1])
+
+    def remove(self, action_id):
+        with self._lock:
+            self._discard_locked(action_id)
+
+    def _discard_locked(self, action_id):
+        entry = self._entries.pop(action_id, None)
+        if entry is None:
+            return
+        bucket = self._buckets.get(entry[2])
+        if bucket is not None:
+            i = bisect.bisect_left(bucket, (entry[3], action_id))
+            if i < len(bucket) and bucket[i][1] == action_id:
+                del bucket[i]
+            if not bucket:
+                del self._buckets[entry[2]]
+
+    def get(self, action_id):
+        """Returns (action, note) or None."""
+        with self._lock:
+            entry = self._entries.get(action_id)
+        return entry[:2] if entry else None
+
+    def query(self, roles, statuses, limit=None, tag=None, by_priority=True):
+        """
+        Returns up to `limit` actions assigned to any of `roles` with any of
+        `statuses`, in timeline order (newest note first, a note's actions
+        in their stored order); with by_priority, grouped by priority
+        (high first) before that.
+        """
+        ranks = [[rank] for rank in range(_UNRANKED + 1)] if by_priority else [range(_UNRANKED + 1)]
+        results = []
+        with self._lock:
+            entries = self._entries
+            for group in ranks:
+                buckets = [self._buckets.get((role, status, rank))
+                           for rank in group for role in roles for status in statuses]
+                streams = [b for b in buckets if b]
+                if not streams:
+                    continue
+                for _, action_id in heapq.merge(*streams):
+                    action = entries[action_id][0]
+                    if tag is not None and tag not in (action.tags or ()):
+                        continue
+                    results.append(action)
+                    if limit is not None and len(results) >= limit:
+                        return results
+        return results
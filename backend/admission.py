@@ -0,0 +1,134 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from llm_client import TokenBucket
+
+# --- Admission Control ---
+# Requests are admitted into lanes before they run. A lane lets `limit`
+# requests run at once and up to `queue` more wait (at most `wait`
+# seconds) for a slot; anything beyond that is refused at once with a
+# Retry-After estimate, instead of tying up a worker. Separate lanes for
+# LLM-bound and read routes keep a burst of one from starving the other.
+# LLM-bound requests are also rate limited per client (token bucket per
+# role + client id).
+
+ASYNC_POLL_SECONDS = 0.01
+
+
+class Rejected(Exception):
+    """Admission refused; retry after `retry_after` seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A lane slot; release() (idempotent) when the response is done."""
+    __slots__ = ('_lane', '_start', '_released')
+
+    def __init__(self, lane):
+        self._lane = lane
+        self._start = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._lane._leave(time.monotonic() - self._start)
+
+
+class Lane:
+
+    def __init__(self, name, limit, queue=0, wait=0.0):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.wait = wait
+        self.in_flight = 0
+        self.waiting = 0
+        self._service = 0.1 # Moving average of slot hold time (seconds)
+        self._cond = threading.Condition()
+
+    def retry_after(self):
+        """Seconds until the queue ahead has likely drained (at least 1)."""
+        return max(1, math.ceil(self._service * (self.waiting + 1) / max(self.limit, 1)))
+
+    def _try_enter_locked(self):
+        if self.in_flight < self.limit:
+            self.in_flight += 1
+            return True
+        return False
+
+    def _reject(self, reason):
+        return Rejected(f"{self.name} lane {reason}", self.retry_after())
+
+    def enter(self):
+        """Takes a slot, waiting in the queue if there is room. Raises Rejected."""
+        with self._cond:
+            if self._try_enter_locked():
+                return Ticket(self)
+            if self.waiting >= self.queue:
+                raise self._reject("queue full")
+            self.waiting += 1
+            try:
+                if not self._cond.wait_for(self._try_enter_locked, timeout=self.wait):
+                    raise self._reject("wait timed out")
+            finally:
+                self.waiting -= 1
+        return Ticket(self)
+
+    async def enter_async(self):
+        """enter() for event loops: queued requests poll instead of blocking the loop."""
+        with self._cond:
+            if self._try_enter_locked():
+                return Ticket(self)
+            if self.waiting >= self.queue:
+                raise self._reject("queue full")
+            self.waiting += 1
+        try:
+            deadline = time.monotonic() + self.wait
+            while True:
+                await asyncio.sleep(ASYNC_POLL_SECONDS)
+                with self._cond:
+                    if self._try_enter_locked():
+                        return Ticket(self)
+                    if time.monotonic() >= deadline:
+                        raise self._reject("wait timed out")
+        finally:
+            with self._cond:
+                self.waiting -= 1
+
+    def _leave(self, held):
+        with self._cond:
+            self.in_flight -= 1
+            self._service = 0.8 * self._service + 0.2 * held
+            self._cond.notify()
+
+
+class ClientLimiter:
+    """Token bucket per client key; the least recently seen keys are dropped past max_clients."""
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key):
+        """Takes a token for the client. Raises Rejected when it has none left."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+        wait = bucket.take()
+        if wait:
+            raise Rejected("client rate limit exceeded", max(1, math.ceil(wait)))
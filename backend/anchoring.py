@@ -0,0 +1,106 @@
+# --- Highlight Anchoring ---
+# Keeps highlight offsets pointing at their text when a note's content
+# changes. An edit is reduced to the single region between the common
+# prefix and suffix of the old and new content. These are scanned with
+# C-speed slice compares over doubling blocks, then halving ones inside
+# the block that differs, so the characters compared are linear in the
+# prefix/suffix length. Highlights before the region keep their offsets,
+# highlights after it shift by the length change, and highlights the edit
+# touched are re-found at the occurrence of their text nearest their old
+# position. Highlights whose text is gone are orphaned.
+
+
+# First block compared (a power of two)
+SCAN_BLOCK = 64
+
+
+def _common_prefix(a, b):
+    n = min(len(a), len(b))
+    i, block = 0, SCAN_BLOCK
+    while i + block <= n and a[i:i + block] == b[i:i + block]: # Gallop
+        i += block
+        block *= 2
+    while block > 1: # The first difference (or the end) is in a[i:i + block]
+        block //= 2
+        if i + block <= n and a[i:i + block] == b[i:i + block]:
+            i += block
+    return i
+
+
+def _common_suffix(a, b, limit):
+    """Length of the common suffix of a and b, at most `limit`."""
+    la, lb = len(a), len(b)
+    k, block = 0, SCAN_BLOCK
+    while k + block <= limit and a[la - k - block:la - k] == b[lb - k - block:lb - k]:
+        k += block
+        block *= 2
+    while block > 1:
+        block //= 2
+        if k + block <= limit and a[la - k - block:la - k] == b[lb - k - block:lb - k]:
+            k += block
+    return k
+
+
+def edit_region(old, new):
+    """
+    (start, old_end, new_end): old[start:old_end] was replaced by
+    new[start:new_end]; everything outside is unchanged.
+    """
+    start = _common_prefix(old, new)
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - start)
+    return start, len(old) - suffix, len(new) - suffix
+
+
+def find_nearest(content, text, near):
+    """Start of the occurrence of `text` closest to offset `near`, or -1."""
+    if not text:
+        return -1
+    near = max(0, min(near, len(content)))
+    left = content.rfind(text, 0, near + len(text))
+    right = content.find(text, near)
+    if left == -1 or right == -1:
+        return max(left, right)
+    return left if near - left <= right - near else right
+
+
+def is_anchored(highlight, content):
+    start, end = highlight.start, highlight.end
+    return (isinstance(start, int) and isinstance(end, int) and 0 <= start <= end
+            and content[start:end] == highlight.text)
+
+
+def is_orphaned(highlight):
+    return bool(highlight.extra and highlight.extra.get('orphaned'))
+
+
+def reanchor(highlights, old, new):
+    """
+    Moves highlight offsets from `old` content to `new` in place. Returns
+    the highlights whose text could not be found (start/end set to -1,
+    flagged 'orphaned'); re-found ones lose the flag.
+    """
+    start, old_end, new_end = edit_region(old, new)
+    delta = new_end - old_end
+    orphaned = []
+    for h in highlights:
+        if not is_anchored(h, old):
+            # Stale offsets or already orphaned: nearest to wherever it was
+            hint = h.start if isinstance(h.start, int) and h.start >= 0 else 0
+            position = find_nearest(new, h.text, hint)
+        elif h.end <= start:
+            position = h.start
+        elif h.start >= old_end:
+            position = h.start + delta
+        else:
+            position = find_nearest(new, h.text, min(h.start, new_end))
+
+        if position == -1:
+            h.start = h.end = -1
+            h.extra = dict(h.extra or {}, orphaned=True)
+            orphaned.append(h)
+            continue
+        h.start, h.end = position, position + len(h.text)
+        if is_orphaned(h):
+            h.extra.pop('orphaned')
+            h.extra = h.extra or None
+    return orphaned
@@ -1,27 +1,237 @@
 import os
-import google.generativeai as genai
-from flask import Flask, jsonify, request, send_from_directory
+import threading
+import time
+IMPORT_STARTED = time.perf_counter() # Cold start (import to store ready) is measured from here
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, g, jsonify, request, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import datetime
-import uuid
-import copy
 import json
 import re
-from cryptography.fernet import Fernet
+import numpy as np
+from envelope import Keyring, read_keys
+from note_file import iter_notes, rotate_note_file
+from llm_client import DEFAULT_MODEL, LLMRequest, create_client, run_steps
+from extractor import LocalExtractor
+from highlight_model import HighlightPriorityModel
+from anchoring import edit_region, find_nearest, is_anchored, is_orphaned, reanchor
+from version_store import VersionStore
+from cold_store import ColdStore
+from response_cache import ResponseCache
+from glance_index import GlanceIndex
+from trace_recorder import TraceRecorder
+from admission import ClientLimiter, Lane, Rejected
+import metrics
+from profiler import format_folded, sample_stacks
+from search_index import SearchIndex, make_snippet
+from decay import (DEFAULT_DECAY_CURVE, SECONDS_PER_DAY, TimestampArray, decay_weights, get_decay_curve,
+                   now_epoch, parse_timestamp, rank_highlights)
+from enums import (OPEN_ACTION_STATUSES, ActionStatus, HighlightType, NoteType, Role,
+                   is_ai_note_type, label, scope_allows, scope_to_mask)
+from action_index import ActionIndex, priority_rank
+from models import (MISSING, Action, Highlight, Note, current_timestamp, format_timestamp,
+                    new_id, pack_id, timestamp_key, unpack_id)
 
 app = Flask(__name__, static_folder='../frontend')
 CORS(app)
 
-# --- Gemini Configuration ---
+# --- LLM Configuration ---
 # WARNING: In a real app, use environment variables!
 # You can set it via `export GEMINI_API_KEY=...` before running.
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+# gemini (default when a key is set) | fake (deterministic, offline) | none
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "gemini" if GEMINI_API_KEY else "none")
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", DEFAULT_MODEL)
 
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    print("Gemini configured.")
-else:
-    print("WARNING: GEMINI_API_KEY not set. AI features will fallback to basic simulation.")
+# Shared client: model reuse, rate limit, timeout, retries, circuit breaker
+llm = create_client(
+    LLM_PROVIDER, api_key=GEMINI_API_KEY, model=GEMINI_MODEL,
+    rate_limit=float(os.environ.get("LLM_RATE_LIMIT", 5)), # calls/sec, 0 = unlimited
+    burst=int(os.environ.get("LLM_BURST", 10)),
+    timeout=float(os.environ.get("LLM_TIMEOUT", 30)),
+    max_retries=int(os.environ.get("LLM_MAX_RETRIES", 2)),
+    fake_latency=float(os.environ.get("LLM_FAKE_LATENCY_MS", 0)) / 1000.0
+)
+
+# Post-response work (e.g. highlight/action extraction for streamed summaries)
+background_tasks = ThreadPoolExecutor(max_workers=int(os.environ.get("BACKGROUND_WORKERS", 2)),
+                                      thread_name_prefix="background")
+# How long a summary stream stays open waiting for extracted signals
+STREAM_SIGNALS_TIMEOUT = float(os.environ.get("STREAM_SIGNALS_TIMEOUT", 30))
+
+# Highlight/action extraction: tiered (local patterns, LLM only for notes the
+# local tier isn't confident about) | local (never call the LLM) | llm (always)
+EXTRACTION_MODE = os.environ.get("EXTRACTION_MODE", "tiered")
+if EXTRACTION_MODE not in ("tiered", "local", "llm"):
+    raise ValueError(f"Unknown EXTRACTION_MODE '{EXTRACTION_MODE}'. Options: tiered, local, llm")
+local_extractor = LocalExtractor()
+# Re-ranks AI highlights on the glance from user highlight feedback
+highlight_model = HighlightPriorityModel()
+
+# Relevance decay curve for the Glance View: hyperbolic | linear | exponential
+DECAY_CURVE = os.environ.get("DECAY_CURVE", DEFAULT_DECAY_CURVE)
+get_decay_curve(DECAY_CURVE) # Fail fast on typos
+
+# --- Instrumentation ---
+# Opt-in (METRICS_ENABLED=1): per-route latency histograms, per-phase time
+# (rbac, redaction, llm, extraction, serialize, copy, search), store gauges and LLM
+# counters on /metrics, plus the /debug/profile sampling profiler.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+metrics.configure(METRICS_ENABLED)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Counts JSON response encoding in the 'serialize' phase."""
+
+    def response(self, *args, **kwargs):
+        with metrics.phase('serialize'):
+            return super().response(*args, **kwargs)
+
+app.json = TimedJSONProvider(app)
+
+@app.before_request
+def start_request_metrics():
+    metrics.start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.end_request(route, request.method, response.status_code)
+    return response
+
+# --- Traffic Recording ---
+# Opt-in (TRACE_FILE=path): every API request is appended to a compact
+# trace (trace_recorder.py) that benchmarks/replay.py re-issues at 1x, 10x
+# or 100x speed. Query values pass through redact_phi and bodies are
+# reduced to their shape, so traces carry no note text or identifiers.
+TRACE_FILE = os.environ.get("TRACE_FILE")
+trace_recorder = TraceRecorder(TRACE_FILE, lambda value: redact_phi(value)) if TRACE_FILE else None # (defined below)
+
+@app.before_request
+def start_trace():
+    if trace_recorder is not None:
+        g.trace_started = time.perf_counter()
+
+@app.after_request
+def record_trace(response):
+    started = g.pop('trace_started', None)
+    if started is not None and request.url_rule is not None and request.url_rule.rule.startswith('/api/'):
+        data = request.get_json(silent=True) if request.is_json else None
+        trace_recorder.record(request.method, request.url_rule.rule, request.args, data,
+                              request.content_length or 0,
+                              -1 if response.is_streamed else (response.content_length or 0),
+                              response.status_code, time.perf_counter() - started)
+    return response
+
+# --- Readiness ---
+# create_app() loads the store on a background thread, so the server is up
+# before the data is. Until the load finishes /api/ready answers 503 and
+# every other API request gets 503 with Retry-After instead of a partial
+# store. (Nothing is loading until create_app() runs.)
+store_ready = threading.Event()
+store_ready.set()
+store_status = {"status": "ready"}
+STARTUP_ROUTES = {'index', 'static', 'get_metrics', 'readiness'}
+
+@app.before_request
+def wait_for_store():
+    if store_ready.is_set() or request.endpoint in STARTUP_ROUTES:
+        return None
+    return jsonify({"error": "Store is still loading"}), 503, {"Retry-After": "1"}
+
+# --- Admission Control ---
+# LLM-bound routes and reads are admitted through separate bounded lanes
+# (admission.py), so an LLM burst can't take every worker from /api/timeline
+# and friends. Overload gets an immediate 429 with Retry-After. LLM-bound
+# requests are also rate limited per role + client (X-Client-Id header, else
+# the remote address) when CLIENT_LLM_RATE is set.
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "1") == "1"
+LLM_ROUTES = {'create_note', 'end_consult', 'end_consult_stream'}
+UNGATED_READS = {'index', 'static', 'get_metrics', 'readiness'}
+lanes = {
+    'llm': Lane('llm', limit=int(os.environ.get("LLM_LANE_LIMIT", 8)),
+                queue=int(os.environ.get("LLM_LANE_QUEUE", 32)),
+                wait=float(os.environ.get("LLM_LANE_WAIT", 10))),
+    'read': Lane('read', limit=int(os.environ.get("READ_LANE_LIMIT", 32)),
+                 queue=int(os.environ.get("READ_LANE_QUEUE", 128)),
+                 wait=float(os.environ.get("READ_LANE_WAIT", 2))),
+}
+CLIENT_LLM_RATE = float(os.environ.get("CLIENT_LLM_RATE", 0)) # requests/sec per client, 0 = unlimited
+client_limiter = (ClientLimiter(CLIENT_LLM_RATE, int(os.environ.get("CLIENT_LLM_BURST", 10)))
+                  if CLIENT_LLM_RATE else None)
+
+for _name, _lane in lanes.items():
+    metrics.register_gauge(f'admission_{_name}_in_flight', f'Requests running in the {_name} lane.',
+                           lambda lane=_lane: lane.in_flight)
+    metrics.register_gauge(f'admission_{_name}_waiting', f'Requests queued for the {_name} lane.',
+                           lambda lane=_lane: lane.waiting)
+
+def admission_lane(endpoint, method):
+    if endpoint in LLM_ROUTES:
+        return 'llm'
+    if method == 'GET' and endpoint is not None and endpoint not in UNGATED_READS:
+        return 'read'
+    return None
+
+def client_key(role, environ):
+    return (role or '', environ.get('HTTP_X_CLIENT_ID') or environ.get('REMOTE_ADDR') or '')
+
+def check_client_rate(lane, role, environ):
+    if lane == 'llm' and client_limiter is not None:
+        client_limiter.check(client_key(role, environ))
+
+async def admit_async(lane, role, environ):
+    """Admission for event loops (asgi.py): a Ticket, or the Rejected to answer with."""
+    try:
+        check_client_rate(lane, role, environ)
+        return await lanes[lane].enter_async()
+    except Rejected as e:
+        return e
+
+@app.before_request
+def admit_request():
+    lane = admission_lane(request.endpoint, request.method) if ADMISSION_CONTROL else None
+    if lane is None:
+        return None
+    # asgi.py admits LLM routes before dispatch, without blocking its event loop
+    ticket = request.environ.get('admission.ticket')
+    try:
+        if isinstance(ticket, Rejected):
+            raise ticket
+        if ticket is None:
+            data = request.get_json(silent=True) if request.method != 'GET' else None
+            role = request.args.get('role') or (data.get('role') or data.get('author_role')
+                                                if isinstance(data, dict) else None)
+            check_client_rate(lane, role, request.environ)
+            ticket = lanes[lane].enter()
+    except Rejected as e:
+        if metrics.enabled():
+            metrics.ADMISSION_REJECTED.inc(lane)
+        return jsonify({"error": f"Too many requests: {e}"}), 429, {"Retry-After": str(e.retry_after)}
+    g.admission = ticket
+    return None
+
+def release_when_sent(chunks, ticket):
+    try:
+        yield from chunks
+    finally:
+        ticket.release()
+
+@app.after_request
+def release_admission(response):
+    ticket = g.pop('admission', None)
+    if ticket is None:
+        pass
+    elif response.is_streamed: # Streams hold their slot until sent (or dropped)
+        response.response = release_when_sent(response.response, ticket)
+    else:
+        ticket.release()
+    return response
+
+@app.teardown_request
+def release_admission_on_error(exc):
+    ticket = g.pop('admission', None) # Still here only if no response was finalized
+    if ticket is not None:
+        ticket.release()
 
 @app.route('/')
 def index():
@@ -29,88 +239,275 @@ def index():
 
 # --- In-Memory Data Store ---
 
-# Notes/Entries in the timeline
-# Structure:
+# Notes/Entries in the timeline, stored as models.Note records.
+# JSON shape (Note.to_dict / Note.from_dict):
 # {
-#   "id": "uuid",
+#   "id": "uuid",              # held as 16 raw bytes
 #   "content": "text",
 #   "author_role": "patient" | "staff" | "clinician" | "system" | "ai",
 #   "type": "staff_note" | "clinician_note" | "ai_doctor_consult_summary" | ...,
-#   "timestamp": "ISO string",
+#   "timestamp": "YYYY-MM-DD HH:MM", # held as integer epoch seconds
 #   "version": 1,
-#   "history": [], # List of previous versions
+#   "history": [], # Stubs of previous versions (full versions in version_store)
 #   "conflicts": [],
 #   "highlights": [], # List of key signals/highlights
 #   "actions": [] # List of associated actions/assignments
 # }
 notes = []
 
-# Load synthetic data if available
-DATA_FILE = os.path.join(os.path.dirname(__file__), 'note.json')
+# Full-text index over note content (kept current by every note write)
+search_index = SearchIndex()
+
+# Parsed note timestamps (epoch seconds) for vectorized decay scoring
+note_timestamps = TimestampArray()
+
+# Note actions keyed by (assigned_to_role, status) for role work queues
+action_index = ActionIndex()
+
+# Previous note versions keyed by (note_id, version), decoded on demand
+version_store = VersionStore()
+
+# Clinician notes recording a decision or plan (matched without lowercasing a copy of the note)
+PLAN_WORDS = re.compile(r'plan|decision', re.IGNORECASE)
+
+def glance_entries(note):
+    """
+    A note's entries in the glance's AI Scribed and Clinician Confirmed
+    sections (classified when the note is written; see glance_index).
+    """
+    note_id = unpack_id(note.id)
+    ai_scribed = []
+    # Check if note is AI-generated (type starts with ai_)
+    # Even if edited by clinician (author_role changed), it remains an AI-scribed note in essence.
+    if is_ai_note_type(note.type):
+        ai_scribed.append({
+            "id": note_id,
+            "type": label(note.type).replace('ai_', '').replace('_', ' ').title(),
+            "summary": note.content[:100] + "..." if len(note.content) > 100 else note.content,
+            "timestamp": format_timestamp(note.timestamp),
+            "author_role": label(note.author_role)
+        })
+
+    confirmed = []
+    if note.author_role == Role.CLINICIAN:
+        # 1. Decisions/Plans (explicit types or keywords)
+        if PLAN_WORDS.search(note.content) or note.type == NoteType.CLINICIAN_NOTE:
+            confirmed.append({
+                "id": note_id,
+                "text": f"Decision: {note.content[:50]}...",
+                "source_note_id": note_id,
+                "type": "decision"
+            })
+        # 2. Modified AI Content: the original version was AI's
+        if note.history and note.history[0].author_role == Role.AI:
+            confirmed.append({
+                "id": note_id + "_mod",
+                "text": "Modified AI Consult",
+                "source_note_id": note_id,
+                "type": "modification"
+            })
+    return ai_scribed, confirmed
+
+# Glance sections classified at write time, in timeline order
+glance_index = GlanceIndex(glance_entries)
+
+# Guards changes to the notes list itself (inserts, tier moves)
+store_lock = threading.RLock()
+
+# Mock assignments/actions for Glance View (Global/System level)
+# We will mix these with note-level actions (models.Action records)
+system_actions = []
+
+# Rolling consult summaries, one session per summarizing role:
+# role -> {"summary", "summary_note_id", "watermark"}. The watermark is the
+# store size when the session last summarized, so notes[:len(notes) - watermark]
+# are the notes added since (new notes are inserted at the top).
+consult_sessions = {}
+
+# Serialized timeline/glance bodies per role, dropped by writes that touch
+# what the role can see. Glance entries also expire after GLANCE_CACHE_SECONDS
+# since decay weights move with the clock.
+RESPONSE_CACHE = os.environ.get("RESPONSE_CACHE", "1") == "1"
+GLANCE_CACHE_SECONDS = float(os.environ.get("GLANCE_CACHE_SECONDS", 60))
+response_cache = ResponseCache(enabled=RESPONSE_CACHE)
+
+metrics.register_gauge('notes_stored', 'Notes in the in-memory store.', lambda: len(notes))
+metrics.register_gauge('actions_indexed', 'Note actions in the action index.', lambda: len(action_index))
+metrics.register_gauge('search_index_documents', 'Notes in the full-text index.', lambda: len(search_index))
+metrics.register_gauge('note_versions_stored', 'Previous note versions in the version store.', lambda: len(version_store))
+metrics.register_gauge('response_cache_entries', 'Cached per-role response bodies.', lambda: len(response_cache))
+
+def load_store(records, dismissed=None):
+    """
+    Replaces the in-memory store with the given note records (JSON shape,
+    newest first) and rebuilds every index. `dismissed` restores the
+    highlight model's dismissal counts (saved with the store snapshot).
+    """
+    global notes, system_actions
+    notes = [Note.from_dict(r) for r in records] # records may be a stream
+    system_actions = []
+    consult_sessions.clear()
+    local_extractor.clear_learned()
+    highlight_model.clear()
+    version_store.clear()
+    glance_index.clear()
+
+    search_index.clear()
+    note_timestamps.clear()
+    action_index.clear()
+    for n in reversed(notes): # Oldest first so recency breaks score ties
+        if n.history:
+            n.history = version_store.load(n.id, n.history)
+        search_index.add(n)
+        note_timestamps.set(n.id, n.timestamp)
+        for a in n.actions or []:
+            action_index.add(a, n)
+        for h in n.highlights or []:
+            if h.type == HighlightType.USER_HIGHLIGHT:
+                local_extractor.learn(h.text)
+                highlight_model.update(h.text, +1)
+    highlight_model.load_dismissed(dismissed or {})
+    for n in notes: # After their history stubs are loaded
+        glance_index.add(n, top=False)
+    response_cache.invalidate()
+
+# Load synthetic data if available (NOTES_FILE points at a generated dataset)
+DATA_FILE = os.environ.get("NOTES_FILE", os.path.join(os.path.dirname(__file__), 'note.json'))
 KEY_FILE = os.path.join(os.path.dirname(__file__), 'secret.key')
 
+# Keyring (envelope.py): records are encrypted under per-record data keys
+# wrapped by the primary key; older keys stay until a rotation retires them
 cipher = None
 if os.path.exists(KEY_FILE):
     try:
-        with open(KEY_FILE, 'rb') as kf:
-            key = kf.read()
-            cipher = Fernet(key)
-            print("Encryption key loaded.")
+        cipher = Keyring.load(KEY_FILE)
     except Exception as e:
         print(f"Error loading encryption key: {e}")
 
-if os.path.exists(DATA_FILE):
-    try:
-        with open(DATA_FILE, 'rb') as f:
-            file_content = f.read()
-            
-        # Try to decrypt if key exists
-        notes_data = file_content
-        if cipher:
-            try:
-                notes_data = cipher.decrypt(file_content)
-                print("Decrypted notes successfully.")
-            except Exception:
-                # Fallback: maybe it's plain text
-                print("Decryption failed or file not encrypted. Assuming plain text.")
-                pass
-                
-        notes = json.loads(notes_data)
-        print(f"Loaded {len(notes)} notes from {DATA_FILE}")
-    except Exception as e:
-        print(f"Error loading notes: {e}")
+# Tiered storage (opt-in): a background snapshotter moves notes older than
+# HOT_NOTE_DAYS (with no open actions) into encrypted, memory-mapped segment
+# files under TIER_DIR and snapshots the hot tier there. Restarts load the
+# hot snapshot plus segment indexes instead of the full data file.
+TIER_DIR = os.environ.get("TIER_DIR")
+HOT_NOTE_DAYS = float(os.environ.get("HOT_NOTE_DAYS", 30))
+SNAPSHOT_INTERVAL = float(os.environ.get("SNAPSHOT_INTERVAL", 300))
+cold_store = ColdStore(TIER_DIR, cipher) if TIER_DIR else None
 
-# Mock assignments/actions for Glance View (Global/System level)
-# We will mix these with note-level actions
-system_actions = []
+def load_initial_store(data_file):
+    """Loads the tiered store if there is one, else data_file. Returns what was loaded."""
+    if cold_store is not None and cold_store.exists():
+        load_store(iter_notes(cold_store.hot_path, cipher) if os.path.exists(cold_store.hot_path) else [],
+                   dismissed=cold_store.read_model().get('dismissed'))
+        cold_store.open()
+        for _, entry in cold_store.entries():
+            for text in entry.get('learned', ()):
+                local_extractor.learn(text)
+                highlight_model.update(text, +1)
+        return f"{len(notes)} hot notes and {len(cold_store)} cold notes from {TIER_DIR}"
+    if os.path.exists(data_file):
+        # Legacy single-token or chunked file; decrypted if key exists
+        load_store(iter_notes(data_file, cipher))
+        return f"{len(notes)} notes from {data_file}"
+    return "no data file"
 
 # --- Helpers ---
 
 def get_current_time():
-    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    return current_timestamp()
 
 def generate_id():
-    return str(uuid.uuid4())
+    return new_id()
+
+def find_note(note_id):
+    """
+    Looks up a stored note by its API (string) id, to modify it. A cold
+    note is thawed (moved back to the hot tier) first.
+    """
+    key = pack_id(note_id)
+    found = next((n for n in notes if n.id == key), None)
+    if found is None and cold_store is not None and unpack_id(key) in cold_store:
+        found = thaw_note(unpack_id(key))
+    return found
+
+def read_note(note_id):
+    """
+    Looks up a note for a read-only route. Returns (note, versions), the
+    VersionStore holding its previous versions: a cold note is read from
+    its segment, versions into a store of their own, and stays cold.
+    """
+    key = pack_id(note_id)
+    found = next((n for n in notes if n.id == key), None)
+    if found is not None or cold_store is None:
+        return found, version_store
+    peeked = cold_store.peek(unpack_id(key))
+    if peeked is None:
+        return None, version_store
+    record, stored_versions = peeked
+    note = Note.from_dict(record)
+    versions = VersionStore()
+    note.history = versions.load(note.id, [Note.from_dict(v) for v in stored_versions])
+    return note, versions
+
+def insert_note(note):
+    """
+    Adds a note to the top of the timeline and indexes it for search, decay
+    and the action queues.
+    """
+    with store_lock:
+        notes.insert(0, note)
+    index_note(note)
+    glance_index.add(note)
+    note_changed(note)
+
+def index_note(note):
+    search_index.add(note)
+    note_timestamps.set(note.id, note.timestamp)
+    for a in note.actions or []:
+        action_index.add(a, note)
+
+def affected_roles(note):
+    """Roles whose timeline or glance can show the note or its actions."""
+    roles = {role for role in Role if can_view_note(role, note)}
+    roles.update(a.assigned_to_role for a in note.actions or ())
+    roles.add(Role.ADMIN) # Sees every action queue
+    return roles
+
+def note_changed(note, roles=()):
+    """Drops cached views of the roles that can see the note (plus `roles`, e.g. from before an edit)."""
+    response_cache.invalidate(affected_roles(note) | set(roles))
+
+def cached_view(view, user_role, build, max_age=None):
+    """Serves the role's cached body for a view, or builds the response and caches it."""
+    if not isinstance(user_role, Role): # Unknown role strings aren't worth a cache slot
+        return build(user_role)
+    body = response_cache.get(view, user_role, max_age)
+    if body is not None:
+        return app.response_class(body, mimetype='application/json')
+    generation = response_cache.generation(view, user_role)
+    response = build(user_role)
+    response_cache.put(view, user_role, response.get_data(), generation)
+    return response
+
+def note_with_history(note):
+    """A note's JSON with full previous versions instead of history stubs."""
+    data = note.to_dict()
+    if note.history:
+        data['history'] = [v.to_dict() for v in version_store.history(note.id, note.history)]
+    return data
+
+def note_version(note, version, versions=None):
+    """Version `version` of a note (the current one included), or None."""
+    if version == note.version:
+        return note.snapshot()
+    return (version_store if versions is None else versions).get(note.id, version)
 
 def calculate_decay_weight(timestamp_str):
     """
-    Calculates a weight (0.0 to 1.0) based on how old the item is.
-    Simple linear decay: 100% at 0 days, 50% at 7 days, 0% at 14 days.
+    Calculates a weight (0.0 to 1.0) based on how old a single item is,
+    using the configured DECAY_CURVE (default: 1 / (1 + 0.5 * days)).
+    The Glance View scores all highlights at once via decay_weights().
     """
-    try:
-        item_time = datetime.datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M")
-        now = datetime.datetime.now()
-        delta = now - item_time
-        days = delta.days
-        
-        # Formula: weight = 1 / (1 + 0.5 * days)
-        # Day 0: 1.0
-        # Day 2: 0.5
-        # Day 10: 0.16
-        weight = 1.0 / (1.0 + 0.5 * days)
-        return max(0.0, min(1.0, weight))
-    except:
-        return 1.0
+    return float(decay_weights([parse_timestamp(timestamp_str)], curve=DECAY_CURVE)[0])
 
 def redact_phi(text):
     """
@@ -133,31 +530,36 @@ def redact_phi(text):
         
     return text
 
-def call_llm_analysis(content, context_notes=[]):
+# LLM-bound logic below is written as call steps (generators yielding
+# LLMRequest, see llm_client.py): Flask routes run them with run_steps,
+# the ASGI serving mode (asgi.py) awaits the calls.
+
+def llm_analysis_steps(content, context_notes=[]):
     """
-    Uses Gemini to analyze the note content and extract:
+    Uses the configured LLM to analyze the note content and extract:
     1. Highlights (Risks/Important Info)
     2. Actions (Tasks)
     3. Suggested Type (if not provided)
     """
-    if not GEMINI_API_KEY:
+    if not llm:
         # Fallback if no API key
         return {"highlights": [], "actions": []}
 
     # Extract user-highlighted examples for Few-Shot Learning
     user_examples = []
     for n in context_notes:
-        for h in n.get('highlights', []):
-            if h.get('type') == 'user-highlight':
-                user_examples.append(f"Text: '{h['text']}' -> Highlight (Important Signal)")
+        for h in n.highlights:
+            if h.type == HighlightType.USER_HIGHLIGHT:
+                user_examples.append(f"Text: '{h.text}' -> Highlight (Important Signal)")
     
     # Limit to last 5 examples
     user_examples = user_examples[:5]
     examples_str = "\n".join(user_examples)
 
     # Redact Content and Context
-    safe_content = redact_phi(content)
-    context_str = "\n".join([f"[{n['timestamp']}] {redact_phi(n['content'])}" for n in context_notes[-3:]])
+    with metrics.phase('redaction'):
+        safe_content = redact_phi(content)
+        context_str = "\n".join([f"[{format_timestamp(n.timestamp)}] {redact_phi(n.content)}" for n in context_notes[-3:]])
 
     # Construct prompt
     prompt = f"""
@@ -190,14 +592,73 @@ def call_llm_analysis(content, context_notes=[]):
     """
     
     try:
-        model = genai.GenerativeModel('gemini-flash-latest')
-        response = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
-        text = response.text
+        text = yield LLMRequest(prompt, 'analysis', json_mode=True)
         return json.loads(text)
     except Exception as e:
-        print(f"LLM Error (Gemini): {e}")
+        print(f"LLM Error ({LLM_PROVIDER}): {e}")
         return {"highlights": [], "actions": []}
 
+def analyze_note_steps(content, context_notes):
+    """
+    Highlights and actions for a note, in the llm_analysis_steps shape. The
+    local extractor answers first; only notes it isn't confident about go
+    to the LLM (when one is configured).
+    """
+    if EXTRACTION_MODE != 'llm' or not llm:
+        with metrics.phase('extraction'):
+            result, confident = local_extractor.extract(content)
+        if confident or not llm or EXTRACTION_MODE == 'local':
+            return result
+    return (yield from llm_analysis_steps(content, context_notes))
+
+def analyze_note(content, context_notes):
+    return run_steps(analyze_note_steps(content, context_notes), llm)
+
+def reanchor_highlights(note, old_content):
+    """
+    Moves highlight offsets through a content change. AI highlights whose
+    text was edited away are dropped; user highlights are kept, flagged
+    'orphaned', and re-anchor if the text comes back (e.g. on revert).
+    """
+    if not note.highlights or old_content == note.content:
+        return
+    orphaned = reanchor(note.highlights, old_content, note.content)
+    dropped = {id(h) for h in orphaned if h.type != HighlightType.USER_HIGHLIGHT}
+    if dropped:
+        note.highlights = [h for h in note.highlights if id(h) not in dropped]
+
+def merge_llm_result(note, llm_result):
+    """Adds LLM highlights (located in the note text) and suggested actions to a note."""
+    search_from = {} # Repeated texts take successive occurrences
+    for h in llm_result.get('highlights', []):
+        # Find start/end index
+        start_idx = note.content.find(h['text'], search_from.get(h['text'], 0))
+        if start_idx == -1:
+            start_idx = note.content.find(h['text'])
+        if start_idx != -1:
+            search_from[h['text']] = start_idx + max(len(h['text']), 1)
+            note.highlights.append(Highlight(
+                id=generate_id(),
+                text=h['text'],
+                type=h.get('type', 'risk'),
+                reason=h.get('reason', 'AI detected'),
+                start=start_idx,
+                end=start_idx + len(h['text'])
+            ))
+            
+    for a in llm_result.get('actions', []):
+        note.actions.append(Action(
+            id=generate_id(),
+            title=a.get('description', a.get('title', 'Untitled Action')),
+            status=ActionStatus.PENDING, # LLM suggested actions are pending
+            created_by_role=Role.AI,
+            assigned_to_role=a.get('assignee', 'clinician'), # Default AI actions to clinician for review
+            provenance_note_id=note.id,
+            created_at=get_current_time(),
+            tags=a.get('tags', []),
+            priority=a.get('priority', MISSING)
+        ))
+
 # --- RBAC Logic ---
 
 # Standard Visibility Scopes (Templates)
@@ -222,98 +683,135 @@ SCOPE_TEMPLATES = {
         "admin": True
     }
 }
+# Stored form: one bit per role (see enums.ROLE_BITS)
+SCOPE_MASKS = {name: scope_to_mask(scope) for name, scope in SCOPE_TEMPLATES.items()}
 
 def get_standardized_scope(note):
     """
-    Adapter function to ensure note['visibility_scope'] is always a valid dictionary.
-    Handles legacy data (missing field or string value) by converting it to the new dict format.
+    Adapter function to ensure note.visibility_scope is always a valid scope
+    (a role bitmask, or a custom role -> bool dict).
+    Handles legacy data (missing field or string value) by converting it to the new format.
     """
-    raw_scope = note.get('visibility_scope')
+    raw_scope = note.visibility_scope
 
-    # Case 1: Already a dictionary (New format)
-    if isinstance(raw_scope, dict):
+    # Case 1: Already a bitmask or dictionary (New format)
+    if isinstance(raw_scope, (int, dict)):
         return raw_scope
 
     # Case 2: String (Legacy format from old code)
     if isinstance(raw_scope, str):
         if raw_scope == 'patient':
-            return SCOPE_TEMPLATES['patient_visible']
+            return SCOPE_MASKS['patient_visible']
         elif raw_scope == 'staff':
-            return SCOPE_TEMPLATES['staff_visible']
+            return SCOPE_MASKS['staff_visible']
         elif raw_scope == 'clinician':
-            return SCOPE_TEMPLATES['clinician_only']
+            return SCOPE_MASKS['clinician_only']
         else:
-            return SCOPE_TEMPLATES['staff_visible'] # Default fallback
+            return SCOPE_MASKS['staff_visible'] # Default fallback
 
     # Case 3: Missing field (Legacy data) -> Infer from note type
-    note_type = note.get('type')
+    note_type = note.type
     
-    if note_type == 'ai_doctor_consult_summary':
-        return SCOPE_TEMPLATES['clinician_only']
+    if note_type == NoteType.AI_DOCTOR_CONSULT_SUMMARY:
+        return SCOPE_MASKS['clinician_only']
     
-    if note_type == 'clinician_note':
-        return SCOPE_TEMPLATES['clinician_only']
+    if note_type == NoteType.CLINICIAN_NOTE:
+        return SCOPE_MASKS['clinician_only']
         
-    if note_type == 'ai_nurse_consult_summary':
-        return SCOPE_TEMPLATES['staff_visible']
+    if note_type == NoteType.AI_NURSE_CONSULT_SUMMARY:
+        return SCOPE_MASKS['staff_visible']
         
-    if note_type == 'staff_note':
-        return SCOPE_TEMPLATES['staff_visible']
+    if note_type == NoteType.STAFF_NOTE:
+        return SCOPE_MASKS['staff_visible']
         
-    if note_type in ['ai_patient_session_summary', 'patient_input']:
-        return SCOPE_TEMPLATES['patient_visible']
+    if note_type in (NoteType.AI_PATIENT_SESSION_SUMMARY, NoteType.PATIENT_INPUT):
+        return SCOPE_MASKS['patient_visible']
 
     # Default fallback for unknown types
-    return SCOPE_TEMPLATES['staff_visible']
+    return SCOPE_MASKS['staff_visible']
 
 def can_view_note(user_role, note):
-    if user_role == 'admin':
+    """
+    user_role is a Role code (see parse_role); comparisons are on ints.
+    """
+    if user_role == Role.ADMIN:
         return True
     
     # HARD CONSTRAINT: Patient cannot see AI Nurse Consult Summary
-    if user_role == 'patient' and note.get('type') == 'ai_nurse_consult_summary':
+    if user_role == Role.PATIENT and note.type == NoteType.AI_NURSE_CONSULT_SUMMARY:
         return False
     
-    # Get the standardized dictionary (handles all legacy cases safely)
+    # Get the standardized scope (handles all legacy cases safely)
     scope = get_standardized_scope(note)
     
     # Check if the specific role is allowed
-    return scope.get(user_role, False)
+    return scope_allows(scope, user_role)
 
 def can_edit_note(user_role, note):
-    if user_role == 'admin':
+    if user_role == Role.ADMIN:
         return True
-    if user_role == 'clinician':
-        return note['author_role'] in ['clinician', 'ai', 'system'] # Can edit own and AI
-    if user_role == 'staff':
-        return note['author_role'] == 'staff'
-    if user_role == 'patient':
-        return note['author_role'] == 'patient'
+    if user_role == Role.CLINICIAN:
+        return note.author_role in (Role.CLINICIAN, Role.AI, Role.SYSTEM) # Can edit own and AI
+    if user_role == Role.STAFF:
+        return note.author_role == Role.STAFF
+    if user_role == Role.PATIENT:
+        return note.author_role == Role.PATIENT
     return False
 
+def parse_role(value):
+    """
+    Maps a role string from the request to its stored code (API edge).
+    """
+    return Role.parse(value)
+
 # --- Routes ---
 
 @app.route('/api/timeline', methods=['GET'])
 def get_timeline():
-    user_role = request.args.get('role', 'clinician')
-    visible_notes = [n for n in notes if can_view_note(user_role, n)]
+    user_role = parse_role(request.args.get('role', 'clinician'))
+    return cached_view('timeline', user_role, build_timeline)
+
+def build_timeline(user_role):
+    with metrics.phase('rbac'):
+        visible_notes = [n for n in notes if can_view_note(user_role, n)]
+        cold_entries = visible_cold_entries(user_role) if cold_store is not None else []
     # Sort by timestamp desc
-    visible_notes.sort(key=lambda x: x['timestamp'], reverse=True)
-    return jsonify(visible_notes)
+    timeline = [(timestamp_key(n.timestamp), n) for n in visible_notes]
+    timeline.extend((entry['epoch'], (segment, entry)) for segment, entry in cold_entries)
+    timeline.sort(key=lambda item: item[0], reverse=True)
+    if not cold_entries:
+        with metrics.phase('serialize'):
+            return jsonify([n.to_dict() for _, n in timeline])
+
+    # Cold records are stored as timeline JSON: spliced in as-is, with no
+    # parse/re-serialize. Each is copied once, into the body (which the
+    # response cache keeps); plaintext ones straight from the mapping.
+    with metrics.phase('serialize'):
+        pieces = [b"["]
+        for _, item in timeline:
+            pieces.append(app.json.dumps(item.to_dict()).encode('utf-8') if isinstance(item, Note)
+                          else cold_store.raw_record(*item))
+            pieces.append(b",")
+        pieces[-1] = b"]"
+        body = b"".join(pieces)
+    return app.response_class(body, mimetype='application/json')
 
 @app.route('/api/notes', methods=['POST'])
 def create_note():
-    data = request.json
-    user_role = data.get('author_role', 'staff') # trusted role from client for prototype
+    return run_steps(create_note_steps(request.json), llm)
+
+def create_note_steps(data):
+    user_role = parse_role(data.get('author_role', 'staff')) # trusted role from client for prototype
+    note_type = NoteType.parse(data.get('type', 'staff_note'))
     
     # Simple permission check for creation
-    if user_role == 'patient' and data.get('type') not in ['patient_input']:
+    if user_role == Role.PATIENT and note_type != NoteType.PATIENT_INPUT:
         return jsonify({"error": "Unauthorized type for patient"}), 403
     
     content = data.get('content', '')
     
     # Handle "Simulate AI Scribe" auto-generation (Empty content + simulate_ai=True)
-    if data.get('simulate_ai') and not content and user_role == 'ai':
+    if data.get('simulate_ai') and not content and user_role == Role.AI:
         # Generate mock content
         import random
         scenarios = [
@@ -327,129 +825,93 @@ def create_note():
         
         # If we have the LLM, we could ask it to generate one too, but for consistency in a prototype, scenarios are safer and faster.
         # But let's try to make it feel "live" if LLM is there.
-        if GEMINI_API_KEY:
+        if llm:
              try:
                 gen_prompt = "Generate a realistic, short (3-5 sentences) clinical note for a random patient visit. Include symptoms, vitals, and plan."
-                model = genai.GenerativeModel('gemini-1.5-flash-latest')
-                response = model.generate_content(gen_prompt)
-                content = response.text.strip()
+                content = (yield LLMRequest(gen_prompt, 'draft')).strip()
              except Exception as e:
-                print(f"Gemini Generation Error: {e}")
+                print(f"LLM Generation Error ({LLM_PROVIDER}): {e}")
                 pass # Fallback to scenarios
 
     note_id = generate_id()
-    new_note = {
-        "id": note_id,
-        "content": content,
-        "author_role": user_role,
-        "type": data.get('type', 'staff_note'),
-        "timestamp": get_current_time(),
-        "version": 1,
-        "history": [],
-        "highlights": data.get('highlights', []),
-        "actions": []
-    }
+    new_note = Note(
+        id=note_id,
+        content=content,
+        author_role=user_role,
+        type=note_type,
+        timestamp=get_current_time(),
+        version=1,
+        history=[],
+        highlights=[Highlight.from_dict(h) for h in data.get('highlights', [])],
+        actions=[]
+    )
     
     # Calculate Visibility Scope
-    new_note['visibility_scope'] = get_standardized_scope(new_note)
+    new_note.visibility_scope = get_standardized_scope(new_note)
 
-    # Auto-generate Actions & Highlights via LLM
-    # We do this for ALL notes now to support "AI learning from user input"
-    # But for performance in prototype, maybe only if simulate_ai=True OR explicit request?
-    # User requirement: "AI dynamically learns from user input... does not use any fixed keyword list"
-    # So we should call LLM for every input if key is present.
-    
+    # Auto-generate Actions & Highlights for ALL non-patient notes. The local
+    # tier learns from user highlights; the LLM (if configured) handles the
+    # notes it can't cover confidently.
     llm_result = {"highlights": [], "actions": []}
-    if GEMINI_API_KEY and user_role != 'patient':
-        llm_result = call_llm_analysis(new_note['content'], notes)
-    else:
-        # Fallback dynamic logic (simple keyword matching removed as per request "no hardcoding", 
-        # but kept minimal strictly for "offline" demo if key missing)
-        pass 
+    if user_role != Role.PATIENT:
+        llm_result = yield from analyze_note_steps(new_note.content, notes)
 
     # Merge LLM results
-    for h in llm_result.get('highlights', []):
-        # Find start/end index
-        start_idx = new_note['content'].find(h['text'])
-        if start_idx != -1:
-            new_note['highlights'].append({
-                "id": generate_id(),
-                "text": h['text'],
-                "type": h.get('type', 'risk'),
-                "reason": h.get('reason', 'AI detected'),
-                "start": start_idx,
-                "end": start_idx + len(h['text'])
-            })
-            
-    for a in llm_result.get('actions', []):
-        new_note['actions'].append({
-            "id": generate_id(),
-            "title": a.get('description', a.get('title', 'Untitled Action')),
-            "status": "pending", # LLM suggested actions are pending
-            "created_by_role": "ai",
-            "assigned_to_role": a.get('assignee', 'clinician'), # Default AI actions to clinician for review
-            "provenance_note_id": note_id,
-            "created_at": get_current_time(),
-            "tags": a.get('tags', [])
-        })
+    merge_llm_result(new_note, llm_result)
 
     # Manual Actions from Frontend
     if 'manual_actions' in data:
         for action_title in data['manual_actions']:
             # Determine assignment based on creator role and action type
-            assigned_to = 'staff' # Default
-            if user_role == 'clinician':
-                assigned_to = 'staff'
-            elif user_role == 'staff':
-                assigned_to = 'clinician'
+            assigned_to = Role.STAFF # Default
+            if user_role == Role.CLINICIAN:
+                assigned_to = Role.STAFF
+            elif user_role == Role.STAFF:
+                assigned_to = Role.CLINICIAN
             
-            new_note['actions'].append({
-                "id": generate_id(),
-                "title": action_title,
-                "status": "unresolved",
-                "created_by_role": user_role,
-                "assigned_to_role": assigned_to,
-                "provenance_note_id": note_id,
-                "created_at": get_current_time()
-            })
+            new_note.actions.append(Action(
+                id=generate_id(),
+                title=action_title,
+                status=ActionStatus.UNRESOLVED,
+                created_by_role=user_role,
+                assigned_to_role=assigned_to,
+                provenance_note_id=note_id,
+                created_at=get_current_time()
+            ))
             
-    notes.insert(0, new_note) # Add to top
-    return jsonify(new_note)
+    insert_note(new_note) # Add to top
+    return jsonify(new_note.to_dict())
 
 @app.route('/api/actions/<action_id>/resolve', methods=['POST'])
 def resolve_action(action_id):
     data = request.json
-    user_role = data.get('role')
+    user_role = parse_role(data.get('role'))
     resolution_type = data.get('resolution_type', 'resolve') # resolve | forward
     comment = data.get('comment', '')
     
-    # Find the action across all notes
-    target_action = None
-    target_note = None
-    
-    for n in notes:
-        for a in n.get('actions', []):
-            if a['id'] == action_id:
-                target_action = a
-                target_note = n
-                break
-        if target_action:
-            break
-            
-    if not target_action:
+    # Find the action via the action index
+    entry = action_index.get(pack_id(action_id))
+    if not entry and cold_store is not None:
+        cold_note_id = cold_store.action_note(unpack_id(pack_id(action_id)))
+        if cold_note_id is not None and thaw_note(cold_note_id) is not None: # Indexes its actions
+            entry = action_index.get(pack_id(action_id))
+    if not entry:
         return jsonify({"error": "Action not found"}), 404
+    target_action, target_note = entry
         
     # Permission check: Only assignee can resolve (or admin)
-    if user_role != 'admin' and target_action['assigned_to_role'] != user_role:
+    if user_role != Role.ADMIN and target_action.assigned_to_role != user_role:
         return jsonify({"error": "Unauthorized: Action not assigned to you"}), 403
+    affected = affected_roles(target_note)
         
     # Update status
-    target_action['status'] = 'resolved'
-    target_action['resolved_at'] = get_current_time()
-    target_action['resolution_comment'] = comment
+    target_action.status = ActionStatus.RESOLVED
+    target_action.resolved_at = get_current_time()
+    target_action.resolution_comment = comment
+    action_index.update(target_action)
     
     # Create System Note to log resolution in Timeline
-    log_content = f"✅ Action Resolved: {target_action['title']}"
+    log_content = f"✅ Action Resolved: {target_action.title}"
     if comment:
         log_content += f"\nNote: {comment}"
         
@@ -458,78 +920,84 @@ def resolve_action(action_id):
         new_action_title = data.get('new_action_title')
         if new_action_title:
             # Determine new assignee (swap roles)
-            new_assignee = 'staff' if user_role == 'clinician' else 'clinician'
+            new_assignee = Role.STAFF if user_role == Role.CLINICIAN else Role.CLINICIAN
             
-            new_action = {
-                "id": generate_id(),
-                "title": new_action_title,
-                "status": "unresolved",
-                "created_by_role": user_role,
-                "assigned_to_role": new_assignee,
-                "provenance_note_id": target_action['provenance_note_id'], # Link to original source
-                "created_at": get_current_time()
-            }
+            new_action = Action(
+                id=generate_id(),
+                title=new_action_title,
+                status=ActionStatus.UNRESOLVED,
+                created_by_role=user_role,
+                assigned_to_role=new_assignee,
+                provenance_note_id=target_action.provenance_note_id, # Link to original source
+                created_at=get_current_time()
+            )
             
-            if 'actions' not in target_note:
-                target_note['actions'] = []
-            target_note['actions'].append(new_action)
+            if target_note.actions is MISSING:
+                target_note.actions = []
+            target_note.actions.append(new_action)
+            action_index.add(new_action, target_note)
             
-            log_content += f"\n➡️ Forwarded to {new_assignee}: {new_action_title}"
+            log_content += f"\n➡️ Forwarded to {label(new_assignee)}: {new_action_title}"
+    note_changed(target_note, affected)
 
     # Add log entry to timeline
-    notes.insert(0, {
-        "id": generate_id(),
-        "content": log_content,
-        "author_role": "system",
-        "type": "system_log",
-        "timestamp": get_current_time(),
-        "version": 1,
-        "history": [],
-        "highlights": [],
-        "actions": []
-    })
+    insert_note(Note(
+        id=generate_id(),
+        content=log_content,
+        author_role=Role.SYSTEM,
+        type=NoteType.SYSTEM_LOG,
+        timestamp=get_current_time(),
+        version=1,
+        history=[],
+        highlights=[],
+        actions=[]
+    ))
     
-    return jsonify({"status": "success", "action": target_action})
+    return jsonify({"status": "success", "action": target_action.to_dict()})
 
-@app.route('/api/consult/end', methods=['POST'])
-def end_consult():
-    data = request.json
-    user_role = data.get('role')
-    source_note_id = data.get('source_note_id')
-    
-    # Determine type based on role
-    if user_role == 'clinician':
-        note_type = 'ai_doctor_consult_summary'
-        scope = SCOPE_TEMPLATES['clinician_only']
-        prompt_role = "doctor"
-    elif user_role == 'staff':
-        note_type = 'ai_nurse_consult_summary'
-        scope = SCOPE_TEMPLATES['staff_visible']
-        prompt_role = "nurse"
-    elif user_role == 'patient':
-        note_type = 'ai_patient_session_summary'
-        scope = SCOPE_TEMPLATES['patient_visible']
-        prompt_role = "patient session"
-    else:
-        return jsonify({"error": "Invalid role for ending consult"}), 400
-        
-    # Gather context (e.g. all notes from today or last session)
-    # For prototype, just take last 10 notes
-    recent_notes = notes[:10]
-    # Deep copy to avoid modifying original list in place during reverse
-    recent_notes = copy.deepcopy(recent_notes)
-    recent_notes.reverse() # Chronological
-    
-    # Redact context for summary
-    context_text = "\n".join([f"[{n['author_role']}]: {redact_phi(n['content'])}" for n in recent_notes])
-    
-    content = ""
-    if GEMINI_API_KEY:
-        try:
-            # Custom instructions based on role
-            custom_instructions = ""
-            if user_role == 'patient':
-                custom_instructions = """
+# --- Consult Summaries ---
+
+# role -> (summary note type, scope, prompt wording)
+CONSULT_SETTINGS = {
+    Role.CLINICIAN: (NoteType.AI_DOCTOR_CONSULT_SUMMARY, SCOPE_MASKS['clinician_only'], "doctor"),
+    Role.STAFF: (NoteType.AI_NURSE_CONSULT_SUMMARY, SCOPE_MASKS['staff_visible'], "nurse"),
+    Role.PATIENT: (NoteType.AI_PATIENT_SESSION_SUMMARY, SCOPE_MASKS['patient_visible'], "patient session"),
+}
+
+# Summaries (and their LLM-error fallbacks) are written as system notes of these types
+CONSULT_NOTE_TYPES = frozenset(note_type for note_type, _, _ in CONSULT_SETTINGS.values())
+
+# Most notes folded into one summarization prompt
+CONSULT_WINDOW = int(os.environ.get("CONSULT_WINDOW", 10))
+
+def pending_consult_notes(user_role):
+    """
+    Returns (previous summary, notes to add oldest first, watermark) for
+    the role's consult session. Without a session (no /api/consult/start
+    yet) the summary starts from the latest CONSULT_WINDOW notes. A session
+    rolls forward over the notes added since that the role can see, minus
+    consult summaries (its own, other roles' and error fallbacks).
+    """
+    watermark = len(notes)
+    session = consult_sessions.get(user_role)
+    if session is None:
+        return None, notes[:CONSULT_WINDOW][::-1], watermark
+    added = [n for n in reversed(notes[:watermark - session['watermark']])
+             if not is_consult_note(n) and can_view_note(user_role, n)]
+    return session['summary'], added, watermark
+
+def is_consult_note(note):
+    return note.author_role == Role.SYSTEM and note.type in CONSULT_NOTE_TYPES
+
+def build_consult_prompt(user_role, prompt_role, previous_summary, new_notes):
+    # Only the new notes are redacted; the previous summary was built from redacted text
+    with metrics.phase('redaction'):
+        context_text = "\n".join([f"[{label(n.author_role)}]: {redact_phi(n.content)}" for n in new_notes])
+
+    # Custom instructions based on role
+    custom_instructions = ""
+    if user_role == Role.PATIENT:
+        custom_instructions = """
                 STRICT RULES FOR PATIENT SUMMARY:
                 1. Use simple, non-medical language (layperson terms).
                 2. DO NOT include specific medication dosages (e.g., say 'steroids' not 'Solu-Medrol 125mg').
@@ -537,8 +1005,22 @@ def end_consult():
                 4. Focus on: What happened, What was done, and What to do next.
                 5. NO medical jargon or complex diagnosis codes.
                 """
+
+    if previous_summary:
+        return f"""
+            Update the running summary of the following medical consultation for a {prompt_role}'s record.
+            {custom_instructions}
+            
+            Previous Summary:
+            {previous_summary}
             
-            prompt = f"""
+            Context (new since the previous summary):
+            {context_text}
+            
+            Output a concise professional summary covering both.
+            """
+
+    return f"""
             Summarize the following medical consultation for a {prompt_role}'s record.
             {custom_instructions}
             
@@ -547,100 +1029,224 @@ def end_consult():
             
             Output a concise professional summary.
             """
-            model = genai.GenerativeModel('gemini-flash-latest')
-            response = model.generate_content(prompt)
-            content = response.text.strip()
+
+def prepare_consult_prompt_steps(user_role, prompt_role, previous_summary, new_notes):
+    """
+    Final summarization prompt for the session. Backlogs longer than
+    CONSULT_WINDOW are folded into the running summary window by window
+    first, so every prompt stays bounded. Returns None when there is
+    nothing new to add (the previous summary stands).
+    """
+    if previous_summary and not new_notes:
+        return None
+    while len(new_notes) > CONSULT_WINDOW:
+        window, new_notes = new_notes[:CONSULT_WINDOW], new_notes[CONSULT_WINDOW:]
+        previous_summary = (yield LLMRequest(build_consult_prompt(user_role, prompt_role, previous_summary, window),
+                                             'consult_summary')).strip()
+    return build_consult_prompt(user_role, prompt_role, previous_summary, new_notes)
+
+def record_consult_summary(user_role, note, watermark):
+    consult_sessions[user_role] = {
+        "summary": note.content,
+        "summary_note_id": note.id,
+        "watermark": watermark
+    }
+
+def mock_consult_summary(note_type):
+    if note_type == NoteType.AI_DOCTOR_CONSULT_SUMMARY:
+        return "Assessment: Acute Bronchitis. \nPlan: Azithromycin 500mg PO x 3 days. Albuterol inhaler PRN. \nFollow-up: If symptoms worsen or fever persists > 48hrs."
+    elif note_type == NoteType.AI_NURSE_CONSULT_SUMMARY:
+        return "Patient educated on medication adherence and hydration. Vitals stable. Patient expressed understanding of discharge instructions."
+    return "Session Summary: Patient reported symptoms of cough and fatigue. Vitals recorded. Doctor consultation completed with prescription provided."
+
+def new_consult_note(content, note_type, scope, source_note_id):
+    return Note(
+        id=generate_id(),
+        content=content,
+        author_role=Role.SYSTEM,
+        type=note_type,
+        timestamp=get_current_time(),
+        version=1,
+        history=[],
+        highlights=[],
+        actions=[],
+        provenance_pointer=pack_id(source_note_id),
+        visibility_scope=scope
+    )
+
+def extract_consult_signals_steps(note, user_role):
+    """Auto-generate Actions & Highlights for a consult summary."""
+    # SKIP highlights/actions for Patient summaries to avoid leaking clinical reasoning
+    if user_role == Role.PATIENT:
+        return
+    merge_llm_result(note, (yield from analyze_note_steps(note.content, notes)))
+
+def extract_signals_in_background(note, user_role):
+    """
+    Runs extract_consult_signals_steps for an already stored note and
+    indexes what it found. Returns the Future.
+    """
+    def run():
+        run_steps(extract_consult_signals_steps(note, user_role), llm)
+        search_index.update(note)
+        for a in note.actions:
+            action_index.add(a, note)
+        note_changed(note)
+        return note
+    return background_tasks.submit(run)
+
+@app.route('/api/consult/end', methods=['POST'])
+def end_consult():
+    return run_steps(end_consult_steps(request.json), llm)
+
+def end_consult_steps(data):
+    user_role = parse_role(data.get('role'))
+    source_note_id = data.get('source_note_id')
+    
+    # Determine type based on role
+    if user_role not in CONSULT_SETTINGS:
+        return jsonify({"error": "Invalid role for ending consult"}), 400
+    note_type, scope, prompt_role = CONSULT_SETTINGS[user_role]
+    previous_summary, new_notes, watermark = pending_consult_notes(user_role)
+        
+    content = ""
+    summarized = True
+    if llm:
+        try:
+            prompt = yield from prepare_consult_prompt_steps(user_role, prompt_role, previous_summary, new_notes)
+            content = previous_summary if prompt is None else (yield LLMRequest(prompt, 'consult_summary')).strip()
         except Exception as e:
-            print(f"Gemini Error: {e}")
+            print(f"LLM Error ({LLM_PROVIDER}): {e}")
             content = f"AI Generated {prompt_role} summary (LLM Error)"
+            summarized = False # Next summary retries these notes
     else:
         # Mock content
-        if note_type == 'ai_doctor_consult_summary':
-            content = "Assessment: Acute Bronchitis. \nPlan: Azithromycin 500mg PO x 3 days. Albuterol inhaler PRN. \nFollow-up: If symptoms worsen or fever persists > 48hrs."
-        elif note_type == 'ai_nurse_consult_summary':
-            content = "Patient educated on medication adherence and hydration. Vitals stable. Patient expressed understanding of discharge instructions."
-        else:
-            content = "Session Summary: Patient reported symptoms of cough and fatigue. Vitals recorded. Doctor consultation completed with prescription provided."
-
-    new_note = {
-        "id": generate_id(),
-        "content": content,
-        "author_role": "system",
-        "type": note_type,
-        "timestamp": get_current_time(),
-        "version": 1,
-        "history": [],
-        "highlights": [],
-        "actions": [],
-        "provenance_pointer": source_note_id,
-        "visibility_scope": scope
-    }
+        content = mock_consult_summary(note_type)
+
+    new_note = new_consult_note(content, note_type, scope, source_note_id)
+    yield from extract_consult_signals_steps(new_note, user_role)
+    
+    insert_note(new_note)
+    if summarized:
+        record_consult_summary(user_role, new_note, watermark)
+    return jsonify(new_note.to_dict())
+
+@app.route('/api/consult/start', methods=['POST'])
+def start_consult():
+    """
+    Opens a consult session for the role: the next summary covers only
+    notes added from now on, and later summaries roll forward from it.
+    """
+    data = request.json
+    user_role = parse_role(data.get('role'))
+    if user_role not in CONSULT_SETTINGS:
+        return jsonify({"error": "Invalid role for starting consult"}), 400
+    consult_sessions[user_role] = {"summary": None, "summary_note_id": None, "watermark": len(notes)}
+    return jsonify({"status": "started", "role": label(user_role)})
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    # Auto-generate Actions & Highlights via LLM
-    if GEMINI_API_KEY:
-        # SKIP highlights/actions for Patient summaries to avoid leaking clinical reasoning
-        if user_role == 'patient':
-            llm_result = {"highlights": [], "actions": []}
+@app.route('/api/consult/end/stream', methods=['POST'])
+def end_consult_stream():
+    """
+    Streaming variant of /api/consult/end (Server-Sent Events).
+    Events: delta {text} as model tokens arrive, then note (the stored
+    summary) once the stream completes, then signals {highlights, actions}
+    when background extraction finishes, then done. An LLM failure sends
+    error and stores the fallback summary, like the blocking endpoint.
+    """
+    data = request.json
+    user_role = parse_role(data.get('role'))
+    source_note_id = data.get('source_note_id')
+
+    if user_role not in CONSULT_SETTINGS:
+        return jsonify({"error": "Invalid role for ending consult"}), 400
+    note_type, scope, prompt_role = CONSULT_SETTINGS[user_role]
+    previous_summary, new_notes, watermark = pending_consult_notes(user_role)
+    ticket = g.get('admission')
+
+    def generate():
+        parts = []
+        summarized = True
+        if llm:
+            try:
+                prompt = run_steps(prepare_consult_prompt_steps(user_role, prompt_role, previous_summary, new_notes),
+                                   llm)
+                chunks = [previous_summary] if prompt is None else llm.stream(prompt, call='consult_summary')
+                for text in chunks:
+                    parts.append(text)
+                    yield sse_event("delta", {"text": text})
+                content = "".join(parts).strip()
+            except Exception as e:
+                print(f"LLM Error ({LLM_PROVIDER}): {e}")
+                yield sse_event("error", {"error": "Summary generation failed"})
+                content = f"AI Generated {prompt_role} summary (LLM Error)"
+                summarized = False
         else:
-            llm_result = call_llm_analysis(new_note['content'], notes)
-
-        for h in llm_result.get('highlights', []):
-            start_idx = new_note['content'].find(h['text'])
-            if start_idx != -1:
-                new_note['highlights'].append({
-                    "id": generate_id(),
-                    "text": h['text'],
-                    "type": h.get('type', 'risk'),
-                    "reason": h.get('reason', 'AI detected'),
-                    "start": start_idx,
-                    "end": start_idx + len(h['text'])
-                })
-        
-        for a in llm_result.get('actions', []):
-            new_note['actions'].append({
-                "id": generate_id(),
-                "title": a.get('description', a.get('title', 'Untitled Action')),
-                "status": "pending",
-                "created_by_role": "ai",
-                "assigned_to_role": a.get('assignee', 'clinician'),
-                "provenance_note_id": new_note['id'],
-                "created_at": get_current_time(),
-                "tags": a.get('tags', [])
+            content = mock_consult_summary(note_type)
+            yield sse_event("delta", {"text": content})
+        if ticket is not None:
+            ticket.release() # The model is done: waiting on extraction holds no LLM lane slot
+
+        # Commit the note now; highlight/action extraction runs in the background
+        new_note = new_consult_note(content, note_type, scope, source_note_id)
+        insert_note(new_note)
+        if summarized:
+            record_consult_summary(user_role, new_note, watermark)
+        yield sse_event("note", new_note.to_dict())
+
+        extraction = extract_signals_in_background(new_note, user_role)
+        try:
+            extraction.result(timeout=STREAM_SIGNALS_TIMEOUT)
+            yield sse_event("signals", {
+                "note_id": unpack_id(new_note.id),
+                "highlights": [h.to_dict() for h in new_note.highlights],
+                "actions": [a.to_dict() for a in new_note.actions]
             })
-    
-    notes.insert(0, new_note)
-    return jsonify(new_note)
+        except Exception as e:
+            print(f"Signal extraction not ready: {e}") # Still completes in the background
+        yield sse_event("done", {})
+
+    return app.response_class(generate(), mimetype='text/event-stream',
+                              headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route('/api/notes/<note_id>', methods=['PUT'])
 def update_note(note_id):
     data = request.json
-    user_role = data.get('role', 'clinician')
+    user_role = parse_role(data.get('role', 'clinician'))
     
-    note = next((n for n in notes if n['id'] == note_id), None)
+    note = find_note(note_id)
     if not note:
         return jsonify({"error": "Note not found"}), 404
         
     if not can_edit_note(user_role, note):
         return jsonify({"error": "Unauthorized"}), 403
+    affected = affected_roles(note)
         
     # Versioning
-    prev_version = copy.deepcopy(note)
-    # Remove history from the copy to avoid recursion/bloat
-    prev_version['history'] = [] 
+    # Snapshot without history to avoid recursion/bloat
+    with metrics.phase('copy'):
+        prev_version = note.snapshot()
     
-    note['history'].append(prev_version)
-    note['version'] += 1
-    note['content'] = data.get('content', note['content'])
-    note['timestamp'] = get_current_time() # Update timestamp on edit? Or keep original? Usually edit time.
+    note.history.append(version_store.put(note.id, prev_version))
+    note.version += 1
+    note.content = data.get('content', note.content)
+    reanchor_highlights(note, prev_version.content)
+    note.timestamp = get_current_time() # Update timestamp on edit? Or keep original? Usually edit time.
+    note_timestamps.set(note.id, note.timestamp)
     
     # Conflict Resolution Logic (Simulation)
     # If clinician edits AI note, it overrides.
-    if user_role == 'clinician' and note['author_role'] == 'ai':
-        note['author_role'] = 'clinician' # Take ownership or keep as AI but 'confirmed'?
+    if user_role == Role.CLINICIAN and note.author_role == Role.AI:
+        note.author_role = Role.CLINICIAN # Take ownership or keep as AI but 'confirmed'?
         # Let's keep original author but maybe add 'last_editor'
-        note['last_editor'] = 'clinician'
+        note.last_editor = Role.CLINICIAN
 
-    return jsonify(note)
+    search_index.update(note)
+    glance_index.add(note)
+    note_changed(note, affected)
+    return jsonify(note_with_history(note))
 
 @app.route('/api/notes/<note_id>/revert', methods=['POST'])
 def revert_note(note_id):
@@ -649,20 +1255,24 @@ def revert_note(note_id):
     Designed for the 'Undo' functionality for clinicians modifying AI notes.
     """
     data = request.json
-    user_role = data.get('role', 'clinician')
+    user_role = parse_role(data.get('role', 'clinician'))
     
-    note = next((n for n in notes if n['id'] == note_id), None)
+    note = find_note(note_id)
     if not note:
         return jsonify({"error": "Note not found"}), 404
         
     if not can_edit_note(user_role, note):
         return jsonify({"error": "Unauthorized"}), 403
         
-    if not note.get('history'):
+    if not note.history:
         return jsonify({"error": "No history to revert to"}), 400
+    affected = affected_roles(note)
         
     # Get the last version from history
-    prev_version = note['history'].pop()
+    prev_version = version_store.get(note.id, note.history[-1].version)
+    if prev_version is None:
+        return jsonify({"error": "Previous version not found"}), 404
+    prev_stub = note.history.pop()
     
     # Save current state as a 'reverted_from' version? 
     # Or just discard current state and go back?
@@ -678,8 +1288,8 @@ def revert_note(note_id):
     
     # Let's treat 'revert' as a new edit that restores old content.
     # 1. Archive current state to history.
-    current_state_to_archive = copy.deepcopy(note)
-    current_state_to_archive['history'] = [] # Don't nest history
+    with metrics.phase('copy'):
+        current_state_to_archive = note.snapshot() # Don't nest history
     
     # 2. Restore content/author from prev_version
     # Ideally we find the target version. If we just pop, we lose the 'current' bad state if we don't save it.
@@ -707,33 +1317,86 @@ def revert_note(note_id):
     # So we must NOT destroy history.
     
     # Put it back
-    note['history'].append(prev_version)
+    note.history.append(prev_stub)
     
     # Create new version
-    note['version'] += 1
+    note.version += 1
     
     # Restore fields from target_version
-    note['content'] = target_version['content']
-    note['author_role'] = target_version['author_role']
-    # note['type'] = target_version['type'] # Type usually doesn't change
+    note.content = target_version.content
+    reanchor_highlights(note, current_state_to_archive.content)
+    if target_version.author_role is not MISSING: # Legacy history entries may omit it
+        note.author_role = target_version.author_role
+    # note.type = target_version.type # Type usually doesn't change
     
     # Add metadata about revert
-    note['reverted_at'] = get_current_time()
-    note['reverted_by'] = user_role
+    note.reverted_at = get_current_time()
+    note.reverted_by = user_role
     
     # Save the state BEFORE revert (the bad edit) to history?
     # The 'prev_version' we appended back is v1.
     # We need to append v2 (the current state before revert) to history.
     # So:
-    # 1. note['history'] currently has [v1]. note is v2.
+    # 1. note.history currently has [v1]. note is v2.
     # 2. We want note to be v3 (copy of v1). history to be [v1, v2].
     
-    note['history'].append(current_state_to_archive)
+    note.history.append(version_store.put(note.id, current_state_to_archive))
     
     # Now note is updated.
+    search_index.update(note)
+    glance_index.add(note)
+    note_changed(note, affected)
     
-    return jsonify(note)
+    return jsonify(note_with_history(note))
+
+
+@app.route('/api/notes/<note_id>/history', methods=['GET'])
+def get_note_history(note_id):
+    """Full previous versions of a note, oldest first (side panel)."""
+    user_role = parse_role(request.args.get('role', 'clinician'))
+    note, versions = read_note(note_id)
+    if not note or not can_view_note(user_role, note):
+        return jsonify({"error": "Note not found"}), 404
+    return jsonify([v.to_dict() for v in versions.history(note.id, note.history or [])])
+
+@app.route('/api/notes/<note_id>/versions/<int:version>', methods=['GET'])
+def get_note_version(note_id, version):
+    user_role = parse_role(request.args.get('role', 'clinician'))
+    note, versions = read_note(note_id)
+    if not note or not can_view_note(user_role, note):
+        return jsonify({"error": "Note not found"}), 404
+    found = note_version(note, version, versions)
+    if found is None:
+        return jsonify({"error": "Version not found"}), 404
+    return jsonify(found.to_dict())
+
+@app.route('/api/notes/<note_id>/diff', methods=['GET'])
+def diff_note_versions(note_id):
+    """
+    The single changed region between two versions (default: previous vs
+    current), found from the common prefix and suffix of their content.
+    """
+    user_role = parse_role(request.args.get('role', 'clinician'))
+    note, versions = read_note(note_id)
+    if not note or not can_view_note(user_role, note):
+        return jsonify({"error": "Note not found"}), 404
+    try:
+        to_version = int(request.args.get('to', note.version))
+        from_version = int(request.args.get('from', to_version - 1))
+    except ValueError:
+        return jsonify({"error": "Invalid version"}), 400
+    old, new = note_version(note, from_version, versions), note_version(note, to_version, versions)
+    if old is None or new is None:
+        return jsonify({"error": "Version not found"}), 404
 
+    start, old_end, new_end = edit_region(old.content, new.content)
+    return jsonify({
+        "from": from_version,
+        "to": to_version,
+        "start": start,
+        "removed": old.content[start:old_end],
+        "inserted": new.content[start:new_end]
+    })
 
 @app.route('/api/notes/<note_id>/highlight', methods=['POST'])
 def add_highlight(note_id):
@@ -742,129 +1405,153 @@ def add_highlight(note_id):
     start = data.get('start')
     end = data.get('end')
     
-    note = next((n for n in notes if n['id'] == note_id), None)
+    note = find_note(note_id)
     if not note:
         return jsonify({"error": "Note not found"}), 404
         
-    new_highlight = {
-        "id": generate_id(),
-        "text": text,
-        "type": "user-highlight", # Distinguish from AI risk
-        "start": start,
-        "end": end
-    }
+    new_highlight = Highlight(
+        id=generate_id(),
+        text=text,
+        type=HighlightType.USER_HIGHLIGHT, # Distinguish from AI risk
+        start=start,
+        end=end
+    )
+    # Offsets must point at the text; otherwise use its nearest occurrence
+    if not is_anchored(new_highlight, note.content):
+        position = find_nearest(note.content, text or '', start if isinstance(start, int) else 0)
+        if position == -1:
+            return jsonify({"error": "Highlight text not found in note"}), 400
+        new_highlight.start, new_highlight.end = position, position + len(text)
     
-    if 'highlights' not in note:
-        note['highlights'] = []
+    if note.highlights is MISSING:
+        note.highlights = []
         
-    note['highlights'].append(new_highlight)
+    note.highlights.append(new_highlight)
+    local_extractor.learn(text)
+    highlight_model.update(text, +1)
+    note_changed(note)
+    response_cache.invalidate(views=('glance',)) # Learned priorities re-rank every glance
     
-    return jsonify(note)
+    return jsonify(note.to_dict())
 
 @app.route('/api/notes/<note_id>/highlight/<highlight_id>', methods=['DELETE'])
 def remove_highlight(note_id, highlight_id):
-    note = next((n for n in notes if n['id'] == note_id), None)
+    note = find_note(note_id)
     if not note:
         return jsonify({"error": "Note not found"}), 404
         
-    if 'highlights' in note:
-        note['highlights'] = [h for h in note['highlights'] if h['id'] != highlight_id]
+    if note.highlights:
+        highlight_key = pack_id(highlight_id)
+        for h in note.highlights:
+            if h.id != highlight_key:
+                continue
+            if h.type == HighlightType.USER_HIGHLIGHT:
+                local_extractor.forget(h.text)
+                highlight_model.update(h.text, -1) # Undoes the user highlight
+            else:
+                highlight_model.dismiss(h.text) # Negative feedback
+        note.highlights = [h for h in note.highlights if h.id != highlight_key]
+        note_changed(note)
+        response_cache.invalidate(views=('glance',))
         
-    return jsonify(note)
+    return jsonify(note.to_dict())
 
 @app.route('/api/glance', methods=['GET'])
 def get_glance():
-    user_role = request.args.get('role', 'clinician')
-    
-    if user_role == 'patient':
+    user_role = parse_role(request.args.get('role', 'clinician'))
+    return cached_view('glance', user_role, build_glance, max_age=GLANCE_CACHE_SECONDS)
+
+def build_glance(user_role):
+    if user_role == Role.PATIENT:
         return jsonify({"key_signals": [], "actions": [], "clinician_confirmed": []})
     
     # Gather highlights and actions from all notes
-    all_highlights = []
-    all_actions = copy.deepcopy(system_actions)
+    highlight_notes = []
+    all_actions = [a.to_dict() for a in system_actions]
     confirmed_items = []
-    ai_scribed_notes = []
-
-    for n in notes:
-        can_view = can_view_note(user_role, n)
-
-        # AI Scribed Notes
-        # Check if note is AI-generated (type starts with ai_)
-        # Even if edited by clinician (author_role changed), it remains an AI-scribed note in essence.
-        if can_view and n.get('type', '').startswith('ai_'):
-            ai_scribed_notes.append({
-                "id": n['id'],
-                "type": n['type'].replace('ai_', '').replace('_', ' ').title(),
-                "summary": n['content'][:100] + "..." if len(n['content']) > 100 else n['content'],
-                "timestamp": n['timestamp'],
-                "author_role": n['author_role']
-            })
 
-        # Highlights with Decay
-        if can_view:
-            decay_weight = calculate_decay_weight(n['timestamp'])
-
-            for h in n.get('highlights', []):
-                h['source_note_id'] = n['id']
-                h['weight'] = decay_weight
-                h['timestamp'] = n['timestamp'] # For sorting
-                
-                # Decay Filtering: Skip old non-critical items
-                if decay_weight < 0.2 and h.get('type') != 'critical':
-                    continue
-                    
-                all_highlights.append(h)
+    with metrics.phase('rbac'):
+        visibility = [can_view_note(user_role, n) for n in notes]
+
+    for n, can_view in zip(notes, visibility):
+
+        # Highlights with Decay (scored after the loop in one pass)
+        if can_view and n.highlights:
+            highlight_notes.append(n)
         
         # Actions
-        # Allow viewing actions assigned to the user even if the note itself is hidden (Task Assignment)
-        for a in n.get('actions', []):
-            # Filtering Rule:
-            # 1. Show only derived actions (assigned to me)
-            # 2. Show only unresolved
-            
-            # Special case for Admin: see everything? Or adhere to strict flow?
-            # Let's adhere to flow, but Admin can see all unresolved.
-            
-            is_visible = False
-            if user_role == 'admin':
-                is_visible = True
-            elif a.get('assigned_to_role') == user_role and a.get('status') in ['unresolved', 'pending']:
-                is_visible = True
-                
-            if is_visible:
-                all_actions.append(a)
-
-        # Clinician Confirmed Logic
-        # 1. Decisions/Plans (explicit types or keywords)
-        if can_view and n['author_role'] == 'clinician':
-            is_plan = 'plan' in n['content'].lower() or 'decision' in n['content'].lower()
-            if is_plan or n['type'] == 'clinician_note':
-                confirmed_items.append({
-                    "id": n['id'],
-                    "text": f"Decision: {n['content'][:50]}...",
-                    "source_note_id": n['id'],
-                    "type": "decision"
-                })
-            
-            # 2. Modified AI Content
-            # If clinician is author but history has AI versions, or we flag it
-            if n.get('history'):
-                # Check if original was AI
-                first_ver = n['history'][0]
-                if first_ver.get('author_role') == 'ai':
-                    confirmed_items.append({
-                        "id": n['id'] + "_mod",
-                        "text": "Modified AI Consult",
-                        "source_note_id": n['id'],
-                        "type": "modification"
-                    })
+        # Special case for Admin: see everything (clinic-scoped oversight).
+        # Other roles read their queue from the action index after the loop.
+        if user_role == Role.ADMIN:
+            all_actions.extend(a.to_dict() for a in n.actions)
+    if user_role == Role.ADMIN:
+        all_actions.extend(cold_actions()) # After the hot notes': cold ones are older
+
+    # AI Scribed Notes and Clinician Confirmed items come from the glance
+    # index (classified when the notes were written)
+    def visible(note):
+        return can_view_note(user_role, note)
+    ai_scribed_notes = glance_index.ai_scribed(visible)
             
+    # Role queue
+    # Allow viewing actions assigned to the user even if the note itself is hidden (Task Assignment)
+    # Filtering Rule:
+    # 1. Show only derived actions (assigned to me)
+    # 2. Show only unresolved
+    if user_role != Role.ADMIN:
+        all_actions.extend(a.to_dict() for a in action_index.query([user_role], OPEN_ACTION_STATUSES,
+                                                                    by_priority=False))
+
     # Filter for "Only Clinician Visible" requirement
-    if user_role not in ['clinician', 'admin']:
-        confirmed_items = []
+    if user_role in (Role.CLINICIAN, Role.ADMIN):
+        confirmed_items = glance_index.confirmed(visible)
         
-    # Sort highlights: High weight first, then recent first
-    all_highlights.sort(key=lambda x: (x.get('weight', 0), x.get('timestamp', '')), reverse=True)
+    # Highlights with Decay: weights, filter and sort in one vectorized pass
+    all_highlights = []
+    cold_notes = cold_glance_notes(user_role) if cold_store is not None else []
+    if highlight_notes or cold_notes:
+        note_epochs = np.concatenate([note_timestamps.epochs([n.id for n in highlight_notes]),
+                                      np.array([n.timestamp for n in cold_notes], dtype=np.float64)])
+        highlight_notes += cold_notes
+        note_weights = decay_weights(note_epochs, curve=DECAY_CURVE)
+        counts = []
+
+        # Ranked on references into the notes; signal dicts are built only
+        # for the highlights that survive the decay filter
+        flat_highlights = [] # (note position, highlight)
+        critical = []
+        priorities = []
+        for position, n in enumerate(highlight_notes):
+            count = 0
+            for h in n.highlights:
+                if is_orphaned(h): # Text edited away: no valid provenance
+                    continue
+                count += 1
+                flat_highlights.append((position, h))
+                critical.append(h.type == HighlightType.CRITICAL)
+                priorities.append(1.0 if h.type == HighlightType.USER_HIGHLIGHT else highlight_model.priority(h.text))
+            counts.append(count)
+
+        # Decay Filtering: Skip old non-critical items
+        # Sort highlights: High weight first, then recent first
+        # AI highlights are scaled by the priority learned from user feedback
+        order = rank_highlights(np.repeat(note_weights, counts), np.repeat(note_epochs, counts), critical,
+                                priorities)
+        weights = note_weights.tolist()
+        sources = {} # note position -> (source_note_id, timestamp)
+        for i in order:
+            position, h = flat_highlights[i]
+            source = sources.get(position)
+            if source is None:
+                n = highlight_notes[position]
+                source = sources[position] = (unpack_id(n.id), format_timestamp(n.timestamp))
+            signal = h.to_dict()
+            signal['source_note_id'] = source[0]
+            signal['weight'] = weights[position]
+            signal['timestamp'] = source[1]
+            if h.type != HighlightType.USER_HIGHLIGHT:
+                signal['learned_priority'] = priorities[i]
+            all_highlights.append(signal)
 
     return jsonify({
         "actions": all_actions,
@@ -873,13 +1560,362 @@ def get_glance():
         "ai_scribed_notes": ai_scribed_notes
     })
 
+@app.route('/api/actions', methods=['GET'])
+def list_actions():
+    """
+    A role's action queue from the action index, in O(results).
+    Ordered by priority (high first), then most recently created/updated.
+    Done actions of cold notes (not indexed) follow, in the same order.
+    status: open (pending + unresolved, default) | pending | unresolved | resolved
+    Admin sees every role's queue.
+    """
+    user_role = parse_role(request.args.get('role', 'clinician'))
+    status = request.args.get('status', 'open')
+    tag = request.args.get('tag')
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    if status == 'open':
+        statuses = OPEN_ACTION_STATUSES
+    else:
+        statuses = (ActionStatus.parse(status),)
+        if not isinstance(statuses[0], ActionStatus):
+            return jsonify({"error": f"Unknown status '{status}'"}), 400
+
+    roles = [user_role]
+    if user_role == Role.ADMIN:
+        roles = list(Role)
+
+    actions = action_index.query(roles, statuses, limit=limit, tag=tag)
+    if len(actions) < limit and not set(statuses) <= set(OPEN_ACTION_STATUSES):
+        cold = [a for a in map(Action.from_dict, cold_actions())
+                if a.assigned_to_role in roles and a.status in statuses and (tag is None or tag in (a.tags or ()))]
+        actions += sorted(cold, key=lambda a: priority_rank(a.priority))[:limit - len(actions)]
+    return jsonify([a.to_dict() for a in actions])
+
+@app.route('/api/search', methods=['GET'])
+def search_notes():
+    """
+    Full-text search over note content.
+    Results respect can_view_note and rank matches inside highlights higher.
+    """
+    user_role = parse_role(request.args.get('role', 'clinician'))
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Missing query parameter 'q'"}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    with metrics.phase('search'):
+        hits = search_index.search(query, visible=lambda n: can_view_note(user_role, n), limit=limit)
+        if cold_store is not None and request.args.get('archive') == '1':
+            # Cold notes aren't indexed; opt-in scan, linear in the cold tier
+            archive = SearchIndex()
+            for segment, entry in visible_cold_entries(user_role):
+                archive.add(Note.from_dict(cold_store.read(segment, entry)))
+            hits = sorted(hits + archive.search(query, limit=limit), key=lambda hit: hit[0], reverse=True)[:limit]
+
+    results = []
+    for score, n, matches in hits:
+        snippet, snippet_start = make_snippet(n.content, matches)
+        results.append({
+            "note_id": unpack_id(n.id),
+            "type": label(n.type),
+            "author_role": label(n.author_role),
+            "timestamp": format_timestamp(n.timestamp),
+            "score": round(score, 4),
+            "snippet": snippet,
+            "snippet_start": snippet_start,
+            "matches": [{"start": s, "end": e} for s, e in matches]
+        })
+    return jsonify({"query": query, "results": results})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition (opt-in, see METRICS_ENABLED)."""
+    if not metrics.enabled():
+        return jsonify({"error": "Metrics disabled (set METRICS_ENABLED=1)"}), 404
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/profile', methods=['POST'])
+def profile_server():
+    """
+    Samples every request thread's stack for `seconds` (max 60) and returns
+    folded stacks (flamegraph.pl / speedscope input). Opt-in with metrics.
+    """
+    if not metrics.enabled():
+        return jsonify({"error": "Profiling disabled (set METRICS_ENABLED=1)"}), 404
+    try:
+        seconds = min(float(request.args.get('seconds', 10)), 60.0)
+        interval_ms = max(float(request.args.get('interval_ms', 5)), 1.0)
+    except ValueError:
+        return jsonify({"error": "Invalid seconds or interval_ms"}), 400
+
+    stacks = sample_stacks(seconds, interval_ms / 1000.0)
+    if stacks is None:
+        return jsonify({"error": "A profile is already running"}), 409
+    return app.response_class(format_folded(stacks), mimetype='text/plain')
+
 @app.route('/api/reset', methods=['POST'])
 def reset():
-    global notes, system_actions
-    notes = []
-    system_actions = []
+    load_store([])
+    if cold_store is not None:
+        cold_store.clear()
     return jsonify({"status": "reset"})
 
+# --- Tiered Storage ---
+
+def visible_cold_entries(user_role):
+    """RBAC for cold notes comes from the segments' per-role visibility indexes."""
+    return cold_store.visible_entries(int(user_role)) if isinstance(user_role, int) else []
+
+def cold_glance_notes(user_role):
+    """
+    Cold notes as glance stubs. Only critical highlights survive the decay
+    filter at that age, so they are all the segment index keeps.
+    """
+    return [Note.from_dict({"id": entry['id'], "timestamp": entry['epoch'], "highlights": entry['critical']})
+            for segment, entry in visible_cold_entries(user_role) if entry.get('critical')]
+
+def cold_entry(note):
+    """Segment index metadata for a note moving to the cold tier."""
+    data = note.to_dict()
+    return {
+        "id": data['id'],
+        "epoch": note.timestamp,
+        "type": data.get('type'),
+        "roles": [int(role) for role in Role if can_view_note(role, note)],
+        "critical": [h.to_dict() for h in note.highlights or ()
+                     if h.type == HighlightType.CRITICAL and not is_orphaned(h)],
+        "learned": [h.text for h in note.highlights or () if h.type == HighlightType.USER_HIGHLIGHT],
+        "actions": data.get('actions') or [] # None open: a cold note's actions are done
+    }
+
+def cold_actions():
+    """Actions of cold notes (dicts, from their segment index entries), newest note first."""
+    if cold_store is None:
+        return []
+    entries = sorted((entry for _, entry in cold_store.entries() if entry.get('actions')),
+                     key=lambda entry: entry['epoch'], reverse=True)
+    return [action for entry in entries for action in entry['actions']]
+
+def is_cold_candidate(note, cutoff):
+    return (isinstance(note.timestamp, int) and note.timestamp < cutoff
+            and not any(a.status in OPEN_ACTION_STATUSES for a in note.actions or ()))
+
+def check_key_file():
+    """
+    Raises unless the key file's primary key is the keyring's. If another
+    process rotated the keys, records written under ours would be
+    unreadable once it retires the old ones.
+    """
+    if cipher is None:
+        return
+    try:
+        primary = read_keys(KEY_FILE)[:1]
+    except OSError:
+        primary = []
+    if primary != cipher.keys[:1]:
+        raise RuntimeError(f"{KEY_FILE} no longer has this process's primary key; not writing under a stale key")
+
+def snapshot_store():
+    """
+    Moves old notes to a new cold segment, merges segments when they pile
+    up, and snapshots the hot tier. Returns the number of notes moved.
+    """
+    global notes
+    cutoff = now_epoch() - HOT_NOTE_DAYS * SECONDS_PER_DAY
+    with store_lock:
+        check_key_file()
+        frozen_at = [i for i, n in enumerate(notes) if is_cold_candidate(n, cutoff)]
+        if frozen_at:
+            frozen = [notes[i] for i in frozen_at]
+            cold_store.freeze([(cold_entry(n), n.to_dict(),
+                                [v.to_dict() for v in version_store.history(n.id, n.history or [])])
+                               for n in frozen])
+            # Consult watermarks count notes already summarized (the list's tail)
+            for session in consult_sessions.values():
+                summarized_from = len(notes) - session['watermark']
+                session['watermark'] -= sum(1 for i in frozen_at if i >= summarized_from)
+            dropped = set(frozen_at)
+            notes = [n for i, n in enumerate(notes) if i not in dropped]
+            for n in frozen:
+                search_index.remove(n.id)
+                glance_index.remove(n.id)
+                note_timestamps.remove(n.id)
+                version_store.drop(n.id, n.history or [])
+                for a in n.actions or []:
+                    action_index.remove(a.id)
+            response_cache.invalidate()
+        cold_store.merge()
+        cold_store.write_hot([note_with_history(n) for n in notes])
+        cold_store.write_model({"dismissed": dict(highlight_model.dismissed)})
+    return len(frozen_at)
+
+def thaw_note(note_id):
+    """Moves a cold note back into the hot tier and its indexes."""
+    with store_lock:
+        key = pack_id(note_id)
+        hot = next((n for n in notes if n.id == key), None)
+        if hot is not None: # Thawed by another request meanwhile
+            return hot
+        taken = cold_store.take(note_id)
+        if taken is None:
+            return None
+        record, versions = taken
+        note = Note.from_dict(record)
+        note.history = version_store.load(note.id, [Note.from_dict(v) for v in versions])
+        notes.append(note) # With the old notes: not "new" for consult sessions
+        for session in consult_sessions.values():
+            session['watermark'] += 1
+    index_note(note)
+    glance_index.add(note, top=False)
+    note_changed(note)
+    return note
+
+def run_snapshotter():
+    while True:
+        try:
+            moved = snapshot_store()
+            if moved:
+                print(f"Snapshot: moved {moved} notes to the cold tier ({len(cold_store)} cold).")
+        except Exception as e:
+            print(f"Snapshot error: {e}")
+        time.sleep(SNAPSHOT_INTERVAL)
+
+if cold_store is not None:
+    metrics.register_gauge('cold_notes_stored', 'Notes in cold segments.', lambda: len(cold_store))
+
+# --- Key Rotation ---
+# POST /api/keys/rotate (admin) adds a new primary key to the keyring and
+# key file, then a background job re-wraps every stored record's data key
+# under it: cold segments one at a time (paced to REKEY_BYTES_PER_SEC), the
+# hot snapshot and the data file. The server keeps serving throughout (the
+# keyring still decrypts with the old keys); once everything is rewritten
+# the old keys are retired from the key file. GET reports the job status.
+REKEY_BYTES_PER_SEC = float(os.environ.get("REKEY_BYTES_PER_SEC", 8 * 1024 * 1024)) # 0 = unpaced
+rekey_status = {"status": "idle"}
+rekey_lock = threading.Lock()
+
+def rekey_store():
+    """Re-keys everything stored under the keyring's primary key, then retires the old keys."""
+    written = 0
+    if cold_store is not None:
+        written += cold_store.rekey(REKEY_BYTES_PER_SEC)
+        with store_lock:
+            cold_store.write_hot([note_with_history(n) for n in notes])
+            cold_store.write_model({"dismissed": dict(highlight_model.dismissed)})
+        written += os.path.getsize(cold_store.hot_path)
+    data_file = app.config.get('NOTES_FILE', DATA_FILE)
+    if os.path.exists(data_file):
+        written += rotate_note_file(data_file, cipher)
+    cipher.retire()
+    cipher.save(KEY_FILE)
+    return written
+
+def run_rekey():
+    started = time.perf_counter()
+    try:
+        written = rekey_store()
+    except Exception as e:
+        print(f"Key rotation error: {e}")
+        rekey_status.update(status="failed", error=str(e))
+    else:
+        rekey_status.update(status="done", bytes_written=written)
+        print(f"Key rotation done: {written} bytes re-keyed, old keys retired.")
+    rekey_status['seconds'] = round(time.perf_counter() - started, 3)
+    rekey_lock.release()
+
+@app.route('/api/keys/rotate', methods=['POST'])
+def rotate_keys():
+    if parse_role(request.args.get('role')) != Role.ADMIN:
+        return jsonify({"error": "Unauthorized"}), 403
+    if cipher is None:
+        return jsonify({"error": "Encryption is not configured (no key file)"}), 409
+    if not rekey_lock.acquire(blocking=False):
+        return jsonify({"error": "A key rotation is already running"}), 409
+    with store_lock: # Snapshots check the key file against the keyring
+        cipher.add_key()
+        cipher.save(KEY_FILE) # Before anything is written under the new key
+    rekey_status.clear()
+    rekey_status.update(status="running", keys=len(cipher))
+    threading.Thread(target=run_rekey, name="rekey", daemon=True).start()
+    return jsonify(rekey_status), 202
+
+@app.route('/api/keys/rotate', methods=['GET'])
+def key_rotation_status():
+    if parse_role(request.args.get('role')) != Role.ADMIN:
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify(rekey_status)
+
+# --- Application Factory ---
+# Importing this module only defines the app: no data is read and the LLM
+# SDK is imported on the first call (llm_client.GeminiProvider). Servers
+# call create_app(), which takes TIER_DIR's writer lock, loads the store
+# (in the background by default) and starts the snapshotter. Tests and
+# tools can skip all of that and use load_store() directly.
+#
+# config: Flask config overrides, plus
+#   STORE_LOAD  background (default) | sync | none
+#   NOTES_FILE  data file to load (default: the NOTES_FILE env var / note.json)
+
+metrics.register_gauge('store_load_seconds', 'Time the startup store load took.',
+                       lambda: store_status.get('load_seconds', 0))
+
+def run_store_load(data_file):
+    started = time.perf_counter()
+    try:
+        result = {"status": "ready", "loaded": load_initial_store(data_file)}
+    except Exception as e:
+        print(f"Error loading notes: {e}")
+        result = {"status": "failed", "error": str(e)}
+    result['load_seconds'] = round(time.perf_counter() - started, 3)
+    result['ready_seconds'] = round(time.perf_counter() - IMPORT_STARTED, 3)
+    print(f"Store {result['status']}: {result.get('loaded', 'nothing loaded')} in "
+          f"{result['load_seconds']}s ({result['ready_seconds']}s after import)")
+    store_status.update(result)
+    store_ready.set() # Also after a failure: serve the empty store, as before
+
+def create_app(config=None):
+    config = dict(config or {})
+    mode = config.setdefault('STORE_LOAD', os.environ.get("STORE_LOAD", "background"))
+    if mode not in ("background", "sync", "none"):
+        raise ValueError(f"Unknown STORE_LOAD '{mode}'. Options: background, sync, none")
+    data_file = config.setdefault('NOTES_FILE', DATA_FILE)
+    app.config.update(config)
+    if cold_store is not None:
+        cold_store.lock() # Fails here rather than letting two processes write TIER_DIR
+
+    if llm:
+        print(f"LLM configured ({LLM_PROVIDER}, model {GEMINI_MODEL}).")
+    else:
+        print("WARNING: GEMINI_API_KEY not set. AI features will fallback to basic simulation.")
+
+    imported = round(time.perf_counter() - IMPORT_STARTED, 3)
+    if mode == "none":
+        store_status['import_seconds'] = imported
+    else:
+        store_ready.clear()
+        store_status.clear()
+        store_status.update(status="loading", import_seconds=imported)
+        if mode == "sync":
+            run_store_load(data_file)
+        else:
+            threading.Thread(target=run_store_load, args=(data_file,), name="store-load", daemon=True).start()
+    if cold_store is not None:
+        threading.Thread(target=run_snapshotter, name="snapshotter", daemon=True).start()
+    return app
+
+@app.route('/api/ready', methods=['GET'])
+def readiness():
+    """200 once the startup load is done, else 503; includes the cold-start timings."""
+    code = 200 if store_status['status'] == "ready" else 503
+    return jsonify(store_status), code
+
 if __name__ == '__main__':
     # TLS Configuration (Optional for Local Demo)
     # To enable HTTPS, uncomment the lines below and ensure cert.pem/key.pem exist.
@@ -893,4 +1929,9 @@ if __name__ == '__main__':
     
     # Default to HTTP for local ease of use (avoiding self-signed cert warnings)
     print("Starting in HTTP mode (TLS disabled for local demo)...")
+    # The debug reloader runs this file in a watcher process that never
+    # serves and again in the serving child (WERKZEUG_RUN_MAIN set). Only
+    # the child loads the store and runs the snapshotter.
+    if os.environ.get("WERKZEUG_RUN_MAIN"):
+        create_app()
     app.run(debug=True, port=5001)
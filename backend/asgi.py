@@ -0,0 +1,197 @@
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request
+from werkzeug.exceptions import HTTPException
+
+import app as backend
+from admission import Ticket
+from llm_client import arun_steps
+
+# --- ASGI Serving Mode ---
+# `application` serves the Flask app from an asyncio ASGI server, e.g.
+#   uvicorn asgi:application --app-dir backend
+# (one worker: the note store lives in process memory). Routes that wait
+# on the LLM run their call steps on the event loop and await each call,
+# so many consults can be in flight at once without a thread apiece. All
+# other routes go through Flask's WSGI app on a small thread pool. Both
+# paths run Flask's request hooks (CORS, metrics, admission) and error
+# handling, so routes and RBAC behave as under app.run(). The store is
+# loaded (create_app) on lifespan startup. LLM routes are
+# admitted here before dispatch, so queueing for a lane slot is awaited
+# instead of blocking the event loop.
+
+# Flask endpoint -> call steps taking the request JSON (see app.py)
+STEP_ROUTES = {
+    'create_note': backend.create_note_steps,
+    'end_consult': backend.end_consult_steps,
+}
+
+# Threads for the WSGI routes (they don't wait on the LLM)
+WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", 8))
+wsgi_pool = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI http scope and its full request body."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if key == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif key != 'CONTENT_LENGTH':
+            key = 'HTTP_' + key
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _start_message(status, headers):
+    return {'type': 'http.response.start', 'status': status,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]}
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+def step_route(environ):
+    """The call steps for the request's route, or None."""
+    try:
+        endpoint, _ = backend.app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        return None
+    return STEP_ROUTES.get(endpoint)
+
+
+def request_role(body):
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        return None
+    return (data.get('role') or data.get('author_role')) if isinstance(data, dict) else None
+
+
+async def serve_steps(steps_for, environ, body, send):
+    """Admits the request, then runs its route's call steps on the event loop."""
+    ticket = None
+    if backend.ADMISSION_CONTROL:
+        # A Ticket, or the Rejected that admit_request answers with a 429
+        ticket = environ['admission.ticket'] = await backend.admit_async('llm', request_role(body), environ)
+    try:
+        await dispatch_steps(steps_for, environ, send)
+    finally:
+        if isinstance(ticket, Ticket):
+            ticket.release()
+
+
+async def dispatch_steps(steps_for, environ, send):
+    """Like Flask's full_dispatch_request, with the call steps awaited."""
+    flask_app = backend.app
+    with flask_app.request_context(environ):
+        try:
+            try:
+                rv = flask_app.preprocess_request()
+                if rv is None:
+                    rv = await arun_steps(steps_for(request.json), backend.llm)
+            except Exception as e:
+                rv = flask_app.handle_user_exception(e)
+            response = flask_app.finalize_request(rv)
+        except Exception as e:
+            response = flask_app.handle_exception(e)
+        body = response.get_data()
+        await send(_start_message(response.status_code, response.headers.items()))
+        await send({'type': 'http.response.body', 'body': body})
+
+
+async def serve_wsgi(environ, send):
+    """Runs the Flask WSGI app on the thread pool, forwarding body chunks as they come."""
+    loop = asyncio.get_running_loop()
+
+    def reply(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    def run():
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [int(status.split(' ', 1)[0]), headers]
+            return lambda data: reply({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+        result = backend.app(environ, start_response)
+        try:
+            sent_start = False
+            for chunk in result:
+                if not chunk:
+                    continue
+                if not sent_start:
+                    reply(_start_message(*started))
+                    sent_start = True
+                reply({'type': 'http.response.body', 'body': bytes(chunk), 'more_body': True})
+            if not sent_start:
+                reply(_start_message(*started))
+            reply({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    await loop.run_in_executor(wsgi_pool, run)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            backend.create_app() # The store loads in the background; see /api/ready
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            wsgi_pool.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        raise ValueError(f"Unsupported ASGI scope type '{scope['type']}'")
+    body = await read_body(receive)
+    if body is None:
+        return # Client went away before sending the request
+    environ = build_environ(scope, body)
+    steps_for = step_route(environ)
+    if steps_for is not None:
+        await serve_steps(steps_for, environ, body, send)
+    else:
+        await serve_wsgi(environ, send)
@@ -0,0 +1,304 @@
+import fcntl
+import json
+import os
+import threading
+import time
+
+from note_file import CHUNKED_HEADER, encode_chunk
+from segments import Segment, rotate_segment, write_segment
+
+# --- Cold Note Tier ---
+# Old notes compacted out of memory into segment files (see segments.py)
+# under one directory:
+#   manifest.json   live segment names and tombstoned note ids
+#   seg-NNNNNN.nseg immutable segments; each note is a timeline record
+#                   (history as stubs) plus a record of its full versions
+#   hot.nc          snapshot of the hot tier (chunked note file)
+#   model.dat       learned state not derivable from the notes (highlight
+#                   dismissal counts), encrypted like the notes
+#   writer.lock     flock held by the one process allowed to write here
+# Only segment indexes are held in memory. A note is read in place
+# (peek) to be viewed, and taken out of its segment (tombstoned) to become
+# hot again only when it is written; dead
+# records are dropped when segments are merged. After a key rotation,
+# rekey() rewrites the segments one at a time under the new key while
+# reads go on. Neither closes the segments it replaces: a request that got
+# one from entries() keeps reading its mapping, which is unmapped once the
+# last reference goes.
+
+MANIFEST = "manifest.json"
+HOT_FILE = "hot.nc"
+MODEL_FILE = "model.dat"
+LOCK_FILE = "writer.lock"
+HOT_CHUNK_NOTES = 500
+
+
+def _dump(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+class ColdStore:
+
+    def __init__(self, directory, cipher=None):
+        self.directory = directory
+        self.cipher = cipher
+        self._segments = []
+        self._by_id = {} # note id (API string) -> (segment, entry)
+        self._action_notes = {} # action id -> note id, for entries listing 'actions'
+        self._tombstones = set()
+        self._next = 0
+        self._lock = threading.RLock()
+        self._writer = None # Open LOCK_FILE while this process holds it
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, note_id):
+        return note_id in self._by_id
+
+    @property
+    def hot_path(self):
+        return os.path.join(self.directory, HOT_FILE)
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.directory, MANIFEST))
+
+    def lock(self):
+        """
+        Claims the directory for this process's writes (an exclusive flock,
+        released on unlock or when the process exits). Raises RuntimeError
+        if another process holds it: two writers would overwrite each
+        other's snapshots.
+        """
+        if self._writer is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        f = open(os.path.join(self.directory, LOCK_FILE), 'a+')
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.seek(0)
+            holder = f.read().strip() or "unknown"
+            f.close()
+            raise RuntimeError(f"Tier directory {self.directory} is in use by another process (pid {holder})")
+        f.truncate(0)
+        f.write(str(os.getpid()))
+        f.flush()
+        self._writer = f
+
+    def unlock(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def open(self):
+        """Opens the segments listed in the manifest (indexes only)."""
+        with self._lock:
+            with open(os.path.join(self.directory, MANIFEST)) as f:
+                manifest = json.load(f)
+            self._close_all()
+            self._tombstones = set(manifest.get('tombstones', []))
+            self._next = manifest.get('next', 0)
+            for name in manifest.get('segments', []):
+                self._attach(Segment(os.path.join(self.directory, name), self.cipher))
+
+    def _attach(self, segment):
+        self._segments.append(segment)
+        for entry in segment.entries:
+            if entry['id'] not in self._tombstones:
+                self._by_id[entry['id']] = (segment, entry)
+                for action in entry.get('actions', ()):
+                    self._action_notes[action['id']] = entry['id']
+
+    def _close_all(self):
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+        self._by_id = {}
+        self._action_notes = {}
+
+    def _write_manifest(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({"segments": [s.name for s in self._segments], "tombstones": sorted(self._tombstones),
+                       "next": self._next}, f)
+        os.replace(path + '.tmp', path)
+
+    def entries(self):
+        """Live (segment, entry) pairs; entry is the note's index metadata."""
+        with self._lock:
+            return list(self._by_id.values())
+
+    def visible_entries(self, role):
+        """Live (segment, entry) pairs a role may see, from the segments' visibility indexes."""
+        with self._lock:
+            by_id = self._by_id
+            return [(segment, entry) for segment in self._segments
+                    for entry in segment.visible.get(role, ())
+                    if by_id.get(entry['id'], (None, None))[1] is entry]
+
+    def raw_record(self, segment, entry):
+        """The timeline record as stored JSON bytes (a view into the mapping if plaintext)."""
+        return segment.record_view(entry['records'][0])
+
+    def read(self, segment, entry):
+        """The note's timeline record (dict, history as stubs)."""
+        return json.loads(segment.record(entry['records'][0]))
+
+    def read_versions(self, segment, entry):
+        if len(entry['records']) < 2:
+            return []
+        return json.loads(segment.record(entry['records'][1]))
+
+    def freeze(self, items):
+        """
+        Writes one new segment. items: (meta, record, versions) with meta
+        holding at least 'id', record the timeline dict and versions the
+        full previous versions (dicts, oldest first).
+        """
+        if not items:
+            return None
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"seg-{self._next:06d}.nseg"
+            path = os.path.join(self.directory, name)
+            write_segment(path, [(meta, [_dump(record)] + ([_dump(versions)] if versions else []))
+                                 for meta, record, versions in items], self.cipher)
+            self._next += 1
+            self._tombstones.difference_update(meta['id'] for meta, _, _ in items)
+            self._attach(Segment(path, self.cipher))
+            self._write_manifest()
+            return name
+
+    def action_note(self, action_id):
+        """Id of the cold note holding an action, or None."""
+        with self._lock:
+            note_id = self._action_notes.get(action_id)
+            return note_id if note_id in self._by_id else None
+
+    def peek(self, note_id):
+        """A note's (record, versions), left in the cold tier, or None."""
+        with self._lock: # Merges close the segments they replace
+            found = self._by_id.get(note_id)
+            if found is None:
+                return None
+            segment, entry = found
+            return self.read(segment, entry), self.read_versions(segment, entry)
+
+    def take(self, note_id):
+        """Removes a note from the cold tier. Returns (record, versions) or None."""
+        with self._lock:
+            found = self._by_id.pop(note_id, None)
+            if found is None:
+                return None
+            segment, entry = found
+            result = self.read(segment, entry), self.read_versions(segment, entry)
+            self._tombstones.add(note_id)
+            self._write_manifest()
+            return result
+
+    def merge(self, max_segments=8, max_dead_ratio=0.25):
+        """
+        Rewrites all segments as one when there are too many or too many of
+        their records are tombstoned. Returns True if it merged.
+        """
+        with self._lock:
+            total = sum(len(s) for s in self._segments)
+            if not total:
+                return False
+            dead = total - len(self._by_id)
+            if len(self._segments) <= max_segments and dead / total <= max_dead_ratio:
+                return False
+            items = [(entry, self.read(seg, entry), self.read_versions(seg, entry))
+                     for seg, entry in self._by_id.values()]
+            old = self._segments
+            self._segments, self._by_id, self._action_notes, self._tombstones = [], {}, {}, set()
+            if items:
+                self.freeze([({k: v for k, v in meta.items() if k != 'records'}, record, versions)
+                             for meta, record, versions in items])
+            else:
+                self._write_manifest()
+            for segment in old:
+                os.remove(segment.path) # Not closed: readers may hold it
+            return True
+
+    def rekey(self, bytes_per_second=0):
+        """
+        Rewrites every segment with its records re-keyed under the cipher's
+        primary key (cipher.rotate), one segment at a time and sleeping to
+        stay under bytes_per_second (0: no limit). The lock is held only to
+        swap each new segment in; readers holding the old one keep its
+        mapping after the file is removed. A segment merged away while it
+        is being rotated is still read to the end (merge doesn't close it)
+        and its copy is discarded: the merge wrote its notes under the
+        primary key already. Returns the bytes written.
+        """
+        written = 0
+        with self._lock:
+            pending = list(self._segments)
+        for old in pending:
+            started = time.monotonic()
+            with self._lock:
+                if old not in self._segments: # Merged away meanwhile
+                    continue
+                name = f"seg-{self._next:06d}.nseg"
+                self._next += 1
+            path = os.path.join(self.directory, name)
+            rotate_segment(old, path, self.cipher)
+            with self._lock:
+                if old not in self._segments:
+                    os.remove(path)
+                    continue
+                new = Segment(path, self.cipher)
+                self._segments[self._segments.index(old)] = new
+                for entry in new.entries:
+                    if self._by_id.get(entry['id'], (None, None))[0] is old:
+                        self._by_id[entry['id']] = (new, entry)
+                self._write_manifest()
+            os.remove(old.path)
+            size = os.path.getsize(path)
+            written += size
+            if bytes_per_second:
+                time.sleep(max(0.0, size / bytes_per_second - (time.monotonic() - started)))
+        return written
+
+    def write_hot(self, records):
+        """Snapshots the hot tier (note dicts) for the next restart."""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.hot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(CHUNKED_HEADER)
+            for i in range(0, len(records), HOT_CHUNK_NOTES):
+                f.write(encode_chunk(records[i:i + HOT_CHUNK_NOTES], self.cipher))
+        os.replace(tmp_path, self.hot_path)
+
+    def write_model(self, state):
+        """Snapshots learned model state (a JSON-serializable dict) with the hot tier."""
+        os.makedirs(self.directory, exist_ok=True)
+        data = _dump(state)
+        if self.cipher is not None:
+            data = self.cipher.encrypt(data)
+        path = os.path.join(self.directory, MODEL_FILE)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def read_model(self):
+        path = os.path.join(self.directory, MODEL_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'rb') as f:
+            data = f.read()
+        return json.loads(self.cipher.decrypt(data) if self.cipher is not None else data)
+
+    def clear(self):
+        """Deletes every segment, the hot and model snapshots and the manifest."""
+        with self._lock:
+            paths = [s.path for s in self._segments]
+            self._close_all()
+            self._tombstones = set()
+            for path in paths + [self.hot_path, os.path.join(self.directory, MODEL_FILE),
+                                 os.path.join(self.directory, MANIFEST)]:
+                if os.path.exists(path):
+                    os.remove(path)
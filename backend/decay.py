@@ -0,0 +1,159 @@
+import calendar
+import datetime
+import threading
+
+import numpy as np
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+SECONDS_PER_DAY = 86400.0
+
+# Highlights below this weight are dropped from the glance unless critical
+DECAY_THRESHOLD = 0.2
+
+# --- Decay Curves ---
+# Each curve maps whole days since the note (ndarray) to weights in [0, 1].
+
+def hyperbolic_decay(days, rate=0.5):
+    """
+    weight = 1 / (1 + rate * days)
+    Day 0: 1.0, Day 2: 0.5, Day 10: 0.16 (rate=0.5)
+    """
+    return 1.0 / (1.0 + rate * days)
+
+def linear_decay(days, horizon_days=14.0):
+    """
+    Linear decay: 100% at 0 days, 50% at 7 days, 0% at 14 days (horizon=14).
+    """
+    return 1.0 - days / horizon_days
+
+def exponential_decay(days, half_life_days=3.0):
+    """
+    weight = 0.5 ** (days / half_life)
+    """
+    return np.power(0.5, days / half_life_days)
+
+DECAY_CURVES = {
+    "hyperbolic": hyperbolic_decay,
+    "linear": linear_decay,
+    "exponential": exponential_decay,
+}
+DEFAULT_DECAY_CURVE = "hyperbolic"
+
+
+def get_decay_curve(name):
+    curve = DECAY_CURVES.get(name)
+    if curve is None:
+        raise ValueError(f"Unknown decay curve '{name}'. Options: {', '.join(sorted(DECAY_CURVES))}")
+    return curve
+
+
+def parse_timestamp(timestamp_str):
+    """
+    Parses a note timestamp ("%Y-%m-%d %H:%M", local wall clock) into epoch
+    seconds. The wall clock is encoded as if it were UTC so the value
+    round-trips exactly and comparisons with now_epoch() are consistent.
+    Returns NaN for unparseable values.
+    """
+    try:
+        item_time = datetime.datetime.strptime(timestamp_str, TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        return float('nan')
+    return float(calendar.timegm(item_time.timetuple()))
+
+
+def now_epoch():
+    return float(calendar.timegm(datetime.datetime.now().timetuple()))
+
+
+def decay_weights(epochs, now=None, curve=DEFAULT_DECAY_CURVE):
+    """
+    Vectorized decay: returns weights (0.0 to 1.0) for an array of epoch
+    timestamps. Age is counted in whole elapsed days. Unparseable (NaN)
+    timestamps get full weight, matching the legacy scalar fallback.
+    """
+    if now is None:
+        now = now_epoch()
+    epochs = np.asarray(epochs, dtype=np.float64)
+    days = np.floor((now - epochs) / SECONDS_PER_DAY)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = get_decay_curve(curve)(days)
+    weights = np.clip(weights, 0.0, 1.0)
+    weights[np.isnan(epochs)] = 1.0
+    return weights
+
+
+def rank_highlights(weights, epochs, critical, priorities=None):
+    """
+    Decay filter and sort in one pass.
+    Returns indices of the kept highlights ordered by weight desc (times
+    the learned priority, if given), then timestamp desc; ties keep their
+    input order. The decay threshold applies to the unscaled weight.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    epochs = np.nan_to_num(np.asarray(epochs, dtype=np.float64), nan=-np.inf)
+    keep = np.flatnonzero((weights >= DECAY_THRESHOLD) | np.asarray(critical, dtype=bool))
+    scores = weights if priorities is None else weights * np.asarray(priorities, dtype=np.float64)
+    order = np.lexsort((-epochs[keep], -scores[keep]))
+    return keep[order]
+
+
+class TimestampArray:
+    """
+    Compact float64 array of note timestamps (epoch seconds) kept next to
+    the note store, addressed by note id. Edits overwrite in place; rows of
+    removed notes are reused by later ones.
+    """
+
+    def __init__(self, capacity=1024):
+        self._epochs = np.full(capacity, np.nan, dtype=np.float64)
+        self._rows = {}
+        self._free = []
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def clear(self):
+        with self._lock:
+            self._epochs[:self._size] = np.nan
+            self._rows = {}
+            self._free = []
+            self._size = 0
+
+    def remove(self, note_id):
+        with self._lock:
+            row = self._rows.pop(note_id, None)
+            if row is not None:
+                self._epochs[row] = np.nan
+                self._free.append(row)
+
+    def set(self, note_id, timestamp):
+        """Records a note timestamp, given as epoch seconds or a timestamp string."""
+        if isinstance(timestamp, (int, float)):
+            epoch = float(timestamp)
+        else:
+            epoch = parse_timestamp(timestamp)
+        with self._lock:
+            row = self._rows.get(note_id)
+            if row is None and self._free:
+                row = self._rows[note_id] = self._free.pop()
+            elif row is None:
+                if self._size == len(self._epochs):
+                    grown = np.full(len(self._epochs) * 2, np.nan, dtype=np.float64)
+                    grown[:self._size] = self._epochs[:self._size]
+                    self._epochs = grown
+                row = self._size
+                self._rows[note_id] = row
+                self._size += 1
+            self._epochs[row] = epoch
+
+    def rows(self, note_ids):
+        return np.fromiter((self._rows[i] for i in note_ids), dtype=np.intp, count=len(note_ids))
+
+    def epochs(self, note_ids):
+        """NaN for ids no longer recorded (a note moved out while a view was being built)."""
+        rows = np.fromiter((self._rows.get(i, -1) for i in note_ids), dtype=np.intp, count=len(note_ids))
+        epochs = self._epochs[rows]
+        epochs[rows < 0] = np.nan
+        return epochs
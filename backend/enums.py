@@ -0,0 +1,138 @@
+import sys
+from enum import IntEnum
+
+# --- Stored Codes ---
+# Roles, note types, action statuses and highlight types are stored as
+# small int codes and mapped to their API strings only at the JSON edge.
+# Each enum uses its own code range so codes of different kinds never
+# compare equal. Strings outside the enum (custom note types, free-form
+# LLM highlight types) are stored as interned strings and pass through.
+
+
+class Code(IntEnum):
+
+    @classmethod
+    def parse(cls, value):
+        """API string -> member. Unknown strings are interned and kept as is."""
+        if isinstance(value, str):
+            member = _BY_LABEL[cls].get(value)
+            return member if member is not None else sys.intern(value)
+        return value
+
+    @property
+    def label(self):
+        return _LABELS[self]
+
+    def __str__(self):
+        return _LABELS[self]
+
+
+class Role(Code):
+    PATIENT = 1
+    STAFF = 2
+    CLINICIAN = 3
+    ADMIN = 4
+    AI = 5
+    SYSTEM = 6
+
+
+class NoteType(Code):
+    PATIENT_INPUT = 20
+    STAFF_NOTE = 21
+    CLINICIAN_NOTE = 22
+    AI_DOCTOR_CONSULT_SUMMARY = 23
+    AI_NURSE_CONSULT_SUMMARY = 24
+    AI_PATIENT_SESSION_SUMMARY = 25
+    SYSTEM_LOG = 26
+
+
+class ActionStatus(Code):
+    PENDING = 40
+    UNRESOLVED = 41
+    RESOLVED = 42
+
+
+class HighlightType(Code):
+    USER_HIGHLIGHT = 60
+    RISK = 61
+    VITAL = 62
+    SYMPTOM = 63
+    CRITICAL = 64
+
+
+class Priority(Code):
+    HIGH = 80
+    MEDIUM = 81
+    LOW = 82
+
+
+_LABEL_OVERRIDES = {HighlightType.USER_HIGHLIGHT: 'user-highlight'}
+_LABELS = {}
+_BY_LABEL = {}
+for _cls in (Role, NoteType, ActionStatus, HighlightType, Priority):
+    _BY_LABEL[_cls] = {}
+    for _member in _cls:
+        _LABELS[_member] = _LABEL_OVERRIDES.get(_member, _member.name.lower())
+        _BY_LABEL[_cls][_LABELS[_member]] = _member
+
+
+def label(value):
+    """Stored code -> API string (anything else passes through)."""
+    return _LABELS[value] if isinstance(value, Code) else value
+
+
+OPEN_ACTION_STATUSES = (ActionStatus.UNRESOLVED, ActionStatus.PENDING)
+
+AI_NOTE_TYPES = frozenset({
+    NoteType.AI_DOCTOR_CONSULT_SUMMARY,
+    NoteType.AI_NURSE_CONSULT_SUMMARY,
+    NoteType.AI_PATIENT_SESSION_SUMMARY,
+})
+
+
+def is_ai_note_type(note_type):
+    """AI-scribed note types (type starts with ai_), known or custom."""
+    if isinstance(note_type, NoteType):
+        return note_type in AI_NOTE_TYPES
+    return isinstance(note_type, str) and note_type.startswith('ai_')
+
+
+# --- Visibility Scope Bitmask ---
+# The standard {patient, staff, clinician, admin} -> bool scope dict is
+# stored as one int with a bit per role.
+
+ROLE_BITS = {
+    Role.PATIENT: 1,
+    Role.STAFF: 2,
+    Role.CLINICIAN: 4,
+    Role.ADMIN: 8,
+}
+_SCOPE_KEYS = tuple(r.label for r in ROLE_BITS)
+
+
+def scope_to_mask(scope):
+    """
+    Scope dict -> role bitmask. Dicts that aren't exactly the standard
+    four boolean keys (and legacy string scopes) are returned unchanged.
+    """
+    if (isinstance(scope, dict) and len(scope) == len(_SCOPE_KEYS)
+            and all(isinstance(scope.get(k), bool) for k in _SCOPE_KEYS)):
+        mask = 0
+        for role, bit in ROLE_BITS.items():
+            if scope[role.label]:
+                mask |= bit
+        return mask
+    return scope
+
+
+def mask_to_scope(mask):
+    if isinstance(mask, int):
+        return {role.label: bool(mask & bit) for role, bit in ROLE_BITS.items()}
+    return mask
+
+
+def scope_allows(scope, role):
+    """True if a stored scope (bitmask or dict) grants the role."""
+    if isinstance(scope, int):
+        return bool(scope & ROLE_BITS.get(role, 0))
+    return bool(scope.get(label(role), False))
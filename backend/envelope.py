@@ -0,0 +1,101 @@
+import os
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+# --- Envelope Encryption ---
+# Every stored record (a note-file chunk, a segment record or index) is
+# encrypted with its own random data key, and the data key is stored in
+# front of it, wrapped (Fernet-encrypted) by the keyring's primary key:
+#   ENVELOPE_PREFIX + wrapped data key + b"." + record token
+# The keyring (MultiFernet) holds the primary key plus the older keys still
+# needed to unwrap records written before a rotation. Rotating a record
+# re-wraps only its data key and leaves the payload as it is, so re-keying
+# a dataset rewrites its files but re-encrypts no note text. Plain Fernet
+# tokens (files written before envelopes) still decrypt, and become
+# envelopes when rotated.
+#
+# The key file holds one key per line, primary first (a single-key file
+# from setup_security.py is a one-key keyring).
+
+ENVELOPE_PREFIX = b"E1."
+
+
+def read_keys(path):
+    with open(path, 'rb') as f:
+        return [line.strip() for line in f.read().splitlines() if line.strip()]
+
+
+def write_keys(path, keys):
+    """Replaces the key file atomically (owner read/write only)."""
+    tmp_path = path + '.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(b"\n".join(keys) + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Keyring:
+    """
+    Drop-in for a Fernet cipher (encrypt/decrypt) that writes envelopes.
+    Key changes (add_key, retire) apply to every holder of the keyring.
+    """
+
+    def __init__(self, keys):
+        self._set_keys(keys)
+
+    @classmethod
+    def load(cls, path):
+        return cls(read_keys(path))
+
+    @classmethod
+    def generate(cls):
+        return cls([Fernet.generate_key()])
+
+    def _set_keys(self, keys):
+        keys = list(keys)
+        if not keys:
+            raise ValueError("A keyring needs at least one key")
+        multi = MultiFernet([Fernet(key) for key in keys])
+        self.keys = keys
+        self._multi = multi
+
+    def __len__(self):
+        return len(self.keys)
+
+    def save(self, path):
+        write_keys(path, self.keys)
+
+    def add_key(self, key=None):
+        """Makes a new (or the given) key primary; older keys still decrypt. Returns it."""
+        key = key or Fernet.generate_key()
+        self._set_keys([key] + self.keys)
+        return key
+
+    def retire(self):
+        """Drops every key but the primary (once all records are rotated)."""
+        self._set_keys(self.keys[:1])
+
+    def encrypt(self, data):
+        data_key = Fernet.generate_key()
+        return ENVELOPE_PREFIX + self._multi.encrypt(data_key) + b"." + Fernet(data_key).encrypt(data)
+
+    def decrypt(self, token):
+        token = bytes(token)
+        if not token.startswith(ENVELOPE_PREFIX):
+            return self._multi.decrypt(token)
+        wrapped, dot, body = token[len(ENVELOPE_PREFIX):].partition(b".")
+        if not dot:
+            raise InvalidToken
+        return Fernet(self._multi.decrypt(wrapped)).decrypt(body)
+
+    def rotate(self, token):
+        """The token with its data key re-wrapped under the primary key."""
+        token = bytes(token)
+        if not token.startswith(ENVELOPE_PREFIX):
+            return self.encrypt(self._multi.decrypt(token))
+        wrapped, dot, body = token[len(ENVELOPE_PREFIX):].partition(b".")
+        if not dot:
+            raise InvalidToken
+        return ENVELOPE_PREFIX + self._multi.rotate(wrapped) + b"." + body
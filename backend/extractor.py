@@ -0,0 +1,220 @@
+import re
+import threading
+
+# --- Local Highlight/Action Extractor ---
+# CPU-only first tier for note analysis. Compiled patterns find abnormal
+# vitals, medication doses and risk terms in tens of microseconds;
+# phrases users have highlighted are learned and matched the same way.
+# Results use the LLM's JSON shape ({"highlights": [...], "actions": [...]})
+# so both tiers feed the same merge. Notes with a lot of free narrative
+# the patterns don't cover are reported as not confident, and the caller
+# escalates those to the LLM.
+
+# Notes with more uncovered words than this escalate
+CONFIDENT_MAX_WORDS = 20
+# Short notes with no findings need no LLM either ("Dressing changed.")
+TRIVIAL_MAX_WORDS = 8
+MAX_PHRASE_WORDS = 6
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+_NUM = r"(\d{1,3}(?:\.\d+)?)"
+VITAL_PATTERNS = (
+    ('hr', re.compile(r"\b(?:HR|heart rate|pulse)\s*:?\s*" + _NUM + r"(?:\s*(?:bpm|/min))?(?:\s*\([^)\n]*\))?", re.I)),
+    ('bp', re.compile(r"\b(?:BP|blood pressure)\s*:?\s*(\d{2,3})\s*/\s*(\d{2,3})", re.I)),
+    ('rr', re.compile(r"\b(?:RR|resp(?:iratory)? rate)\s*:?\s*" + _NUM + r"(?:\s*/\s*min)?", re.I)),
+    ('spo2', re.compile(r"\b(?:SpO2|O2 sat(?:uration)?|sats?)\s*:?\s*" + _NUM + r"\s*%(?:\s+on\s+(?:room air|RA|\d+\s*L\b(?:/min)?))?", re.I)),
+    ('temp', re.compile(r"\b(?:Temp(?:erature)?|T)\s*:?\s*" + _NUM + r"\s*°?\s*([CF])\b", re.I)),
+    ('glucose', re.compile(r"\b(?:glucose|BG|BSL)\s*:?\s*" + _NUM + r"\s*mg/dL", re.I)),
+    ('pain', re.compile(r"\bpain(?:\s+score)?\s*:?\s*(\d{1,2})\s*/\s*10", re.I)),
+)
+
+DOSE_RE = re.compile(
+    r"\b([A-Z][A-Za-z-]{2,}(?:/[A-Z][A-Za-z-]+)?)\s+(\d+(?:\.\d+)?)\s*(mg|mcg|g|units|mL)\b"
+    r"(?:\s+(?:PO|IV|IM|SC|BID|TID|QID|PRN|daily|push|x\s*\d+\s*days?)\b)*")
+
+# phrase -> (highlight type, reason, critical)
+RISK_PHRASES = {
+    "chest pain": ("risk", "Possible cardiac event", False),
+    "shortness of breath": ("symptom", "Respiratory symptom", False),
+    "trouble breathing": ("symptom", "Respiratory symptom", False),
+    "difficulty breathing": ("symptom", "Respiratory symptom", False),
+    "respiratory distress": ("risk", "Respiratory compromise", False),
+    "wheezes": ("symptom", "Bronchospasm", False),
+    "wheezing": ("symptom", "Bronchospasm", False),
+    "reduced air entry": ("symptom", "Severity indicator", False),
+    "asthma exacerbation": ("risk", "Primary diagnosis", False),
+    "syncope": ("risk", "Loss of consciousness", False),
+    "bleeding": ("risk", "Bleeding", False),
+    "allergy": ("risk", "Allergy", False),
+    "allergic reaction": ("risk", "Allergy", False),
+    "fever": ("symptom", "Fever", False),
+    "vomiting": ("symptom", "Vomiting", False),
+    "sepsis": ("critical", "Possible sepsis", True),
+    "anaphylaxis": ("critical", "Anaphylaxis", True),
+    "suicidal": ("critical", "Self-harm risk", True),
+    "stroke": ("critical", "Possible stroke", True),
+    "seizure": ("critical", "Seizure", True),
+    "lips turn blue": ("critical", "Cyanosis", True),
+}
+
+
+def _words(text):
+    return tuple(WORD_RE.findall(text.lower()))
+
+
+def assess_vital(kind, match):
+    """Returns (reason, urgent) for an abnormal reading, or None if normal."""
+    value = float(match.group(1))
+    if kind == 'hr':
+        if value > 100 or value < 50:
+            return "Abnormal heart rate", value > 130 or value < 40
+    elif kind == 'bp':
+        diastolic = float(match.group(2))
+        if value >= 140 or diastolic >= 90:
+            return "Elevated blood pressure", value >= 180 or diastolic >= 120
+        if value < 90:
+            return "Hypotension", value < 80
+    elif kind == 'rr':
+        if value > 24 or value < 10:
+            return "Abnormal respiratory rate", value > 30 or value < 8
+    elif kind == 'spo2':
+        if value < 94:
+            return "Hypoxia risk", value < 90
+    elif kind == 'temp':
+        celsius = value if match.group(2).upper() == 'C' else (value - 32) * 5 / 9
+        if celsius >= 38.0:
+            return "Fever", celsius >= 39.5
+        if celsius < 35.0:
+            return "Hypothermia", celsius < 32.0
+    elif kind == 'glucose':
+        if value > 180:
+            return "Hyperglycemia", value > 400
+        if value < 70:
+            return "Hypoglycemia", value < 54
+    elif kind == 'pain':
+        if value >= 7:
+            return "Severe pain", False
+    return None
+
+
+class LocalExtractor:
+    """
+    Pattern tier plus phrases learned from user highlights (matched by
+    word n-gram lookup, so cost doesn't grow with the number learned).
+    """
+
+    def __init__(self):
+        self._phrases = {_words(p): v for p, v in RISK_PHRASES.items()}
+        self._learned = {} # word tuple -> count of user highlights
+        self._lengths = {} # first word -> phrase lengths starting with it, longest first
+        self._lock = threading.Lock()
+        self._reindex()
+
+    def _reindex(self):
+        lengths = {}
+        for words in list(self._phrases) + list(self._learned):
+            lengths.setdefault(words[0], set()).add(len(words))
+        self._lengths = {w: sorted(ns, reverse=True) for w, ns in lengths.items()}
+
+    def clear_learned(self):
+        with self._lock:
+            self._learned = {}
+            self._reindex()
+
+    def learn(self, text):
+        """Records a user-highlighted phrase."""
+        words = _words(text or '')
+        if 0 < len(words) <= MAX_PHRASE_WORDS and len(' '.join(words)) >= 3:
+            with self._lock:
+                count = self._learned.get(words, 0)
+                self._learned[words] = count + 1
+                if not count:
+                    self._reindex()
+
+    def forget(self, text):
+        words = _words(text or '')
+        with self._lock:
+            count = self._learned.get(words, 0)
+            if count > 1:
+                self._learned[words] = count - 1
+            elif count:
+                del self._learned[words]
+                self._reindex()
+
+    def extract(self, text):
+        """
+        Returns (result, confident): result in the LLM JSON shape; confident
+        is False when the note has narrative the patterns don't cover.
+        """
+        highlights, actions, spans = [], [], []
+        abnormal, urgent = [], False
+
+        for kind, pattern in VITAL_PATTERNS:
+            for m in pattern.finditer(text):
+                spans.append(m.span())
+                finding = assess_vital(kind, m)
+                if finding:
+                    reason, is_urgent = finding
+                    highlights.append({"text": m.group(0).strip(), "type": "vital" if kind != 'pain' else "symptom",
+                                       "reason": reason})
+                    abnormal.append(reason)
+                    urgent = urgent or is_urgent
+
+        for m in DOSE_RE.finditer(text):
+            spans.append(m.span())
+            highlights.append({"text": m.group(0).strip(), "type": "risk", "reason": "Medication dose"})
+
+        critical_terms = []
+        for start, end, words in self._match_phrases(text):
+            spans.append((start, end))
+            phrase = self._phrases.get(words)
+            if phrase:
+                h_type, reason, critical = phrase
+                if critical:
+                    critical_terms.append(text[start:end])
+            else:
+                h_type, reason = "risk", "Similar to a user highlight"
+            highlights.append({"text": text[start:end], "type": h_type, "reason": reason})
+
+        if abnormal:
+            actions.append({"description": "Review abnormal vitals: " + ", ".join(dict.fromkeys(abnormal)),
+                            "assignee": "clinician", "priority": "high" if urgent else "medium",
+                            "tags": ["vitals"]})
+        for term in dict.fromkeys(critical_terms):
+            actions.append({"description": f"Urgent review: {term}", "assignee": "clinician",
+                            "priority": "high", "tags": ["risk"]})
+
+        total_words = len(WORD_RE.findall(text.lower()))
+        uncovered = total_words - sum(len(WORD_RE.findall(text[s:e].lower())) for s, e in _merge_spans(spans))
+        confident = uncovered <= CONFIDENT_MAX_WORDS if spans else total_words <= TRIVIAL_MAX_WORDS
+        return {"highlights": highlights, "actions": actions}, confident
+
+    def _match_phrases(self, text):
+        """Longest known/learned phrase at each word position: (start, end, words)."""
+        lower = text.lower()
+        words = WORD_RE.findall(lower)
+        lengths, phrases, learned = self._lengths, self._phrases, self._learned
+        spans = None
+        i = 0
+        while i < len(words):
+            for n in lengths.get(words[i], ()):
+                candidate = tuple(words[i:i + n])
+                if len(candidate) == n and (candidate in phrases or candidate in learned):
+                    if spans is None:
+                        spans = [m.span() for m in WORD_RE.finditer(lower)]
+                    yield spans[i][0], spans[i + n - 1][1], candidate
+                    i += n
+                    break
+            else:
+                i += 1
+
+
+def _merge_spans(spans):
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
@@ -0,0 +1,98 @@
+import bisect
+import threading
+
+# --- Glance Side Indexes ---
+# The glance's "AI scribed" and "clinician confirmed" sections, classified
+# once when a note is written (create, edit, revert, load, thaw) instead of
+# on every read. Every note gets a rank in timeline order when first added
+# (inserted notes above all others, loaded/thawed ones below), and each
+# section keeps only its notes sorted by rank, so reads touch only them.
+
+
+class _Section:
+    """Notes with items in this section, ordered by rank."""
+
+    def __init__(self):
+        self.order = [] # Sorted (rank, note id)
+        self.items = {} # note id -> (note, items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, rank, note, items):
+        if not items:
+            self.discard(rank, note.id)
+            return
+        if note.id not in self.items:
+            bisect.insort(self.order, (rank, note.id))
+        self.items[note.id] = (note, items)
+
+    def discard(self, rank, note_id):
+        if self.items.pop(note_id, None) is not None:
+            del self.order[bisect.bisect_left(self.order, (rank, note_id))]
+
+    def read(self, visible):
+        found = []
+        for _, note_id in self.order:
+            note, items = self.items[note_id]
+            if visible(note):
+                found.extend(items)
+        return found
+
+
+class GlanceIndex:
+    """
+    `classify(note)` returns (AI-scribed entries, clinician-confirmed
+    items) for a note, as the JSON dicts the glance returns.
+    """
+
+    def __init__(self, classify):
+        self._classify = classify
+        self._lock = threading.Lock()
+        self.clear()
+
+    def __len__(self):
+        return len(self._ai_scribed) + len(self._confirmed)
+
+    def clear(self):
+        with self._lock:
+            self._ranks = {} # note id -> rank (timeline order)
+            self._above = 0
+            self._below = 0
+            self._ai_scribed = _Section()
+            self._confirmed = _Section()
+
+    def add(self, note, top=True):
+        """
+        (Re)classifies a note. A new note ranks above every other one
+        (inserted at the top of the timeline) or, top=False, below them.
+        """
+        ai_scribed, confirmed = self._classify(note)
+        with self._lock:
+            rank = self._ranks.get(note.id)
+            if rank is None:
+                if top:
+                    self._above -= 1
+                    rank = self._above
+                else:
+                    self._below += 1
+                    rank = self._below
+                self._ranks[note.id] = rank
+            self._ai_scribed.put(rank, note, ai_scribed)
+            self._confirmed.put(rank, note, confirmed)
+
+    def remove(self, note_id):
+        with self._lock:
+            rank = self._ranks.pop(note_id, None)
+            if rank is not None:
+                self._ai_scribed.discard(rank, note_id)
+                self._confirmed.discard(rank, note_id)
+
+    def ai_scribed(self, visible):
+        """AI-scribed entries of the notes `visible(note)` accepts, in timeline order."""
+        with self._lock:
+            return self._ai_scribed.read(visible)
+
+    def confirmed(self, visible):
+        with self._lock:
+            return self._confirmed.read(visible)
@@ -0,0 +1,85 @@
+import math
+import re
+import threading
+
+# --- Learned Highlight Priority ---
+# Online linear model over word unigrams and bigrams, trained only by
+# highlight feedback: a user highlight is a positive example, removing it
+# undoes that, and removing an AI highlight is a negative example. Each
+# event touches only the features of one highlight text, so there is no
+# retraining pass. The glance multiplies each AI highlight's decay weight
+# by priority(text), which is 1.0 for text the model knows nothing about.
+# User highlights are re-learned from the notes on load; dismissals leave
+# no trace in the notes, so their counts are kept (dismissed) for the
+# store snapshot and replayed with load_dismissed().
+
+LEARNING_RATE = 0.5
+# priority() ranges over (1 - MAX_BOOST, 1 + MAX_BOOST)
+MAX_BOOST = 1.0
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(("a", "an", "and", "at", "for", "in", "of", "on", "or", "the", "to", "with",
+                       "is", "was", "has", "had", "patient", "pt", "reports", "reported"))
+
+
+def features(text):
+    words = WORD_RE.findall((text or '').lower())
+    grams = [w for w in words if w not in STOPWORDS]
+    grams.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return grams
+
+
+class HighlightPriorityModel:
+
+    def __init__(self, learning_rate=LEARNING_RATE):
+        self.learning_rate = learning_rate
+        self._weights = {}
+        self.dismissed = {} # AI highlight text -> times dismissed
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._weights)
+
+    def clear(self):
+        with self._lock:
+            self._weights = {}
+            self.dismissed = {}
+
+    def dismiss(self, text):
+        """Negative feedback: an AI highlight was removed."""
+        with self._lock:
+            self.dismissed[text] = self.dismissed.get(text, 0) + 1
+        self.update(text, -1)
+
+    def load_dismissed(self, counts):
+        """Replays dismissal counts saved from `dismissed`."""
+        for text, count in counts.items():
+            with self._lock:
+                self.dismissed[text] = self.dismissed.get(text, 0) + count
+            self.update(text, -count)
+
+    def update(self, text, label):
+        """One feedback event: label +1 (highlighted) or -1 (dismissed/undone)."""
+        grams = features(text)
+        if not grams:
+            return
+        step = self.learning_rate * label / math.sqrt(len(grams))
+        with self._lock:
+            for g in grams:
+                weight = self._weights.get(g, 0.0) + step
+                if abs(weight) < 1e-9:
+                    self._weights.pop(g, None)
+                else:
+                    self._weights[g] = weight
+
+    def score(self, text):
+        """Raw model output; 0.0 for unseen text."""
+        grams = features(text)
+        if not grams:
+            return 0.0
+        weights = self._weights
+        return sum(weights.get(g, 0.0) for g in grams) / math.sqrt(len(grams))
+
+    def priority(self, text):
+        """Ranking multiplier in (1 - MAX_BOOST, 1 + MAX_BOOST), 1.0 when neutral."""
+        return 1.0 + MAX_BOOST * math.tanh(self.score(text))
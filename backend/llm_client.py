@@ -0,0 +1,428 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from types import SimpleNamespace
+
+import metrics
+
+# --- LLM Client ---
+# One shared client for every LLM call in the app. Providers are created
+# once and cache their model objects, so the SDK's HTTP/gRPC connections
+# are reused across requests. The client adds a token-bucket rate limit,
+# per-call timeout, retries with exponential backoff (transient errors
+# only) and a circuit breaker that fails fast while the provider is down.
+# Every call has a blocking form (generate/stream) and an awaitable one
+# (agenerate) for the ASGI serving mode.
+
+DEFAULT_MODEL = "gemini-flash-latest"
+
+# Free-text answers of the fake provider for prompts without a "Context:" section
+FAKE_NOTES = (
+    "Patient reports productive cough for 5 days. Vitals: BP 128/82, HR 96, Temp 38.1C, SpO2 95%. Chest: coarse crackles right base. Plan: chest X-ray, start amoxicillin.",
+    "Follow-up for type 2 diabetes. Fasting glucose 162 mg/dL, A1c 7.8%. Feet intact. Plan: increase Metformin to 1000mg BID, dietitian referral.",
+    "Patient presents with right ankle swelling after a fall. Unable to bear weight. Vitals stable. Plan: ankle X-ray, RICE, review with results.",
+)
+
+
+class LLMError(Exception):
+    """An LLM call failed (after retries)."""
+
+
+class LLMUnavailable(LLMError):
+    """The call was not attempted: rate limit wait timed out or circuit open."""
+
+
+class TokenBucket:
+    """Allows `rate` calls per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Takes a token if there is one. Returns 0, or the seconds until the next token."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def acquire(self, timeout=None):
+        """Takes one token, waiting up to `timeout` seconds. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.take()
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout=None):
+        """acquire() that waits without blocking the event loop."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.take()
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures; after
+    `reset_timeout` seconds one trial call is let through (half-open) and
+    its outcome closes or re-opens the circuit.
+    """
+    TRIAL = "trial"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        """Whether a call may go ahead: True, or TRIAL for the half-open trial call."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return self.TRIAL
+
+    def abandon(self, allowed):
+        """
+        A call given `allowed` (from allow()) stopped without an outcome
+        (stream closed, task cancelled). An abandoned trial counts as a
+        failure, so the circuit isn't left waiting on it forever.
+        """
+        if allowed == self.TRIAL:
+            self.record_failure()
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+# --- Providers ---
+# generate(model, prompt, json_mode, timeout) returns an object with
+# .text (and .usage_metadata when the provider reports token counts).
+# generate_stream(model, prompt, timeout) yields such objects as chunks;
+# the last one carries the usage metadata. agenerate is the awaitable
+# form of generate.
+
+class GeminiProvider:
+    """
+    The SDK is imported and configured on the first call, not here: the
+    import takes about a second, which app import (tests, CLI tools,
+    every worker process) shouldn't pay.
+    """
+    name = "gemini"
+
+    def __init__(self, api_key):
+        self._api_key = api_key
+        self._genai = None
+        self._transient = (ConnectionError, TimeoutError)
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _sdk(self):
+        """The configured google.generativeai module (call with the lock held)."""
+        if self._genai is None:
+            import google.generativeai as genai # Heavy import, deferred to the first call
+            try:
+                from google.api_core import exceptions as api_exceptions
+                self._transient = (api_exceptions.ResourceExhausted, api_exceptions.ServiceUnavailable,
+                                   api_exceptions.DeadlineExceeded, api_exceptions.InternalServerError,
+                                   ConnectionError, TimeoutError)
+            except ImportError:
+                pass
+            genai.configure(api_key=self._api_key)
+            self._genai = genai
+        return self._genai
+
+    def _model(self, name):
+        with self._lock:
+            model = self._models.get(name)
+            if model is None:
+                model = self._models[name] = self._sdk().GenerativeModel(name)
+            return model
+
+    def generate(self, model, prompt, json_mode=False, timeout=None):
+        kwargs = {}
+        if json_mode:
+            kwargs['generation_config'] = {"response_mime_type": "application/json"}
+        if timeout:
+            kwargs['request_options'] = {"timeout": timeout}
+        return self._model(model).generate_content(prompt, **kwargs)
+
+    async def agenerate(self, model, prompt, json_mode=False, timeout=None):
+        kwargs = {}
+        if json_mode:
+            kwargs['generation_config'] = {"response_mime_type": "application/json"}
+        if timeout:
+            kwargs['request_options'] = {"timeout": timeout}
+        return await self._model(model).generate_content_async(prompt, **kwargs)
+
+    def generate_stream(self, model, prompt, timeout=None):
+        kwargs = {"request_options": {"timeout": timeout}} if timeout else {}
+        yield from self._model(model).generate_content(prompt, stream=True, **kwargs)
+
+    def is_transient(self, error):
+        return isinstance(error, self._transient)
+
+
+class FakeProvider:
+    """
+    Deterministic offline provider for demos and throughput tests: the
+    same prompt always gives the same answer, after `latency` seconds.
+    JSON mode flags the first sentence of the "Current Note:" section as
+    a highlight and suggests one follow-up action.
+    """
+    name = "fake"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def generate(self, model, prompt, json_mode=False, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._answer(prompt, json_mode)
+
+    async def agenerate(self, model, prompt, json_mode=False, timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._answer(prompt, json_mode)
+
+    def _answer(self, prompt, json_mode):
+        digest = int(hashlib.sha1(prompt.encode('utf-8')).hexdigest(), 16)
+        if json_mode:
+            note = prompt.split("Current Note:", 1)[-1].split("Task:", 1)[0].strip()
+            first = re.split(r'(?<=[.!?])\s|\n', note, maxsplit=1)[0].strip()
+            text = json.dumps({
+                "highlights": [{"text": first, "type": "risk", "reason": "Flagged by local model"}] if first else [],
+                "actions": [{
+                    "description": f"Review: {first[:60]}" if first else "Review note",
+                    "assignee": ("clinician", "staff")[digest % 2],
+                    "priority": ("high", "medium", "low")[digest % 3],
+                    "tags": ["fake-llm"]
+                }],
+                "suggested_type": "consult"
+            })
+        elif "Context:" not in prompt:
+            text = FAKE_NOTES[digest % len(FAKE_NOTES)]
+        else:
+            context = prompt.split("Context:", 1)[-1].split("Output", 1)[0].strip().splitlines()
+            text = "Summary: " + " ".join(line.strip() for line in context if line.strip())[:300]
+        usage = SimpleNamespace(prompt_token_count=len(prompt.split()), candidates_token_count=len(text.split()))
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def generate_stream(self, model, prompt, timeout=None):
+        """The generate() answer split into word chunks, latency spread across them."""
+        full = self._answer(prompt, False)
+        words = re.findall(r'\S+\s*', full.text) or [full.text]
+        for i, word in enumerate(words):
+            if self.latency:
+                time.sleep(self.latency / len(words))
+            yield SimpleNamespace(text=word, usage_metadata=full.usage_metadata if i == len(words) - 1 else None)
+
+    def is_transient(self, error):
+        return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class LLMClient:
+
+    def __init__(self, provider, model=DEFAULT_MODEL, rate_limit=5.0, burst=10, timeout=30.0,
+                 max_retries=2, backoff=0.5, breaker=None):
+        self.provider = provider
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.breaker = breaker or CircuitBreaker()
+
+    def generate(self, prompt, call="default", json_mode=False):
+        """
+        Returns the response text. Raises LLMUnavailable without calling the
+        provider, or LLMError once retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            if self.bucket is not None and not self.bucket.acquire(timeout=self.timeout):
+                raise LLMUnavailable(f"{self.provider.name}: rate limit wait exceeded {self.timeout}s")
+            if not self.breaker.allow():
+                raise LLMUnavailable(f"{self.provider.name}: circuit open")
+            try:
+                with metrics.llm_call(call) as record:
+                    record.response = self.provider.generate(self.model, prompt, json_mode=json_mode,
+                                                             timeout=self.timeout)
+                text = record.response.text
+            except Exception as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries or not self.provider.is_transient(e):
+                    raise LLMError(f"{self.provider.name}: {e}") from e
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return text
+
+    async def agenerate(self, prompt, call="default", json_mode=False):
+        """generate() for event loops: rate limit waits, the call and backoff are awaited."""
+        attempt = 0
+        while True:
+            if self.bucket is not None and not await self.bucket.acquire_async(timeout=self.timeout):
+                raise LLMUnavailable(f"{self.provider.name}: rate limit wait exceeded {self.timeout}s")
+            allowed = self.breaker.allow()
+            if not allowed:
+                raise LLMUnavailable(f"{self.provider.name}: circuit open")
+            try:
+                with metrics.llm_call(call) as record:
+                    record.response = await asyncio.wait_for(
+                        self.provider.agenerate(self.model, prompt, json_mode=json_mode, timeout=self.timeout),
+                        self.timeout)
+                text = record.response.text
+            except asyncio.CancelledError:
+                self.breaker.abandon(allowed)
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries or not self.provider.is_transient(e):
+                    raise LLMError(f"{self.provider.name}: {e}") from e
+                await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return text
+
+    def stream(self, prompt, call="default"):
+        """
+        Yields response text chunks as the provider produces them. Transient
+        errors are retried until the first chunk is out; after that they
+        raise LLMError mid-stream.
+        """
+        attempt = 0
+        while True:
+            if self.bucket is not None and not self.bucket.acquire(timeout=self.timeout):
+                raise LLMUnavailable(f"{self.provider.name}: rate limit wait exceeded {self.timeout}s")
+            allowed = self.breaker.allow()
+            if not allowed:
+                raise LLMUnavailable(f"{self.provider.name}: circuit open")
+            started = False
+            try:
+                with metrics.llm_call(call) as record:
+                    for chunk in self.provider.generate_stream(self.model, prompt, timeout=self.timeout):
+                        record.response = chunk
+                        text = chunk.text
+                        if text:
+                            started = True
+                            yield text
+            except GeneratorExit: # The consumer stopped reading
+                self.breaker.abandon(allowed)
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                if started or attempt >= self.max_retries or not self.provider.is_transient(e):
+                    raise LLMError(f"{self.provider.name}: {e}") from e
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return
+
+
+def create_client(provider_name, api_key=None, model=DEFAULT_MODEL, rate_limit=5.0, burst=10,
+                  timeout=30.0, max_retries=2, fake_latency=0.0):
+    """
+    provider_name: gemini | fake | none. Returns None when no provider is
+    configured (AI features fall back to simulation).
+    """
+    if provider_name == "fake":
+        provider = FakeProvider(latency=fake_latency)
+    elif provider_name == "gemini":
+        if not api_key:
+            return None
+        provider = GeminiProvider(api_key)
+    elif provider_name in (None, "", "none"):
+        return None
+    else:
+        raise ValueError(f"Unknown LLM provider '{provider_name}'. Options: gemini, fake, none")
+    return LLMClient(provider, model=model, rate_limit=rate_limit, burst=burst, timeout=timeout,
+                     max_retries=max_retries)
+
+
+# --- Call Steps ---
+# Code that needs LLM answers is written once, as a generator that yields
+# LLMRequests and is sent back the response text (or has the LLMError
+# thrown in at the yield); its return value is the result. run_steps
+# drives it with blocking calls (Flask routes, background threads) and
+# arun_steps awaits the calls instead (asgi.py), so the logic between
+# calls is the same in both serving modes.
+
+LLMRequest = namedtuple('LLMRequest', ('prompt', 'call', 'json_mode'), defaults=("default", False))
+
+
+def run_steps(steps, client):
+    """Runs a step generator to completion with client.generate. Returns its result."""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                text = client.generate(request.prompt, call=request.call, json_mode=request.json_mode)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(text)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def arun_steps(steps, client):
+    """run_steps awaiting client.agenerate, for event loops."""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                text = await client.agenerate(request.prompt, call=request.call, json_mode=request.json_mode)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(text)
+    except StopIteration as stop:
+        return stop.value
@@ -0,0 +1,226 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# --- Request Instrumentation (opt-in) ---
+# Minimal Prometheus-style metrics kept in process memory and rendered in
+# the text exposition format for /metrics. Everything is a no-op until
+# configure(True) is called (METRICS_ENABLED=1 in app.py).
+#
+# Per request, time spent in named phases (rbac, redaction, llm,
+# serialize, copy, ...) is summed and observed once when the request
+# ends, so a phase entered many times in one request is one sample.
+# Timing state lives in a context variable: per thread under WSGI, per
+# task when requests are interleaved on an event loop (asgi.py).
+
+_enabled = False
+_lock = threading.Lock()
+_timing = ContextVar('request_timing', default=None)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def configure(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def enabled():
+    return _enabled
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative buckets plus _sum and _count, per label set."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {} # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value, *labels):
+        with _lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[-1] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, hits in zip(self.buckets, series):
+                cumulative += hits
+                le = _format_labels(self.labelnames, labels, [('le', _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labelnames, labels, [('le', '+Inf')])
+            lines.append(f"{self.name}_bucket{le} {series[-1]}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{label_str} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from a callback."""
+
+    def __init__(self, name, help_text, func):
+        self.name = name
+        self.help = help_text
+        self.func = func
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(self.func())}"]
+
+
+# --- Registry ---
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request latency by route.',
+                            ('route', 'method', 'status'))
+PHASE_LATENCY = Histogram('request_phase_duration_seconds', 'Time per request spent in a hot-path phase.',
+                          ('route', 'phase'))
+LLM_LATENCY = Histogram('llm_request_duration_seconds', 'LLM call latency.', ('call',))
+LLM_REQUESTS = Counter('llm_requests_total', 'LLM calls by outcome.', ('call', 'outcome'))
+LLM_TOKENS = Counter('llm_tokens_total', 'LLM tokens reported by the provider.', ('call', 'kind'))
+
+ADMISSION_REJECTED = Counter('admission_rejected_total', 'Requests refused by admission control (429).', ('lane',))
+
+_registry = [REQUEST_LATENCY, PHASE_LATENCY, LLM_LATENCY, LLM_REQUESTS, LLM_TOKENS, ADMISSION_REJECTED]
+
+
+def register_gauge(name, help_text, func):
+    _registry.append(Gauge(name, help_text, func))
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Request / Phase Timing ---
+
+class _Timing:
+    __slots__ = ('start', 'phases', 'active')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.active = set()
+
+
+def start_request():
+    if _enabled:
+        _timing.set(_Timing())
+
+
+def end_request(route, method, status):
+    timing = _timing.get()
+    if not _enabled or timing is None:
+        return
+    REQUEST_LATENCY.observe(time.perf_counter() - timing.start, route, method, str(status))
+    for phase_name, seconds in timing.phases.items():
+        PHASE_LATENCY.observe(seconds, route, phase_name)
+    _timing.set(None)
+
+
+@contextmanager
+def phase(name):
+    """Adds the time spent in the block to the current request's phase total."""
+    timing = _timing.get() if _enabled else None
+    if timing is None or name in timing.active:
+        yield # Disabled, or nested in the same phase (already timed)
+        return
+    timing.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.phases[name] = timing.phases.get(name, 0.0) + time.perf_counter() - start
+        timing.active.discard(name)
+
+
+class _LLMCall:
+    __slots__ = ('response',)
+
+    def __init__(self):
+        self.response = None
+
+
+@contextmanager
+def llm_call(call):
+    """
+    Times one LLM round trip (also counted in the 'llm' phase). Set
+    `.response` on the yielded object to record token usage.
+    """
+    record = _LLMCall()
+    if not _enabled:
+        yield record
+        return
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        with phase('llm'):
+            yield record
+        outcome = 'ok'
+    finally:
+        LLM_LATENCY.observe(time.perf_counter() - start, call)
+        LLM_REQUESTS.inc(call, outcome)
+        usage = getattr(record.response, 'usage_metadata', None)
+        if usage is not None:
+            LLM_TOKENS.inc(call, 'prompt', amount=getattr(usage, 'prompt_token_count', 0) or 0)
+            LLM_TOKENS.inc(call, 'completion', amount=getattr(usage, 'candidates_token_count', 0) or 0)
@@ -0,0 +1,251 @@
+import calendar
+import copy
+import datetime
+import functools
+import uuid
+
+from decay import TIMESTAMP_FORMAT
+from enums import (ActionStatus, HighlightType, NoteType, Priority, Role, label, mask_to_scope,
+                   scope_to_mask)
+
+# --- Compact Record Models ---
+# Notes, highlights and actions are stored as slotted objects instead of
+# dicts: UUIDs as 16 raw bytes, timestamps as integer epoch seconds, roles/
+# types/statuses as enums.Code members and standard visibility scopes as a
+# role bitmask. to_dict()/from_dict() convert losslessly to
+# and from the JSON shape served by the API and stored in note.json.
+
+
+class _Missing:
+    """Marks a field that was absent from the source record."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'MISSING'
+
+    def __bool__(self):
+        return False
+
+
+MISSING = _Missing()
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def pack_id(value):
+    """
+    Canonical UUID strings are stored as their 16 raw bytes.
+    Any other id (legacy or client supplied) is kept as given.
+    """
+    if isinstance(value, str) and len(value) == 36:
+        try:
+            parsed = uuid.UUID(value)
+        except ValueError:
+            return value
+        if str(parsed) == value:
+            return parsed.bytes
+    return value
+
+
+def unpack_id(value):
+    if isinstance(value, bytes):
+        if len(value) != 16:
+            return str(uuid.UUID(bytes=value)) # Raises, as for any malformed id
+        h = value.hex() # Same text as str(uuid.UUID(bytes=value)), without the UUID object
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+    return value
+
+
+def new_id():
+    return uuid.uuid4().bytes
+
+
+def encode_timestamp(value):
+    """
+    "%Y-%m-%d %H:%M" (local wall clock) -> integer epoch seconds, encoding
+    the wall clock as UTC so it formats back to the same string.
+    Values that don't parse are kept as given.
+    """
+    if not isinstance(value, str):
+        return value
+    try:
+        parsed = datetime.datetime.strptime(value, TIMESTAMP_FORMAT)
+    except ValueError:
+        return value
+    return calendar.timegm(parsed.timetuple())
+
+
+@functools.lru_cache(maxsize=16384)
+def _format_epoch(value):
+    return (_EPOCH + datetime.timedelta(seconds=value)).strftime(TIMESTAMP_FORMAT)
+
+
+def format_timestamp(value):
+    if isinstance(value, int):
+        return _format_epoch(value) # Minute-resolution stamps repeat across reads
+    return value
+
+
+def current_timestamp():
+    return calendar.timegm(datetime.datetime.now().replace(second=0, microsecond=0).timetuple())
+
+
+def timestamp_key(value):
+    """Sort key for stored timestamps; unparseable values sort oldest."""
+    return value if isinstance(value, int) else -1
+
+
+# Enumerated field kinds; API strings are parsed to codes on the way in
+_CODED = {
+    'role': Role.parse,
+    'note_type': NoteType.parse,
+    'status': ActionStatus.parse,
+    'highlight_type': HighlightType.parse,
+    'priority': Priority.parse,
+}
+
+# Field kinds: how each value is encoded in memory and decoded for JSON
+_DECODE = {
+    'plain': lambda v: v,
+    'id': pack_id,
+    'time': encode_timestamp,
+    'scope': scope_to_mask,
+    **_CODED,
+}
+_ENCODE = {
+    'id': unpack_id,
+    'time': format_timestamp,
+    'scope': mask_to_scope,
+    **{kind: label for kind in _CODED},
+}
+
+
+class _Model:
+    __slots__ = ()
+    _fields = ()
+    _children = {}
+
+    def __init__(self, **fields):
+        for name, kind in self._fields:
+            value = fields.pop(name, MISSING)
+            if kind in _CODED:
+                value = _CODED[kind](value)
+            setattr(self, name, value)
+        self.extra = fields or None
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={unpack_id(getattr(self, 'id', MISSING))!r})"
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    __hash__ = object.__hash__
+
+    @classmethod
+    def from_dict(cls, data):
+        obj = cls.__new__(cls)
+        for name, kind in cls._fields:
+            if name not in data:
+                setattr(obj, name, MISSING)
+            elif kind in cls._children:
+                child = cls._children[kind]()
+                setattr(obj, name, [child.from_dict(item) for item in data[name]])
+            else:
+                setattr(obj, name, _DECODE[kind](data[name]))
+        known = cls._field_names
+        extra = {k: v for k, v in data.items() if k not in known}
+        obj.extra = extra or None
+        return obj
+
+    def to_dict(self):
+        data = {}
+        for name, kind in self._fields:
+            value = getattr(self, name)
+            if value is MISSING:
+                continue
+            if kind in self._children:
+                data[name] = [item.to_dict() for item in value]
+            else:
+                encode = _ENCODE.get(kind)
+                data[name] = encode(value) if encode else value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def copy(self, exclude=()):
+        """
+        Deep copy (child records are copied, interned values shared).
+        Child lists named in `exclude` are replaced with empty lists.
+        """
+        obj = self.__class__.__new__(self.__class__)
+        for name, kind in self._fields:
+            value = getattr(self, name)
+            if name in exclude:
+                value = []
+            elif kind in self._children and value is not MISSING:
+                value = [item.copy() for item in value]
+            elif isinstance(value, (list, dict)):
+                value = copy.deepcopy(value)
+            setattr(obj, name, value)
+        obj.extra = copy.deepcopy(self.extra)
+        return obj
+
+
+class Highlight(_Model):
+    _fields = (
+        ('id', 'id'),
+        ('text', 'plain'),
+        ('type', 'highlight_type'),
+        ('reason', 'plain'),
+        ('start', 'plain'),
+        ('end', 'plain'),
+    )
+    _field_names = frozenset(name for name, _ in _fields)
+    __slots__ = tuple(name for name, _ in _fields) + ('extra',)
+
+
+class Action(_Model):
+    _fields = (
+        ('id', 'id'),
+        ('title', 'plain'),
+        ('status', 'status'),
+        ('created_by_role', 'role'),
+        ('assigned_to_role', 'role'),
+        ('provenance_note_id', 'id'),
+        ('created_at', 'time'),
+        ('resolved_at', 'time'),
+        ('resolution_comment', 'plain'),
+        ('tags', 'plain'),
+        ('priority', 'priority'),
+    )
+    _field_names = frozenset(name for name, _ in _fields)
+    __slots__ = tuple(name for name, _ in _fields) + ('extra',)
+
+
+class Note(_Model):
+    _fields = (
+        ('id', 'id'),
+        ('content', 'plain'),
+        ('author_role', 'role'),
+        ('type', 'note_type'),
+        ('timestamp', 'time'),
+        ('version', 'plain'),
+        ('history', 'notes'),
+        ('highlights', 'highlights'),
+        ('actions', 'actions'),
+        ('visibility_scope', 'scope'),
+        ('provenance_pointer', 'id'),
+        ('last_editor', 'role'),
+        ('reverted_at', 'time'),
+        ('reverted_by', 'role'),
+    )
+    _field_names = frozenset(name for name, _ in _fields)
+    _children = {
+        'notes': lambda: Note,
+        'highlights': lambda: Highlight,
+        'actions': lambda: Action,
+    }
+    __slots__ = tuple(name for name, _ in _fields) + ('extra',)
+
+    def snapshot(self):
+        """Copy of this version for the history list (without nested history)."""
+        return self.copy(exclude=('history',))
@@ -0,0 +1,91 @@
+import json
+import os
+
+from cryptography.fernet import InvalidToken
+
+# --- Note Data File ---
+# Two on-disk layouts are read:
+#   legacy:  the whole JSON note list encrypted as one Fernet token
+#            (or plain JSON when no key is configured)
+#   chunked: a header line, then one chunk per line. Each chunk is a
+#            JSON array of note records, encrypted as a Fernet token or
+#            envelope (envelope.py), or plain compact JSON. Tokens are
+#            urlsafe base64 (envelopes join two with '.') and compact JSON
+#            escapes newlines, so a line is always one chunk.
+# Chunks can be produced in parallel and appended as they finish, and
+# are decrypted one at a time on load, so large datasets never exist as
+# a single plaintext blob.
+
+CHUNKED_HEADER = b"NOTES-CHUNKED-1\n"
+
+
+def encode_chunk(records, cipher=None):
+    """Serializes (and encrypts) one chunk of note records as a file line."""
+    data = json.dumps(records, separators=(',', ':')).encode('utf-8')
+    if cipher is not None:
+        data = cipher.encrypt(data)
+    return data + b"\n"
+
+
+def decode_chunk(line, cipher=None):
+    line = line.strip()
+    if line.startswith(b"["):
+        return json.loads(line)
+    if cipher is None:
+        raise ValueError("Encrypted chunk but no encryption key loaded")
+    return json.loads(cipher.decrypt(line))
+
+
+def is_chunked(path):
+    with open(path, 'rb') as f:
+        return f.read(len(CHUNKED_HEADER)) == CHUNKED_HEADER
+
+
+def iter_notes(path, cipher=None):
+    """
+    Yields note records from a data file in either layout. Chunked files
+    are streamed a chunk at a time.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(CHUNKED_HEADER)) == CHUNKED_HEADER:
+            for line in f:
+                if line.strip():
+                    yield from decode_chunk(line, cipher)
+            return
+        f.seek(0)
+        content = f.read()
+
+    if cipher:
+        try:
+            content = cipher.decrypt(content)
+            print("Decrypted notes successfully.")
+        except InvalidToken:
+            # Fallback: maybe it's plain text
+            print("Decryption failed or file not encrypted. Assuming plain text.")
+    yield from json.loads(content)
+
+
+def rotate_note_file(path, cipher):
+    """
+    Re-keys an encrypted data file in place (atomically) with cipher.rotate
+    (envelope.Keyring), a chunk at a time for the chunked layout. Plain
+    JSON is left as it is. Returns the bytes written (0 if untouched).
+    """
+    tmp_path = path + '.tmp'
+    with open(path, 'rb') as f:
+        if f.read(len(CHUNKED_HEADER)) == CHUNKED_HEADER:
+            with open(tmp_path, 'wb') as out:
+                out.write(CHUNKED_HEADER)
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        out.write((line if line.startswith(b"[") else cipher.rotate(line)) + b"\n")
+        else:
+            f.seek(0)
+            content = f.read().strip()
+            if not content or content.startswith(b"["):
+                return 0
+            with open(tmp_path, 'wb') as out:
+                out.write(cipher.rotate(content))
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
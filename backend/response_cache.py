@@ -0,0 +1,64 @@
+import threading
+import time
+
+# --- Per-Role Response Cache ---
+# Read views (timeline, glance) depend only on the store and the caller's
+# role, so their serialized bodies are cached per (view, role) and served
+# as-is until a write touches something that role can see. Writers
+# invalidate by role and/or view; each (view, role) pair carries a
+# generation, and a body built while its generation moved on is not
+# stored (the write may have landed after the build read the store).
+
+
+class ResponseCache:
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._entries = {} # (view, role) -> (body bytes, stored at)
+        self._everything = 0
+        self._by_role = {}
+        self._by_view = {}
+        self._by_pair = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def generation(self, view, role):
+        return (self._everything, self._by_role.get(role, 0), self._by_view.get(view, 0),
+                self._by_pair.get((view, role), 0))
+
+    def get(self, view, role, max_age=None):
+        """The cached body, or None (missing or older than max_age seconds)."""
+        entry = self._entries.get((view, role)) if self.enabled else None
+        if entry is None or (max_age is not None and time.monotonic() - entry[1] > max_age):
+            return None
+        return entry[0]
+
+    def put(self, view, role, body, generation):
+        """Stores a body built at `generation` (from generation()) unless it is stale."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.generation(view, role) == generation:
+                self._entries[(view, role)] = (body, time.monotonic())
+
+    def invalidate(self, roles=None, views=None):
+        """Drops entries of the given roles and views (None: all of them)."""
+        with self._lock:
+            if roles is None and views is None:
+                self._everything += 1
+                self._entries = {}
+                return
+            if views is None:
+                for role in roles:
+                    self._by_role[role] = self._by_role.get(role, 0) + 1
+            elif roles is None:
+                for view in views:
+                    self._by_view[view] = self._by_view.get(view, 0) + 1
+            else:
+                for view in views:
+                    for role in roles:
+                        self._by_pair[(view, role)] = self._by_pair.get((view, role), 0) + 1
+            self._entries = {key: entry for key, entry in self._entries.items()
+                             if not ((views is None or key[0] in views) and (roles is None or key[1] in roles))}
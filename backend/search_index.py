@@ -0,0 +1,198 @@
+import heapq
+import math
+import re
+import threading
+
+# --- Clinical Tokenizer ---
+
+# Keeps decimals, ratios and percentages together ("37.1C", "130/85", "92%")
+# so vitals and dosages can be searched exactly as charted.
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[./][a-z0-9]+)*%?", re.IGNORECASE)
+# Numeric and alphabetic parts of a compound token ("125mg" -> "125", "mg")
+PART_RE = re.compile(r"\d+(?:\.\d+)?|[a-z]+", re.IGNORECASE)
+
+# Score multiplier for matches that fall inside an existing highlight
+HIGHLIGHT_BOOST = 2.0
+SNIPPET_RADIUS = 40
+
+
+def tokenize(text, expand=True):
+    """
+    Yields (token, start, end) for clinical free text.
+    Offsets point into the original string. With expand=True the parts of
+    compound tokens are emitted too, so "SpO2: 92%" is found by "spo2",
+    "92%" or "92", and "125mg" by "125 mg".
+    """
+    if not isinstance(text, str):
+        return
+    for m in TOKEN_RE.finditer(text):
+        token = m.group().lower()
+        start, end = m.span()
+        yield token, start, end
+        if not expand:
+            continue
+        parts = list(PART_RE.finditer(m.group()))
+        if len(parts) > 1 or (parts and parts[0].group().lower() != token):
+            for p in parts:
+                yield p.group().lower(), start + p.start(), start + p.end()
+
+
+class SearchIndex:
+    """
+    Incrementally updated inverted index over note content.
+    Postings map token -> {note_id: [(start, end), ...]} so a query only
+    touches the notes that contain its rarest term.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._doc_tokens = {}
+        self._docs = {}
+        self._seq = {}
+        self._next_seq = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def clear(self):
+        with self._lock:
+            self._postings = {}
+            self._doc_tokens = {}
+            self._docs = {}
+            self._seq = {}
+
+    def add(self, note):
+        """
+        Indexes (or re-indexes) a note. Notes added later rank as more
+        recent when scores tie, so load history oldest first.
+        """
+        with self._lock:
+            note_id = note.id
+            if note_id in self._docs:
+                self._remove_locked(note_id)
+
+            spans = {}
+            for token, start, end in tokenize(note.content):
+                spans.setdefault(token, []).append((start, end))
+
+            for token, positions in spans.items():
+                self._postings.setdefault(token, {})[note_id] = positions
+            self._doc_tokens[note_id] = tuple(spans)
+            self._docs[note_id] = note
+            self._seq[note_id] = self._next_seq
+            self._next_seq += 1
+
+    def update(self, note):
+        self.add(note)
+
+    def remove(self, note_id):
+        with self._lock:
+            self._remove_locked(note_id)
+
+    def _remove_locked(self, note_id):
+        for token in self._doc_tokens.pop(note_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(note_id, None)
+            if not postings:
+                del self._postings[token]
+        self._docs.pop(note_id, None)
+        self._seq.pop(note_id, None)
+
+    def search(self, query, visible=None, limit=20):
+        """
+        Returns up to `limit` (score, note, matches) tuples, best first.
+        All query terms must match. `visible(note)` filters results (RBAC).
+        """
+        terms = list(dict.fromkeys(t for t, _, _ in tokenize(query, expand=False)))
+        if not terms:
+            return []
+
+        with self._lock:
+            term_postings = []
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    return []
+                term_postings.append((term, postings))
+
+            # Intersect starting from the rarest term
+            term_postings.sort(key=lambda tp: len(tp[1]))
+            candidates = term_postings[0][1].keys()
+            for _, postings in term_postings[1:]:
+                candidates = [c for c in candidates if c in postings]
+                if not candidates:
+                    return []
+
+            total_docs = len(self._docs)
+            idf = [math.log(1.0 + total_docs / len(postings)) for _, postings in term_postings]
+            all_postings = [postings for _, postings in term_postings]
+
+            # Cheap tf-idf bound first; only notes with highlights can be
+            # boosted, so exact scoring stops as soon as no remaining
+            # candidate can enter the top `limit`.
+            docs = self._docs
+            seq = self._seq
+            bounded = []
+            for note_id in candidates:
+                base = 0.0
+                for i, postings in enumerate(all_postings):
+                    base += _tf_weight(len(postings[note_id])) * idf[i]
+                if docs[note_id].highlights:
+                    base *= HIGHLIGHT_BOOST
+                bounded.append((-base, -seq[note_id], note_id))
+            heapq.heapify(bounded)
+
+            results = []
+            while bounded:
+                neg_bound, neg_seq, note_id = heapq.heappop(bounded)
+                if len(results) >= limit and (-neg_bound, -neg_seq) < results[0][:2]:
+                    break
+                note = docs[note_id]
+                if visible is not None and not visible(note):
+                    continue
+
+                highlight_spans = [(h.start, h.end) for h in note.highlights or ()
+                                   if isinstance(h.start, int) and isinstance(h.end, int)]
+                score = 0.0
+                matches = []
+                for i, postings in enumerate(all_postings):
+                    positions = postings[note_id]
+                    term_score = _tf_weight(len(positions)) * idf[i]
+                    if any(hs <= s and e <= he for s, e in positions for hs, he in highlight_spans):
+                        term_score *= HIGHLIGHT_BOOST
+                    score += term_score
+                    matches.extend(positions)
+                matches.sort()
+
+                entry = (score, -neg_seq, note, matches)
+                if len(results) < limit:
+                    heapq.heappush(results, entry)
+                elif entry[:2] > results[0][:2]:
+                    heapq.heapreplace(results, entry)
+
+        results.sort(key=lambda r: (r[0], r[1]), reverse=True)
+        return [(score, note, matches) for score, _, note, matches in results]
+
+
+_TF_WEIGHTS = [0.0] + [1.0 + math.log(tf) for tf in range(1, 64)]
+
+
+def _tf_weight(tf):
+    return _TF_WEIGHTS[tf] if tf < 64 else 1.0 + math.log(tf)
+
+
+def make_snippet(content, matches, radius=SNIPPET_RADIUS):
+    """
+    Builds a snippet around the first match.
+    Returns (snippet, snippet_start) where snippet_start is the offset of
+    the snippet inside content.
+    """
+    if not matches:
+        return content[:radius * 2], 0
+    first_start, first_end = matches[0]
+    start = max(0, first_start - radius)
+    end = min(len(content), first_end + radius)
+    return content[start:end], start
@@ -0,0 +1,139 @@
+import json
+import mmap
+import os
+import struct
+
+# --- Note Segment Files ---
+# Immutable files holding compacted (cold) notes:
+#   SEGMENT_MAGIC
+#   record*   4-byte big-endian length + payload (Fernet token, or plain
+#             compact JSON when no key is configured)
+#   index     JSON list of per-note metadata, encrypted like the records
+#   footer    8-byte index offset, 4-byte index length, SEGMENT_END
+# Readers mmap the file and load only the index; a record is sliced out
+# (and decrypted) when it is read, so opening a segment costs the index,
+# not the notes. Records are stored pre-serialized, so plaintext ones can
+# be copied into a response body straight from the mapping (memoryview
+# slices), without a parse or an intermediate bytes object.
+#
+# Index entries may list the role codes allowed to see the note
+# ('roles'); readers turn that into a per-role visibility index.
+
+SEGMENT_MAGIC = b"NOTESEG1\n"
+SEGMENT_END = b"\nNOTESEG"
+_LENGTH = struct.Struct('>I')
+_FOOTER = struct.Struct('>QI')
+FOOTER_SIZE = _FOOTER.size + len(SEGMENT_END)
+
+
+def _seal(data, cipher):
+    return cipher.encrypt(data) if cipher is not None else data
+
+
+def _open(data, cipher):
+    return cipher.decrypt(bytes(data)) if cipher is not None else bytes(data)
+
+
+def write_segment(path, entries, cipher=None):
+    """
+    Writes a segment atomically. `entries` is a list of (meta, payloads):
+    meta is a JSON-serializable dict and payloads a list of byte strings
+    stored as records; meta gets 'records' = the records' indexes.
+    """
+    offsets = []
+    index = []
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(SEGMENT_MAGIC)
+        for meta, payloads in entries:
+            positions = []
+            for payload in payloads:
+                sealed = _seal(payload, cipher)
+                positions.append(len(offsets))
+                offsets.append((f.tell() + _LENGTH.size, len(sealed)))
+                f.write(_LENGTH.pack(len(sealed)))
+                f.write(sealed)
+            index.append(dict(meta, records=positions))
+        index_offset = f.tell()
+        index_data = _seal(json.dumps({"offsets": offsets, "entries": index},
+                                      separators=(',', ':')).encode('utf-8'), cipher)
+        f.write(index_data)
+        f.write(_FOOTER.pack(index_offset, len(index_data)))
+        f.write(SEGMENT_END)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def rotate_segment(segment, path, cipher):
+    """
+    Writes a copy of `segment` to `path` (atomically) with every record and
+    the index re-keyed by cipher.rotate (envelope.Keyring: data keys
+    re-wrapped under the primary key, payloads copied as they are).
+    """
+    buf = segment._mmap
+    offsets = []
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(SEGMENT_MAGIC)
+        for offset, length in segment._offsets:
+            sealed = cipher.rotate(buf[offset:offset + length])
+            offsets.append((f.tell() + _LENGTH.size, len(sealed)))
+            f.write(_LENGTH.pack(len(sealed)))
+            f.write(sealed)
+        index_offset = f.tell()
+        index_data = cipher.encrypt(json.dumps({"offsets": offsets, "entries": segment.entries},
+                                               separators=(',', ':')).encode('utf-8'))
+        f.write(index_data)
+        f.write(_FOOTER.pack(index_offset, len(index_data)))
+        f.write(SEGMENT_END)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Segment:
+    """Read-only view of a segment file."""
+
+    def __init__(self, path, cipher=None):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._cipher = cipher
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = self._mmap
+        if buf[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC or buf[-len(SEGMENT_END):] != SEGMENT_END:
+            self.close()
+            raise ValueError(f"{path}: not a note segment")
+        index_offset, index_length = _FOOTER.unpack_from(buf, len(buf) - FOOTER_SIZE)
+        index = json.loads(_open(buf[index_offset:index_offset + index_length], cipher))
+        self._offsets = index['offsets']
+        self.entries = index['entries']
+        self.visible = {} # role code -> entries the role may see, in file order
+        for entry in self.entries:
+            for role in entry.get('roles', ()):
+                self.visible.setdefault(role, []).append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def record(self, i):
+        """Payload of record i (decrypted)."""
+        offset, length = self._offsets[i]
+        return _open(self._mmap[offset:offset + length], self._cipher)
+
+    def record_view(self, i):
+        """
+        Payload of record i without copying when it is stored in plaintext
+        (a memoryview into the mapping); decrypted bytes otherwise.
+        """
+        offset, length = self._offsets[i]
+        if self._cipher is None:
+            return memoryview(self._mmap)[offset:offset + length]
+        return self._cipher.decrypt(self._mmap[offset:offset + length])
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass # A response still holds a view; the mapping goes with it
@@ -0,0 +1,63 @@
+import json
+import threading
+import time
+
+# --- Request Trace Recorder ---
+# Appends one compact JSON line per request to a trace file, so real clinic
+# traffic can be replayed against a test server (benchmarks/replay.py):
+#   {"t": ms since recording started, "m": method, "r": route rule
+#    (/api/notes/<note_id>, never the concrete path), "role": caller role,
+#    "q": query args, "b": enum-like body fields, "n": lengths of the other
+#    body fields, "i": body fields holding ids, "in"/"out": request and
+#    response bytes (out -1: streamed), "s": status, "ms": server time}
+# Traces must carry no PHI: query values go through the redactor, and of
+# the body only SHAPE_FIELDS keep their values; text is reduced to its
+# length and ids to their field name.
+
+SHAPE_FIELDS = frozenset({'role', 'author_role', 'type', 'resolution_type', 'simulate_ai', 'start', 'end'})
+
+
+def body_shape(data):
+    """(kept fields, field lengths, id fields) of a JSON request body."""
+    kept, lengths, ids = {}, {}, []
+    if not isinstance(data, dict):
+        return kept, lengths, ids
+    for key, value in data.items():
+        if key in SHAPE_FIELDS and (value is None or isinstance(value, (str, bool, int, float))):
+            kept[key] = value
+        elif key == 'id' or key.endswith('_id'):
+            ids.append(key)
+        elif isinstance(value, (str, list, dict)):
+            lengths[key] = len(value)
+    return kept, lengths, ids
+
+
+class TraceRecorder:
+
+    def __init__(self, path, redact):
+        self.path = path
+        self._redact = redact
+        self._file = open(path, 'a', buffering=1) # Line buffered: a crash loses at most one line
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, method, rule, args, data, in_bytes, out_bytes, status, seconds):
+        kept, lengths, ids = body_shape(data)
+        role = args.get('role') or kept.get('role') or kept.get('author_role')
+        entry = {"t": round((time.monotonic() - self._started) * 1000, 1), "m": method, "r": rule,
+                 "role": self._redact(role), "q": {k: self._redact(v) for k, v in args.items()},
+                 "b": {k: self._redact(v) for k, v in kept.items()}, "n": lengths, "i": ids,
+                 "in": in_bytes, "out": out_bytes, "s": status, "ms": round(seconds * 1000, 2)}
+        line = json.dumps(entry, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_trace(path):
+    """The trace's entries, in recorded order."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,70 @@
+import json
+import threading
+
+from models import Note
+
+# --- Version Store ---
+# Previous versions of notes, kept out of the notes themselves. Each
+# version is stored once as compact JSON keyed by (note_id, version) and
+# decoded only when someone asks for it (side panel, revert, diff). The
+# note's own `history` list holds metadata stubs: timeline payloads still
+# grow by one stub per edit, but not by a copy of each version's content.
+
+# Fields kept on history stubs (enough for the audit trail and the glance)
+STUB_FIELDS = ('version', 'timestamp', 'author_role', 'last_editor', 'reverted_at', 'reverted_by')
+
+
+def make_stub(data):
+    return Note.from_dict({k: data[k] for k in STUB_FIELDS if k in data})
+
+
+class VersionStore:
+
+    def __init__(self):
+        self._versions = {} # (note_id, version) -> JSON bytes
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._versions)
+
+    def clear(self):
+        with self._lock:
+            self._versions = {}
+
+    def put(self, note_id, snapshot):
+        """Stores a version snapshot (a Note without history). Returns its stub."""
+        data = snapshot.to_dict()
+        data.pop('history', None)
+        encoded = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            self._versions[(note_id, data.get('version'))] = encoded
+        return make_stub(data)
+
+    def load(self, note_id, history):
+        """
+        Moves a loaded note's full history (list of Notes, oldest first) into
+        the store and returns the stubs. Versions missing or repeated in
+        legacy records are numbered after the highest one seen.
+        """
+        stubs, seen = [], set()
+        for version in history:
+            if not isinstance(version.version, int) or version.version in seen:
+                version.version = max(seen, default=0) + 1
+            seen.add(version.version)
+            stubs.append(self.put(note_id, version))
+        return stubs
+
+    def drop(self, note_id, stubs):
+        """Forgets a note's versions (e.g. when it moves to the cold tier)."""
+        with self._lock:
+            for stub in stubs:
+                self._versions.pop((note_id, stub.version), None)
+
+    def get(self, note_id, version):
+        """The stored version as a Note, or None."""
+        encoded = self._versions.get((note_id, version))
+        return None if encoded is None else Note.from_dict(json.loads(encoded))
+
+    def history(self, note_id, stubs):
+        """Full versions for a note's stubs, oldest first."""
+        return [self.get(note_id, stub.version) or stub for stub in stubs]
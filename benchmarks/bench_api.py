@@ -0,0 +1,261 @@
+"""
+Load-test / benchmark harness for the Flask API.
+
+Builds a synthetic dataset scaled from generate_synthetic_data.py
+(patients x notes x edits x actions), loads it into the app, drives every
+route in-process through the Flask test client with the fake LLM provider and
+reports per-route p50/p90/p99 latency, throughput and RSS as JSON, so
+runs can be compared between commits.
+
+    python benchmarks/bench_api.py --patients 20 --notes-per-patient 100 --output bench.json
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'backend'))
+
+import generate_synthetic_data as synthetic  # noqa: E402
+from llm_client import FakeProvider, LLMClient  # noqa: E402
+
+READ_ROLES = ["clinician", "staff", "patient", "admin"]
+SEARCH_QUERIES = ["spo2", "asthma", "prednisone 40mg", "hr 110", "nebulizer"]
+CLINICIAN_EDITABLE = ("clinician", "ai", "system")
+
+
+# --- Dataset ---
+
+def build_dataset(patients, notes_per_patient, edits, actions, seed):
+    """
+    Scales the synthetic scenarios: every patient gets notes_per_patient
+    notes drawn from the scenario templates, each with `edits` prior
+    versions and at least `actions` actions. Returns notes newest first.
+    """
+    rng = random.Random(seed)
+
+    records = []
+    for p in range(patients):
+        for _ in range(notes_per_patient):
+            template = rng.choice(synthetic.scenarios)
+            minutes_ago = rng.randint(0, 60 * 24 * 30)
+            note = synthetic.build_note(template, minutes_ago=minutes_ago, rng=rng)
+            note['patient_id'] = f"patient-{p:05d}"
+
+            history = note['history']
+            for e in range(edits):
+                history.append({
+                    "version": len(history) + 1,
+                    "timestamp": synthetic.get_time_offset(minutes_ago + edits - e),
+                    "content": f"{note['content']} (draft {e + 1})",
+                    "author_role": note['author_role']
+                })
+            note['history'] = history
+            note['version'] = len(history) + 1
+
+            for a in range(len(note['actions']), actions):
+                note['actions'].append({
+                    "id": synthetic.generate_id(rng),
+                    "title": f"Follow-up task {a + 1}",
+                    "status": "pending",
+                    "created_by_role": note['author_role'],
+                    "assigned_to_role": "staff" if a % 2 == 0 else "clinician",
+                    "provenance_note_id": note['id'],
+                    "created_at": note['timestamp'],
+                    "resolution_comment": ""
+                })
+            records.append(note)
+
+    records.sort(key=lambda n: n['timestamp'], reverse=True)
+    return records
+
+
+# --- Offline LLM ---
+
+def install_fake_llm(app_module, latency_ms):
+    """Routes every LLM call through the deterministic fake provider (no rate limit)."""
+    app_module.llm = LLMClient(FakeProvider(latency=latency_ms / 1000.0), rate_limit=0)
+
+
+# --- Measurement ---
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def current_rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_route(app, name, op, count, concurrency):
+    """Runs op(client, i) `count` times across `concurrency` threads."""
+    local = threading.local()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def call(i):
+        nonlocal errors
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        start = time.perf_counter()
+        resp = op(client, i)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if resp.status_code >= 400:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(count)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None  # noqa: E731
+    return {
+        "route": name,
+        "requests": count,
+        "errors": errors,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p90_ms": ms(percentile(latencies, 90)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "throughput_rps": round(count / wall, 1) if wall else None,
+        "rss_bytes": current_rss_bytes(),
+    }
+
+
+def build_routes(records, requests):
+    """Route name -> (op, count). Write routes consume distinct targets."""
+    editable = [n for n in records if n['author_role'] in CLINICIAN_EDITABLE]
+    revertable = [n for n in editable if n['history']]
+    open_actions = [a for n in records for a in n['actions']
+                    if a['status'] in ('pending', 'unresolved') and a['assigned_to_role'] in ('staff', 'clinician')]
+    pick = lambda items, i: items[i % len(items)]  # noqa: E731
+
+    routes = {
+        "GET /api/timeline": (lambda c, i: c.get(f"/api/timeline?role={pick(READ_ROLES, i)}"), requests),
+        "GET /api/glance": (lambda c, i: c.get(f"/api/glance?role={pick(READ_ROLES, i)}"), requests),
+        "GET /api/actions": (lambda c, i: c.get(f"/api/actions?role={pick(['staff', 'clinician'], i)}&limit=50"), requests),
+        "GET /api/search": (lambda c, i: c.get(f"/api/search?q={pick(SEARCH_QUERIES, i)}&role=clinician"), requests),
+        "POST /api/notes": (lambda c, i: c.post('/api/notes', json={
+            "content": f"Bench note {i}: HR 96, SpO2 97% on room air. Plan: observe.",
+            "author_role": "staff", "type": "staff_note", "manual_actions": ["Recheck vitals"]
+        }), requests),
+        "POST /api/notes (simulate_ai)": (lambda c, i: c.post('/api/notes', json={
+            "content": "", "author_role": "ai", "type": "ai_doctor_consult_summary", "simulate_ai": True
+        }), requests),
+        "POST /api/notes/<id>/highlight": (lambda c, i: c.post(f"/api/notes/{pick(records, i)['id']}/highlight", json={
+            "text": pick(records, i)['content'][:10], "start": 0, "end": 10
+        }), requests),
+        "POST /api/consult/end": (lambda c, i: c.post('/api/consult/end', json={
+            "role": pick(['clinician', 'staff', 'patient'], i)
+        }), requests),
+        "POST /api/consult/end/stream": (lambda c, i: c.post('/api/consult/end/stream', json={
+            "role": pick(['clinician', 'staff', 'patient'], i)
+        }), requests),
+    }
+    if editable:
+        routes["PUT /api/notes/<id>"] = (lambda c, i: c.put(f"/api/notes/{pick(editable, i)['id']}", json={
+            "content": f"{pick(editable, i)['content']} (bench edit {i})", "role": "clinician"
+        }), requests)
+    if revertable:
+        routes["POST /api/notes/<id>/revert"] = (lambda c, i: c.post(
+            f"/api/notes/{pick(revertable, i)['id']}/revert", json={"role": "clinician"}), requests)
+    if open_actions:
+        routes["POST /api/actions/<id>/resolve"] = (lambda c, i: c.post(
+            f"/api/actions/{open_actions[i]['id']}/resolve", json={
+                "role": open_actions[i]['assigned_to_role'], "resolution_type": "forward",
+                "comment": "bench", "new_action_title": "Bench follow-up"
+            }), min(requests, len(open_actions)))
+    return routes
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patients', type=int, default=10)
+    parser.add_argument('--notes-per-patient', type=int, default=50)
+    parser.add_argument('--edits', type=int, default=2, help='prior versions per note')
+    parser.add_argument('--actions', type=int, default=2, help='minimum actions per note')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='simulated LLM round trip')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--routes', help='comma-separated substrings; only matching routes run')
+    parser.add_argument('--output', help='write JSON results here (default: stdout)')
+    args = parser.parse_args()
+
+    import app as app_module
+    install_fake_llm(app_module, args.llm_latency_ms)
+
+    records = build_dataset(args.patients, args.notes_per_patient, args.edits, args.actions, args.seed)
+    load_start = time.perf_counter()
+    app_module.load_store(json.loads(json.dumps(records)))
+    load_seconds = time.perf_counter() - load_start
+
+    routes = build_routes(records, args.requests)
+    if args.routes:
+        wanted = [w.strip() for w in args.routes.split(',')]
+        routes = {k: v for k, v in routes.items() if any(w in k for w in wanted)}
+
+    results = []
+    for name, (op, count) in routes.items():
+        results.append(run_route(app_module.app, name, op, count, args.concurrency))
+        print(f"{name}: p50={results[-1]['p50_ms']}ms p99={results[-1]['p99_ms']}ms", file=sys.stderr)
+
+    report = {
+        "benchmark": "api",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "dataset": {
+            "notes": len(records),
+            "actions": sum(len(n['actions']) for n in records),
+            "history_versions": sum(len(n['history']) for n in records),
+            "load_seconds": round(load_seconds, 3),
+        },
+        "peak_rss_bytes": peak_rss_bytes(),
+        "routes": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
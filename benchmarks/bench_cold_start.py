@@ -0,0 +1,119 @@
+"""
+Cold-start benchmark: how long a fresh process takes to import the app,
+to start answering requests and to have the store loaded (/api/ready
+200), for a synthetic data file written in the chunked layout (encrypted
+with backend/secret.key when it exists). Each run is a new interpreter;
+medians over --runs are reported as JSON.
+
+    python benchmarks/bench_cold_start.py --patients 20 --notes-per-patient 100
+
+`background` is create_app()'s default (serve first, load on a thread);
+`sync` loads before create_app() returns, as importing app.py used to.
+--gemini configures the Gemini provider with a dummy key, to check that
+the SDK import stays off the startup path.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_api import ROOT, build_dataset  # noqa: E402
+
+sys.path.append(os.path.join(ROOT, 'backend'))
+from envelope import Keyring  # noqa: E402
+from note_file import CHUNKED_HEADER, encode_chunk  # noqa: E402
+
+BACKEND = os.path.join(ROOT, 'backend')
+CHUNK_NOTES = 500
+
+# Runs in the child; wall-clock times so the parent can add process spawn
+CHILD = """
+import json, sys, time
+started = time.time()
+sys.path.insert(0, {backend!r})
+import app
+imported = time.time()
+app.create_app({{'STORE_LOAD': {mode!r}}})
+client = app.app.test_client()
+client.get('/api/ready')
+serving = time.time()
+while client.get('/api/ready').status_code != 200:
+    time.sleep(0.002)
+ready = time.time()
+print(json.dumps({{"started": started, "imported": imported, "serving": serving, "ready": ready,
+                  "notes": len(app.notes), "sdk_imported": 'google.generativeai' in sys.modules}}))
+"""
+
+
+def write_data_file(path, records):
+    key_file = os.path.join(BACKEND, 'secret.key')
+    cipher = Keyring.load(key_file) if os.path.exists(key_file) else None
+    with open(path, 'wb') as f:
+        f.write(CHUNKED_HEADER)
+        for i in range(0, len(records), CHUNK_NOTES):
+            f.write(encode_chunk(records[i:i + CHUNK_NOTES], cipher))
+
+
+def run_once(mode, env):
+    spawned = time.time()
+    out = subprocess.run([sys.executable, '-c', CHILD.format(backend=BACKEND, mode=mode)],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    times = json.loads(next(line for line in out.splitlines() if line.startswith('{')))
+    return {
+        "spawn_ms": (times['started'] - spawned) * 1000,
+        "import_ms": (times['imported'] - times['started']) * 1000,
+        "serving_ms": (times['serving'] - spawned) * 1000,
+        "ready_ms": (times['ready'] - spawned) * 1000,
+        "notes": times['notes'],
+        "sdk_imported": times['sdk_imported'],
+    }
+
+
+def summarize(mode, runs):
+    summary = {"mode": mode, "runs": len(runs)}
+    for field in ("spawn_ms", "import_ms", "serving_ms", "ready_ms"):
+        summary[field] = round(statistics.median(r[field] for r in runs), 1)
+    summary["notes"] = runs[0]['notes']
+    summary["sdk_imported"] = any(r['sdk_imported'] for r in runs)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patients', type=int, default=10)
+    parser.add_argument('--notes-per-patient', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--gemini', action='store_true', help='configure Gemini with a dummy key')
+    args = parser.parse_args()
+
+    records = build_dataset(args.patients, args.notes_per_patient, 2, 2, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, 'notes.dat')
+        write_data_file(data_file, records)
+        size = os.path.getsize(data_file)
+        env = dict(os.environ, NOTES_FILE=data_file, METRICS_ENABLED="0")
+        env.pop('TIER_DIR', None)
+        if args.gemini:
+            env.update(LLM_PROVIDER="gemini", GEMINI_API_KEY="dummy-key")
+        else:
+            env.update(LLM_PROVIDER="fake")
+        results = [summarize(mode, [run_once(mode, env) for _ in range(args.runs)])
+                   for mode in ("background", "sync")]
+
+    print(json.dumps({
+        "benchmark": "cold_start",
+        "notes": len(records),
+        "data_file_bytes": size,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
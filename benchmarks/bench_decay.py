@@ -0,0 +1,93 @@
+"""
+Decay scoring benchmark: legacy per-note strptime loop vs. the vectorized
+NumPy pass used by get_glance.
+
+    python benchmarks/bench_decay.py --highlights 1000000
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from decay import TimestampArray, decay_weights, rank_highlights  # noqa: E402
+
+
+def legacy_decay_weight(timestamp_str):
+    item_time = datetime.datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M")
+    days = (datetime.datetime.now() - item_time).days
+    return max(0.0, min(1.0, 1.0 / (1.0 + 0.5 * days)))
+
+
+def build_dataset(num_highlights, per_note, seed):
+    rng = random.Random(seed)
+    now = datetime.datetime.now()
+    notes = []
+    for i in range(num_highlights // per_note):
+        ts = (now - datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 30))).strftime("%Y-%m-%d %H:%M")
+        highlights = [{"type": rng.choice(["risk", "vital", "critical"])} for _ in range(per_note)]
+        notes.append({"id": str(i), "timestamp": ts, "highlights": highlights})
+    return notes
+
+
+def run_legacy(notes):
+    kept = []
+    for n in notes:
+        w = legacy_decay_weight(n['timestamp'])
+        for h in n['highlights']:
+            if w < 0.2 and h['type'] != 'critical':
+                continue
+            kept.append((w, n['timestamp'], h))
+    kept.sort(key=lambda x: (x[0], x[1]), reverse=True)
+    return len(kept)
+
+
+def run_vectorized(notes, stamps, curve):
+    epochs = stamps.epochs([n['id'] for n in notes])
+    weights = decay_weights(epochs, curve=curve)
+    counts = [len(n['highlights']) for n in notes]
+    critical = [h['type'] == 'critical' for n in notes for h in n['highlights']]
+    order = rank_highlights(np.repeat(weights, counts), np.repeat(epochs, counts), critical)
+    return len(order)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--highlights', type=int, default=1_000_000)
+    parser.add_argument('--per-note', type=int, default=2)
+    parser.add_argument('--curve', default='hyperbolic')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    notes = build_dataset(args.highlights, args.per_note, args.seed)
+    stamps = TimestampArray(capacity=len(notes))
+    for n in notes:
+        stamps.set(n['id'], n['timestamp'])
+
+    start = time.perf_counter()
+    legacy_kept = run_legacy(notes)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vector_kept = run_vectorized(notes, stamps, args.curve)
+    vector_s = time.perf_counter() - start
+
+    print(json.dumps({
+        "benchmark": "decay",
+        "highlights": len(notes) * args.per_note,
+        "curve": args.curve,
+        "legacy_seconds": round(legacy_s, 4),
+        "vectorized_seconds": round(vector_s, 4),
+        "speedup": round(legacy_s / vector_s, 1) if vector_s else None,
+        "kept": {"legacy": legacy_kept, "vectorized": vector_kept},
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Glance assembly benchmark: time, peak memory and allocations per uncached
+/api/glance build (response cache bypassed), measured with tracemalloc on
+the bench_api dataset. `blocks_at_serialize` counts the memory blocks the
+build has allocated and still holds when it hands the payload to the JSON
+encoder (payload plus intermediates), i.e. its allocations at the peak.
+
+    python benchmarks/bench_glance.py --patients 20 --notes-per-patient 100
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_api import build_dataset  # noqa: E402
+
+ROLES = ["clinician", "staff", "admin"]
+
+
+def measure(app_module, role, calls):
+    """Per-call milliseconds, peak KiB above the baseline and blocks held at serialization."""
+    build = app_module.build_glance
+    user_role = app_module.parse_role(role)
+    jsonify = app_module.jsonify
+    at_serialize = []
+
+    def snapshot_then_jsonify(*args, **kwargs):
+        if tracemalloc.is_tracing():
+            at_serialize.append(tracemalloc.take_snapshot())
+        return jsonify(*args, **kwargs)
+
+    app_module.jsonify = snapshot_then_jsonify
+    with app_module.app.app_context():
+        build(user_role) # Warm up (lazy imports, first-use caches)
+        start = time.perf_counter()
+        for _ in range(calls):
+            build(user_role)
+        seconds = (time.perf_counter() - start) / calls
+
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        response = build(user_role)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+    app_module.jsonify = jsonify
+    blocks = sum(max(0, stat.count_diff) for stat in at_serialize[0].compare_to(before, 'filename'))
+    return {
+        "role": role,
+        "ms_per_call": round(seconds * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+        "blocks_at_serialize": blocks,
+        "signals": len(json.loads(response.get_data())['key_signals']),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patients', type=int, default=10)
+    parser.add_argument('--notes-per-patient', type=int, default=50)
+    parser.add_argument('--calls', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    import app as app_module
+    records = build_dataset(args.patients, args.notes_per_patient, 2, 2, args.seed)
+    app_module.load_store(json.loads(json.dumps(records)))
+
+    print(json.dumps({
+        "benchmark": "glance_allocations",
+        "notes": len(records),
+        "results": [measure(app_module, role, args.calls) for role in ROLES],
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Memory benchmark: bytes per note for the legacy dict records vs. the
+slotted models in backend/models.py (measured with tracemalloc).
+
+    python benchmarks/bench_models.py --notes 100000
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from models import Note  # noqa: E402
+
+ROLES = ["patient", "staff", "clinician", "ai", "system"]
+TYPES = ["staff_note", "clinician_note", "patient_input", "ai_doctor_consult_summary"]
+
+
+def make_note_dict(rng, now):
+    note_id = str(uuid.uuid4())
+    ts = (now - datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 365))).strftime("%Y-%m-%d %H:%M")
+    return {
+        "id": note_id,
+        "content": "HR: 110 (Tachycardic). SpO2: 92% on room air. Plan: nebulizer q20min.",
+        "author_role": rng.choice(ROLES),
+        "type": rng.choice(TYPES),
+        "timestamp": ts,
+        "version": 1,
+        "history": [],
+        "highlights": [{
+            "id": str(uuid.uuid4()), "text": "SpO2: 92%", "type": "vital",
+            "reason": "Hypoxia risk", "start": 21, "end": 30
+        }],
+        "actions": [{
+            "id": str(uuid.uuid4()), "title": "Review Triage Vitals", "status": "pending",
+            "created_by_role": "staff", "assigned_to_role": "clinician",
+            "provenance_note_id": note_id, "created_at": ts
+        }],
+        "visibility_scope": {"patient": False, "staff": True, "clinician": True, "admin": True}
+    }
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return records, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notes', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.datetime.now()
+    # Serialized source, so both representations are built from fresh JSON
+    payload = json.dumps([make_note_dict(rng, now) for _ in range(args.notes)])
+
+    dict_notes, dict_bytes = measure(lambda: json.loads(payload))
+    model_notes, model_bytes = measure(lambda: [Note.from_dict(n) for n in json.loads(payload)])
+    assert model_notes[0].to_dict() == dict_notes[0]
+
+    print(json.dumps({
+        "benchmark": "models_memory",
+        "notes": args.notes,
+        "dict_bytes_per_note": round(dict_bytes / args.notes, 1),
+        "model_bytes_per_note": round(model_bytes / args.notes, 1),
+        "reduction": round(1 - model_bytes / dict_bytes, 3),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
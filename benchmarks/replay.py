@@ -0,0 +1,208 @@
+"""
+Replay driver for recorded request traces (TRACE_FILE=path on the server,
+see backend/trace_recorder.py). Re-issues the trace open-loop: every
+request starts at its recorded offset divided by the speed, whether or
+not earlier ones have finished, so 10x and 100x reproduce a clinic's
+traffic pattern at higher load. Reports per-route p50/p90/p99 latency next
+to the latency recorded in the trace, plus how far the driver fell behind
+schedule, as JSON.
+
+    python benchmarks/replay.py trace.jsonl --speeds 1 10 100
+    python benchmarks/replay.py trace.jsonl --url http://localhost:5001   # server run with LLM_PROVIDER=fake
+
+Without --url the app runs in-process on the bench_api synthetic dataset
+with the fake LLM provider. Note, action and highlight ids in routes are
+filled with ids from the target's own timeline, and body text with filler
+of the recorded length.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_api import ROOT, build_dataset, install_fake_llm, percentile  # noqa: E402
+
+sys.path.append(os.path.join(ROOT, 'backend'))
+from trace_recorder import read_trace  # noqa: E402
+
+ROUTE_PARAM = re.compile(r'<(?:[^:>]+:)?([^>]+)>')
+FILLER = "Replayed note: HR 96, SpO2 97% on room air, no acute distress. Plan: observe and recheck. "
+
+
+# --- Requests ---
+
+def load_targets(send):
+    """Ids from the target's timeline to fill route parameters with."""
+    status, body = send('GET', '/api/timeline', {'role': 'admin'}, None)
+    notes = json.loads(body) if status == 200 else []
+    return {
+        "notes": notes,
+        "actions": [a['id'] for n in notes for a in n.get('actions') or ()
+                    if a.get('status') in ('pending', 'unresolved')],
+    }
+
+
+def filler(length):
+    return (FILLER * (length // len(FILLER) + 1))[:length]
+
+
+def build_request(entry, targets, i):
+    """(method, path, query, body) re-creating a trace entry against the target's data."""
+    notes = targets['notes']
+    note = notes[i % len(notes)] if notes else {}
+    highlights = note.get('highlights') or [{}]
+    actions = targets['actions']
+    params = {
+        'note_id': note.get('id', 'missing'),
+        'action_id': actions[i % len(actions)] if actions else 'missing',
+        'highlight_id': highlights[i % len(highlights)].get('id', 'missing'),
+        'version': str(max(1, (note.get('version') or 1) - 1)),
+    }
+    path = ROUTE_PARAM.sub(lambda m: urllib.parse.quote(params.get(m.group(1), 'missing')), entry['r'])
+
+    body = None
+    if entry['m'] != 'GET':
+        body = dict(entry['b'])
+        for key, length in entry['n'].items():
+            body[key] = ["Recheck vitals"] * length if key in ('manual_actions', 'highlights') else filler(length)
+        for key in entry['i']:
+            body[key] = note.get('id')
+    return entry['m'], path, entry['q'], body
+
+
+def in_process_sender(app):
+    local = threading.local()
+
+    def send(method, path, query, body):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        response = client.open(path, method=method, query_string=query, json=body)
+        return response.status_code, response.get_data()
+    return send
+
+
+def http_sender(base_url):
+    def send(method, path, query, body):
+        url = base_url.rstrip('/') + path + ('?' + urllib.parse.urlencode(query) if query else '')
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(url, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'} if data else {})
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+    return send
+
+
+# --- Replay ---
+
+def replay(entries, send, speed, workers=32, targets=None):
+    """Issues the entries at `speed` times their recorded pace. Returns the per-route report."""
+    targets = targets if targets is not None else load_targets(send)
+    latencies = {}
+    recorded = {}
+    errors = {}
+    lags = []
+    lock = threading.Lock()
+
+    def call(i, entry, due):
+        lag = time.perf_counter() - due
+        method, path, query, body = build_request(entry, targets, i)
+        start = time.perf_counter()
+        status, _ = send(method, path, query, body)
+        elapsed = time.perf_counter() - start
+        route = f"{entry['m']} {entry['r']}"
+        with lock:
+            lags.append(lag)
+            latencies.setdefault(route, []).append(elapsed)
+            recorded.setdefault(route, []).append(entry['ms'] / 1000.0)
+            if status >= 500 or (status >= 400 and entry['s'] < 400): # Failed where the original didn't
+                errors[route] = errors.get(route, 0) + 1
+
+    first = entries[0]['t'] if entries else 0
+    wall_start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, entry in enumerate(entries):
+            due = wall_start + (entry['t'] - first) / 1000.0 / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(call, i, entry, due)
+    wall = time.perf_counter() - wall_start
+
+    ms = lambda v: round(v * 1000, 3) if v is not None else None  # noqa: E731
+    routes = []
+    for route, values in sorted(latencies.items()):
+        values.sort()
+        routes.append({
+            "route": route,
+            "requests": len(values),
+            "errors": errors.get(route, 0),
+            "p50_ms": ms(percentile(values, 50)),
+            "p90_ms": ms(percentile(values, 90)),
+            "p99_ms": ms(percentile(values, 99)),
+            "recorded_p50_ms": ms(percentile(sorted(recorded[route]), 50)),
+        })
+    lags.sort()
+    return {
+        "speed": speed,
+        "requests": len(entries),
+        "errors": sum(errors.values()),
+        "wall_s": round(wall, 3),
+        "achieved_rps": round(len(entries) / wall, 1) if wall else None,
+        "p99_lag_ms": ms(percentile(lags, 99)),
+        "routes": routes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('trace', help='trace file written with TRACE_FILE')
+    parser.add_argument('--speeds', type=float, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--url', help='replay against a running server (default: in-process app)')
+    parser.add_argument('--limit', type=int, help='replay only the first N requests')
+    parser.add_argument('--workers', type=int, default=32, help='requests in flight at most')
+    parser.add_argument('--patients', type=int, default=10, help='in-process dataset size')
+    parser.add_argument('--notes-per-patient', type=int, default=50)
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='fake LLM round trip (in-process)')
+    parser.add_argument('--output', help='write JSON results here (default: stdout)')
+    args = parser.parse_args()
+
+    entries = read_trace(args.trace)[:args.limit]
+    if args.url:
+        send = http_sender(args.url)
+        reload = None
+    else:
+        import app as app_module
+        install_fake_llm(app_module, args.llm_latency_ms)
+        records = build_dataset(args.patients, args.notes_per_patient, 2, 2, 42)
+        reload = lambda: app_module.load_store(json.loads(json.dumps(records)))  # noqa: E731
+        send = in_process_sender(app_module.app)
+
+    results = []
+    for speed in args.speeds:
+        if reload is not None:
+            reload() # Same starting store for every speed
+        results.append(replay(entries, send, speed, args.workers))
+
+    report = json.dumps({"benchmark": "replay", "trace": args.trace, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
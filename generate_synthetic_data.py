@@ -1,23 +1,34 @@
+import argparse
 import json
 import uuid
 import datetime
 import random
+from concurrent.futures import ProcessPoolExecutor
 from cryptography.fernet import Fernet
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from envelope import Keyring, read_keys, write_keys  # noqa: E402
+from note_file import CHUNKED_HEADER, encode_chunk  # noqa: E402
 
 # --- Configuration ---
 OUTPUT_FILE = 'backend/note.json'
 KEY_FILE = 'backend/secret.key'
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
 
 # --- Helpers ---
-def generate_id():
-    return str(uuid.uuid4())
+def generate_id(rng=None):
+    """Random UUID string; drawn from rng when given so output is reproducible."""
+    if rng is None:
+        return str(uuid.uuid4())
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
 
-def get_time_offset(minutes_ago):
-    now = datetime.datetime.now()
+def get_time_offset(minutes_ago, now=None):
+    if now is None:
+        now = datetime.datetime.now()
     delta = datetime.timedelta(minutes=minutes_ago)
-    return (now - delta).strftime("%Y-%m-%d %H:%M")
-
+    return (now - delta).strftime(TIMESTAMP_FORMAT)
 # --- Scenarios ---
 # We will create a rich timeline for a single patient visit (e.g., "Acute Asthma Attack")
 # encompassing multiple roles to demonstrate RBAC and features.
@@ -139,27 +150,32 @@ scenarios = [
         "highlights": []
     }
 ]
-
 # --- Build Note Objects ---
-final_notes = []
-for s in scenarios:
-    note_id = generate_id()
-    
+def build_note(s, minutes_ago=None, rng=None, now=None):
+    """
+    Builds one note record from a scenario template.
+    minutes_ago overrides the template's age; rng and now make ids and
+    timestamps reproducible (used when scaling datasets).
+    """
+    note_id = generate_id(rng)
+    if minutes_ago is None:
+        minutes_ago = s['minutes_ago']
+
     # Process Actions
     processed_actions = []
     if 'actions' in s:
         for a in s['actions']:
             processed_actions.append({
-                "id": generate_id(),
+                "id": generate_id(rng),
                 "title": a['title'],
                 "status": a['status'],
                 "created_by_role": a.get('created_by_role', 'system'),
                 "assigned_to_role": a.get('assigned_to_role', 'clinician'),
                 "provenance_note_id": note_id,
-                "created_at": get_time_offset(s['minutes_ago']),
+                "created_at": get_time_offset(minutes_ago, now),
                 "resolution_comment": a.get('resolution_comment', '')
             })
-            
+
     # Process Highlights
     processed_highlights = []
     if 'highlights' in s:
@@ -167,7 +183,7 @@ for s in scenarios:
             start = s['content'].find(h['text'])
             if start != -1:
                 processed_highlights.append({
-                    "id": generate_id(),
+                    "id": generate_id(rng),
                     "text": h['text'],
                     "type": h['type'],
                     "reason": h['reason'],
@@ -175,37 +191,244 @@ for s in scenarios:
                     "end": start + len(h['text'])
                 })
 
-    note = {
+    # Previous versions, 5 minutes apart before this one
+    history = s.get('history', [])
+    history = [
+        dict(h, timestamp=get_time_offset(minutes_ago + 5 * (len(history) - i), now))
+        for i, h in enumerate(history)
+    ]
+
+    return {
         "id": note_id,
         "content": s['content'],
         "author_role": s['author_role'],
         "type": s['type'],
-        "timestamp": get_time_offset(s['minutes_ago']),
+        "timestamp": get_time_offset(minutes_ago, now),
         "version": s.get('version', 1),
-        "history": s.get('history', []),
+        "history": history,
         "highlights": processed_highlights,
         "actions": processed_actions,
         "visibility_scope": s['visibility_scope']
     }
-    final_notes.append(note)
+
+def build_notes():
+    return [build_note(s) for s in scenarios]
+
+# --- Scaled Datasets ---
+# Many patients, each a series of visits replaying the scenario above with
+# randomized vitals, edit drafts and follow-up of earlier actions. Every
+# patient draws from its own RNG seeded by (seed, patient index), so the
+# dataset is identical whatever the worker count or scheduling.
+
+STAFF_VISIBLE = {"patient": False, "staff": True, "clinician": True, "admin": True}
+VISIT_GAP_DAYS = (7, 120)
+VITALS_PROBABILITY = 0.5    # extra vitals check after triage
+EDIT_PROBABILITY = 0.2      # note has earlier drafts
+FOLLOW_UP_PROBABILITY = 0.6 # open action from the previous visit was handled
+FORWARD_PROBABILITY = 0.3   # ...and forwarded rather than just resolved
+
+def build_vitals_note(rng, minutes_ago, now):
+    hr = rng.randint(58, 125)
+    spo2 = rng.randint(88, 100)
+    hr_text = f"HR: {hr}" + (" (Tachycardic)" if hr > 100 else "")
+    spo2_text = f"SpO2: {spo2}% on room air"
+    s = {
+        "type": "staff_note",
+        "author_role": "staff",
+        "content": f"Vitals Check: \nBP: {rng.randint(100, 165)}/{rng.randint(60, 100)} \n{hr_text} \nRR: {rng.randint(12, 30)}/min \n{spo2_text}.",
+        "highlights": [],
+        "actions": [],
+        "visibility_scope": STAFF_VISIBLE
+    }
+    if hr > 100:
+        s['highlights'].append({"text": hr_text, "type": "vital", "reason": "Abnormal heart rate"})
+    if spo2 < 94:
+        s['highlights'].append({"text": spo2_text, "type": "vital", "reason": "Hypoxia risk"})
+    if s['highlights']:
+        s['actions'].append({"title": "Review Vitals", "status": "pending", "assigned_to_role": "clinician", "created_by_role": "staff"})
+    return build_note(s, minutes_ago, rng, now)
+
+def add_drafts(note, rng, minutes_ago, now):
+    """Gives a note 1-3 earlier drafts (truncated content), 5 minutes apart."""
+    lines = note['content'].split('\n')
+    count = rng.randint(1, 3)
+    note['history'] = [
+        {
+            "version": k + 1,
+            "timestamp": get_time_offset(minutes_ago + 5 * (count - k), now),
+            "content": '\n'.join(lines[:max(1, len(lines) - count + k)]),
+            "author_role": note['author_role']
+        }
+        for k in range(count)
+    ]
+    note['version'] = count + 1
+
+def follow_up_action(action, note, rng, minutes_ago, now):
+    """
+    Resolves (and possibly forwards) an action the way
+    /api/actions/<id>/resolve does. Returns the system log note.
+    """
+    role = action['assigned_to_role']
+    comment = rng.choice(["Done", "Completed as requested", "Reviewed, no change needed"])
+    action['status'] = 'resolved'
+    action['resolved_at'] = get_time_offset(minutes_ago, now)
+    action['resolution_comment'] = comment
+
+    log_content = f"✅ Action Resolved: {action['title']}\nNote: {comment}"
+    if rng.random() < FORWARD_PROBABILITY:
+        new_assignee = 'staff' if role == 'clinician' else 'clinician'
+        new_title = f"Follow up: {action['title']}"
+        note['actions'].append({
+            "id": generate_id(rng),
+            "title": new_title,
+            "status": "unresolved",
+            "created_by_role": role,
+            "assigned_to_role": new_assignee,
+            "provenance_note_id": action['provenance_note_id'],
+            "created_at": get_time_offset(minutes_ago, now),
+            "resolution_comment": ""
+        })
+        log_content += f"\n➡️ Forwarded to {new_assignee}: {new_title}"
+
+    return {
+        "id": generate_id(rng),
+        "content": log_content,
+        "author_role": "system",
+        "type": "system_log",
+        "timestamp": get_time_offset(minutes_ago, now),
+        "version": 1,
+        "history": [],
+        "highlights": [],
+        "actions": [],
+        "visibility_scope": STAFF_VISIBLE
+    }
+
+def build_patient(patient_index, notes_per_patient, seed=0, now=None):
+    """Returns one patient's notes (newest first), tagged with patient_id."""
+    rng = random.Random(f"{seed}:{patient_index}")
+
+    # Visit end times, newest first, spaced weeks apart
+    visits = notes_per_patient // len(scenarios) + 1
+    visit_ages = [rng.randint(0, 60 * 24 * 7)]
+    for _ in range(visits - 1):
+        visit_ages.append(visit_ages[-1] + rng.randint(*VISIT_GAP_DAYS) * 60 * 24)
+
+    records = []
+    open_actions = []
+    for visit_age in reversed(visit_ages):
+        # Follow-up between visits on what the last visit left open
+        for action, note in open_actions:
+            if rng.random() < FOLLOW_UP_PROBABILITY:
+                records.append(follow_up_action(action, note, rng, visit_age + 90, now))
+
+        visit = []
+        for s in scenarios:
+            minutes_ago = visit_age + s['minutes_ago']
+            note = build_note(s, minutes_ago, rng, now)
+            if not note['history'] and rng.random() < EDIT_PROBABILITY:
+                add_drafts(note, rng, minutes_ago, now)
+            visit.append(note)
+            if s['type'] == 'staff_note' and 'highlights' in s and rng.random() < VITALS_PROBABILITY:
+                visit.append(build_vitals_note(rng, minutes_ago - 1, now))
+
+        open_actions = [(a, n) for n in visit for a in n['actions'] if a['status'] != 'resolved']
+        records.extend(visit)
+
+    records = records[-notes_per_patient:][::-1]
+    patient_id = f"patient-{patient_index:07d}"
+    for r in records:
+        r['patient_id'] = patient_id
+    return records
 
 # --- Save & Encrypt ---
-json_data = json.dumps(final_notes, indent=2).encode('utf-8')
+def load_or_create_keys(key_file=KEY_FILE):
+    """The key file's keys, primary first (backend/envelope.py); creates a one-key file."""
+    if os.path.exists(key_file):
+        return read_keys(key_file)
+    keys = [Fernet.generate_key()]
+    write_keys(key_file, keys)
+    return keys
+
+def save_notes(final_notes, output_file=OUTPUT_FILE, key_file=KEY_FILE):
+    json_data = json.dumps(final_notes, indent=2).encode('utf-8')
+
+    cipher = Keyring(load_or_create_keys(key_file))
+    encrypted_data = cipher.encrypt(json_data)
+
+    with open(output_file, 'wb') as f:
+        f.write(encrypted_data)
+
+# Per-process cipher for pool workers (set by _init_worker)
+_worker_cipher = None
+
+def _init_worker(keys):
+    global _worker_cipher
+    _worker_cipher = Keyring(keys) if keys else None
+
+def _build_chunk(task):
+    first, count, notes_per_patient, seed, now = task
+    records = []
+    for p in range(first, first + count):
+        records.extend(build_patient(p, notes_per_patient, seed, now))
+    return len(records), encode_chunk(records, _worker_cipher)
+
+def generate_dataset(patients, notes_per_patient, seed=0, workers=None, chunk_notes=5000,
+                     output_file=OUTPUT_FILE, key_file=KEY_FILE, now=None, encrypt=True):
+    """
+    Writes a scaled dataset in the chunked layout (backend/note_file.py).
+    Chunks of patients are built and encrypted in a process pool and
+    written in patient order as they complete. Returns the note count.
+    """
+    if now is None:
+        now = datetime.datetime.now().replace(second=0, microsecond=0)
+    keys = load_or_create_keys(key_file) if encrypt else None
+    per_chunk = max(1, chunk_notes // max(1, notes_per_patient))
+    tasks = [(first, min(per_chunk, patients - first), notes_per_patient, seed, now)
+             for first in range(0, patients, per_chunk)]
+
+    total = 0
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(CHUNKED_HEADER)
+        if workers == 1:
+            _init_worker(keys)
+            for count, line in map(_build_chunk, tasks):
+                f.write(line)
+                total += count
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(keys,)) as pool:
+                for count, line in pool.map(_build_chunk, tasks):
+                    f.write(line)
+                    total += count
+    os.replace(tmp_file, output_file) # Never leave a half-written dataset behind
+    return total
 
-# Load or Generate Key
-if os.path.exists(KEY_FILE):
-    with open(KEY_FILE, 'rb') as kf:
-        key = kf.read()
-else:
-    key = Fernet.generate_key()
-    with open(KEY_FILE, 'wb') as kf:
-        kf.write(key)
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic notes (the single-visit demo by default).")
+    parser.add_argument('--patients', type=int, help='generate a scaled, chunked dataset for this many patients')
+    parser.add_argument('--notes-per-patient', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help='process pool size (default: CPU count)')
+    parser.add_argument('--chunk-notes', type=int, default=5000, help='approximate notes per encrypted chunk')
+    parser.add_argument('--now', help='reference time "YYYY-MM-DD HH:MM" for timestamps (default: now)')
+    parser.add_argument('--plain', action='store_true', help='write chunks unencrypted')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--key-file', default=KEY_FILE)
+    args = parser.parse_args()
 
-cipher = Fernet(key)
-encrypted_data = cipher.encrypt(json_data)
+    if args.patients is None:
+        final_notes = build_notes()
+        save_notes(final_notes, args.output, args.key_file)
+        print(f"Successfully generated {len(final_notes)} synthetic notes.")
+        print(f"Data saved to {args.output} (Encrypted).")
+        return
 
-with open(OUTPUT_FILE, 'wb') as f:
-    f.write(encrypted_data)
+    now = datetime.datetime.strptime(args.now, TIMESTAMP_FORMAT) if args.now else None
+    total = generate_dataset(args.patients, args.notes_per_patient, seed=args.seed, workers=args.workers,
+                             chunk_notes=args.chunk_notes, output_file=args.output, key_file=args.key_file,
+                             now=now, encrypt=not args.plain)
+    print(f"Successfully generated {total} synthetic notes for {args.patients} patients.")
+    print(f"Data saved to {args.output} ({'plain' if args.plain else 'Encrypted'}, chunked).")
 
-print(f"Successfully generated {len(final_notes)} synthetic notes.")
-print(f"Data saved to {OUTPUT_FILE} (Encrypted).")
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,18 @@
-from cryptography.fernet import Fernet
 import os
+import sys
 
-# 1. Generate Key
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from envelope import Keyring  # noqa: E402
+
+# 1. Generate Key (the key file is a keyring: one key per line, primary first)
 key_file = 'backend/secret.key'
 if not os.path.exists(key_file):
-    key = Fernet.generate_key()
-    with open(key_file, 'wb') as kf:
-        kf.write(key)
+    cipher = Keyring.generate()
+    cipher.save(key_file)
     print(f"Generated {key_file}")
 else:
-    with open(key_file, 'rb') as kf:
-        key = kf.read()
-    print(f"Loaded {key_file}")
-
-cipher = Fernet(key)
+    cipher = Keyring.load(key_file)
+    print(f"Loaded {key_file} ({len(cipher)} keys)")
 
 # 2. Encrypt note.json if it exists and is not already encrypted
 note_file = 'backend/note.json'
@@ -1,11 +1,17 @@
 import pytest
 import sys
 import os
+import time
 
 # Add backend to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
 
+_import_started = time.perf_counter()
 from app import app as flask_app
+APP_IMPORT_SECONDS = time.perf_counter() - _import_started
+
+def pytest_report_header(config):
+    return f"app import (cold start): {APP_IMPORT_SECONDS * 1000:.0f} ms"
 
 @pytest.fixture
 def client():
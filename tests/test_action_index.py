@@ -0,0 +1,97 @@
+import app as app_module
+from action_index import ActionIndex
+from enums import ActionStatus, Role
+from models import Action, Note
+
+
+def make_action(action_id, priority=None, tags=None):
+    fields = {"id": action_id, "title": action_id, "status": "pending", "assigned_to_role": "staff"}
+    if priority:
+        fields["priority"] = priority
+    if tags:
+        fields["tags"] = tags
+    return Action.from_dict(fields)
+
+
+def test_query_orders_by_priority_then_recency():
+    index = ActionIndex()
+    for i, action in enumerate([make_action("low", "low"), make_action("none"), make_action("high1", "high"),
+                                make_action("high2", "high"), make_action("medium", "medium")]):
+        index.add(action, Note(id=f"n{i}", actions=[action]))
+
+    queue = index.query([Role.STAFF], [ActionStatus.PENDING])
+
+    assert [a.id for a in queue] == ["high2", "high1", "medium", "low", "none"]
+    assert [a.id for a in index.query([Role.STAFF], [ActionStatus.PENDING], limit=2)] == ["high2", "high1"]
+    timeline = index.query([Role.STAFF], [ActionStatus.PENDING], by_priority=False)
+    assert [a.id for a in timeline] == ["medium", "high2", "high1", "none", "low"]
+
+
+def test_status_change_moves_action_between_queues():
+    index = ActionIndex()
+    action = make_action("a1", tags=["lab"])
+    index.add(action, Note(id="n1", actions=[action]))
+
+    action.status = ActionStatus.RESOLVED
+    index.update(action)
+
+    assert index.query([Role.STAFF], [ActionStatus.PENDING]) == []
+    assert index.query([Role.STAFF], [ActionStatus.RESOLVED], tag="lab") == [action]
+    assert index.get("a1")[0] is action
+
+
+def test_actions_endpoint_tracks_create_resolve_and_forward(client):
+    note = client.post('/api/notes', json={
+        "content": "Plan: CXR",
+        "author_role": "clinician",
+        "type": "clinician_note",
+        "manual_actions": ["Order chest X-ray"]
+    }).get_json()
+    action_id = note['actions'][0]['id']
+
+    staff_queue = client.get('/api/actions?role=staff').get_json()
+    assert [a['id'] for a in staff_queue] == [action_id]
+    assert client.get('/api/actions?role=clinician').get_json() == []
+
+    client.post(f'/api/actions/{action_id}/resolve', json={
+        "role": "staff",
+        "resolution_type": "forward",
+        "new_action_title": "Review X-ray"
+    })
+
+    assert client.get('/api/actions?role=staff').get_json() == []
+    assert [a['id'] for a in client.get('/api/actions?role=staff&status=resolved').get_json()] == [action_id]
+    clinician_queue = client.get('/api/actions?role=clinician').get_json()
+    assert [a['title'] for a in clinician_queue] == ["Review X-ray"]
+    assert client.get('/api/glance?role=clinician').get_json()['actions'] == clinician_queue
+
+
+def test_actions_endpoint_rejects_unknown_status(client):
+    assert client.get('/api/actions?status=done').status_code == 400
+
+
+def test_glance_keeps_each_notes_actions_in_stored_order(client):
+    for content, actions in [("Plan: labs", ["Draw CBC", "Draw BMP", "Book follow-up"]),
+                             ("Plan: imaging", ["Order chest X-ray", "Call radiology"])]:
+        client.post('/api/notes', json={"content": content, "author_role": "clinician",
+                                        "type": "clinician_note", "manual_actions": actions})
+
+    titles = [a['title'] for a in client.get('/api/glance?role=staff').get_json()['actions']]
+    assert titles == ["Order chest X-ray", "Call radiology", "Draw CBC", "Draw BMP", "Book follow-up"]
+
+
+def test_glance_queue_is_in_timeline_order_across_priorities(client):
+    def note(note_id, timestamp, action):
+        return {"id": note_id, "content": "Plan.", "author_role": "clinician", "type": "clinician_note",
+                "timestamp": timestamp, "version": 1, "history": [], "highlights": [],
+                "actions": [dict(action, status="pending", assigned_to_role="staff")]}
+
+    app_module.load_store([ # Newest first
+        note("new", "2024-03-02 09:00", {"id": "a-new", "title": "Book follow-up"}),
+        note("old", "2024-03-01 09:00", {"id": "a-old", "title": "Call ICU", "priority": "high"}),
+    ])
+
+    glance = client.get('/api/glance?role=staff').get_json()['actions']
+    assert [a['title'] for a in glance] == ["Book follow-up", "Call ICU"]
+    queue = client.get('/api/actions?role=staff').get_json()
+    assert [a['title'] for a in queue] == ["Call ICU", "Book follow-up"] # /api/actions ranks by priority
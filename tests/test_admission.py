@@ -0,0 +1,43 @@
+import threading
+
+import app as app_module
+from admission import ClientLimiter, Lane
+
+NOTE = {"content": "Obs stable.", "author_role": "staff", "type": "staff_note"}
+
+
+def test_full_llm_lane_answers_429_and_leaves_reads_alone(client, monkeypatch):
+    lane = Lane('llm', limit=1, queue=0, wait=0)
+    monkeypatch.setitem(app_module.lanes, 'llm', lane)
+    held = lane.enter() # A consult already running
+
+    refused = client.post('/api/notes', json=NOTE)
+    assert refused.status_code == 429
+    assert int(refused.headers['Retry-After']) >= 1
+    assert client.get('/api/timeline?role=staff').status_code == 200 # Read lane is separate
+
+    held.release()
+    assert client.post('/api/notes', json=NOTE).status_code == 200
+    assert lane.in_flight == 0
+
+
+def test_llm_requests_are_rate_limited_per_client(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'client_limiter', ClientLimiter(rate=0.01, burst=2))
+
+    assert [client.post('/api/notes', json=NOTE).status_code for _ in range(3)] == [200, 200, 429]
+    other = client.post('/api/notes', json=NOTE, headers={"X-Client-Id": "ward-2"})
+    assert other.status_code == 200
+
+
+def test_queued_requests_get_the_next_free_slot():
+    lane = Lane('read', limit=1, queue=1, wait=2)
+    held = lane.enter()
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(lane.enter()))
+    waiter.start()
+    while not lane.waiting:
+        pass
+
+    held.release()
+    waiter.join()
+    assert len(admitted) == 1 and lane.in_flight == 1
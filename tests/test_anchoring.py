@@ -0,0 +1,62 @@
+from anchoring import edit_region, find_nearest, reanchor
+from models import Highlight
+
+
+def post_note(client, content):
+    return client.post('/api/notes', json={"content": content, "author_role": "clinician",
+                                           "type": "clinician_note"}).get_json()
+
+
+def anchored_texts(note):
+    return [(h['text'], note['content'][h['start']:h['end']]) for h in note['highlights']]
+
+
+def test_reanchor_shifts_and_orphans():
+    old = "Pain in chest. Pain in leg. HR 110."
+    new = "Severe. Pain in leg. HR 110."
+    highlights = [Highlight(id=1, text="Pain in leg", start=15, end=26),
+                  Highlight(id=2, text="chest", start=8, end=13)]
+
+    assert edit_region(old, new) == (0, 13, 6)
+    orphaned = reanchor(highlights, old, new)
+
+    assert (highlights[0].start, highlights[0].end) == (8, 19)
+    assert orphaned == [highlights[1]] and highlights[1].start == -1
+    assert find_nearest("ab ab ab", "ab", 4) == 3
+
+
+def test_edits_keep_highlight_offsets_valid(client):
+    note = post_note(client, "Reports fever. Started Paracetamol 500mg PO.")
+    assert {h['text'] for h in note['highlights']} == {"fever", "Paracetamol 500mg PO"}
+
+    updated = client.put(f"/api/notes/{note['id']}", json={
+        "role": "clinician", "content": "Overnight: reports fever. Started Paracetamol 500mg PO."}).get_json()
+    assert all(text == span for text, span in anchored_texts(updated))
+
+    # The AI highlight whose text was removed is dropped
+    updated = client.put(f"/api/notes/{note['id']}", json={
+        "role": "clinician", "content": "Overnight: settled. Started Paracetamol 500mg PO."}).get_json()
+    assert [text for text, _ in anchored_texts(updated)] == ["Paracetamol 500mg PO"]
+
+
+def test_user_highlights_are_flagged_and_restored_on_revert(client):
+    note = post_note(client, "Wound clean. Wound review tomorrow.")
+    highlighted = client.post(f"/api/notes/{note['id']}/highlight",
+                              json={"text": "Wound review", "start": 0, "end": 12}).get_json()
+    assert highlighted['highlights'][0]['start'] == 13 # offsets fixed to the real occurrence
+
+    edited = client.put(f"/api/notes/{note['id']}", json={"role": "clinician",
+                                                         "content": "Wound clean."}).get_json()
+    assert edited['highlights'][0]['orphaned'] is True
+    glance = client.get('/api/glance?role=clinician').get_json()
+    assert all(s['source_note_id'] != note['id'] for s in glance['key_signals'])
+
+    reverted = client.post(f"/api/notes/{note['id']}/revert", json={"role": "clinician"}).get_json()
+    assert anchored_texts(reverted) == [("Wound review", "Wound review")]
+    assert 'orphaned' not in reverted['highlights'][0]
+
+
+def test_highlight_text_must_exist(client):
+    note = post_note(client, "Wound clean.")
+    response = client.post(f"/api/notes/{note['id']}/highlight", json={"text": "fever", "start": 0, "end": 5})
+    assert response.status_code == 400
@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import app as app_module
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend'))
+
+
+def test_import_loads_nothing_and_defers_the_llm_sdk():
+    probe = (f"import sys, json; sys.path.insert(0, {BACKEND!r}); import app; "
+             "print(json.dumps([len(app.notes), 'google.generativeai' in sys.modules]))")
+    env = dict(os.environ, LLM_PROVIDER="gemini", GEMINI_API_KEY="dummy-key")
+    out = subprocess.run([sys.executable, '-c', probe], env=env, capture_output=True, text=True, check=True).stdout
+    assert out.splitlines() == ["[0, false]"] # No notes read, no SDK import, nothing printed
+
+
+def test_background_load_answers_503_until_ready(client, tmp_path, monkeypatch):
+    data_file = tmp_path / 'notes.json'
+    data_file.write_text('[]')
+    release = threading.Event()
+
+    def slow_notes(path, cipher=None):
+        release.wait(5)
+        yield {"id": "n1", "content": "Loaded note.", "author_role": "clinician", "type": "clinician_note",
+               "timestamp": "2024-01-01 09:00", "version": 1, "history": [], "highlights": [], "actions": []}
+
+    monkeypatch.setattr(app_module, 'iter_notes', slow_notes)
+    app_module.create_app({'NOTES_FILE': str(data_file), 'STORE_LOAD': 'background'})
+
+    ready = client.get('/api/ready')
+    assert ready.status_code == 503 and ready.get_json()['status'] == 'loading'
+    waiting = client.get('/api/timeline?role=clinician')
+    assert waiting.status_code == 503 and waiting.headers['Retry-After'] == '1'
+
+    release.set()
+    assert app_module.store_ready.wait(5)
+    ready = client.get('/api/ready')
+    status = ready.get_json()
+    assert ready.status_code == 200 and status['loaded'] == f"1 notes from {data_file}"
+    assert status['ready_seconds'] >= status['load_seconds'] >= 0
+    assert [n['id'] for n in client.get('/api/timeline?role=clinician').get_json()] == ['n1']
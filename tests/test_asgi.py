@@ -0,0 +1,58 @@
+import asyncio
+import json
+import time
+
+import app as app_module
+from asgi import application
+from llm_client import FakeProvider, LLMClient
+
+NARRATIVE = ("Discussed discharge planning at length with the patient and both daughters, including transport, "
+             "medication supply, home nursing visits and the follow up appointment with the respiratory team.")
+
+
+async def call(method, path, body=None, query=b'', headers=()):
+    data = json.dumps(body).encode() if body is not None else b''
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'http_version': '1.1',
+             'headers': [(b'content-type', b'application/json')] + list(headers)}
+    messages = [{'type': 'http.request', 'body': data, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+    start = sent[0]
+    return start['status'], dict(start['headers']), b''.join(m.get('body', b'') for m in sent[1:])
+
+
+def test_llm_calls_are_awaited_concurrently(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'llm', LLMClient(FakeProvider(latency=0.2), rate_limit=0))
+    payload = {"content": NARRATIVE, "author_role": "clinician", "type": "clinician_note"}
+
+    async def create_many():
+        return await asyncio.gather(*[call('POST', '/api/notes', payload) for _ in range(20)])
+
+    started = time.perf_counter()
+    responses = asyncio.run(create_many())
+    assert time.perf_counter() - started < 2.0 # 20 x 0.2s one at a time would take 4s
+
+    assert {status for status, _, _ in responses} == {200}
+    assert all(json.loads(body)['actions'][0]['tags'] == ["fake-llm"] for _, _, body in responses)
+    assert len(app_module.notes) >= 20
+
+
+def test_routes_and_rbac_are_unchanged(client):
+    status, _, _ = asyncio.run(call('POST', '/api/notes', {"content": "x", "author_role": "patient",
+                                                           "type": "clinician_note"}))
+    assert status == 403
+
+    status, _, body = asyncio.run(call('POST', '/api/consult/end', {"role": "clinician"}))
+    assert status == 200 and json.loads(body)['type'] == "ai_doctor_consult_summary"
+
+    status, headers, body = asyncio.run(call('GET', '/api/timeline', query=b'role=patient',
+                                             headers=[(b'origin', b'http://localhost:3000')]))
+    assert status == 200 and headers[b'access-control-allow-origin'] == b'http://localhost:3000'
+    assert json.loads(body) == client.get('/api/timeline?role=patient').get_json()
@@ -0,0 +1,161 @@
+import os
+
+import pytest
+
+import app as app_module
+from cold_store import ColdStore
+from envelope import Keyring
+
+OLD = "2020-03-01 09:00"
+
+
+@pytest.fixture
+def tiered(client, tmp_path, monkeypatch):
+    store = ColdStore(str(tmp_path / 'tiers'), Keyring.generate())
+    monkeypatch.setattr(app_module, 'cold_store', store)
+    app_module.load_store([
+        {"id": "old-plan", "content": "Plan: physio twice weekly.", "author_role": "clinician",
+         "type": "clinician_note", "timestamp": OLD, "version": 2,
+         "history": [{"version": 1, "timestamp": OLD, "content": "Plan: physio.", "author_role": "clinician"}],
+         "highlights": [{"id": "h1", "text": "Anaphylaxis", "type": "critical", "start": 0, "end": 11}],
+         "actions": []},
+        {"id": "old-open", "content": "Awaiting labs.", "author_role": "staff", "type": "staff_note",
+         "timestamp": OLD, "version": 1, "history": [], "highlights": [],
+         "actions": [{"id": "a1", "title": "Chase labs", "status": "pending", "assigned_to_role": "staff"}]},
+    ])
+    client.post('/api/notes', json={"content": "New note.", "author_role": "staff", "type": "staff_note"})
+    yield store
+    store.clear()
+
+
+def test_old_notes_move_to_segments_and_still_serve(client, tiered):
+    assert app_module.snapshot_store() == 1 # the note with an open action stays hot
+    assert 'old-plan' in tiered and len(app_module.notes) == 2
+
+    timeline = client.get('/api/timeline?role=clinician').get_json()
+    assert [n['id'] for n in timeline][-1] == 'old-plan'
+    assert timeline[-1]['history'] == [{"version": 1, "timestamp": OLD, "author_role": "clinician"}]
+    assert 'old-plan' not in [n['id'] for n in client.get('/api/timeline?role=staff').get_json()]
+
+    signals = client.get('/api/glance?role=clinician').get_json()['key_signals']
+    assert [s['source_note_id'] for s in signals] == ['old-plan'] # critical survives decay
+
+    assert client.get('/api/search?q=physio').get_json()['results'] == []
+    archived = client.get('/api/search?q=physio&archive=1').get_json()['results']
+    assert [r['note_id'] for r in archived] == ['old-plan']
+
+
+def test_cold_notes_are_encrypted_read_in_place_and_thaw_on_edit(client, tiered):
+    app_module.snapshot_store()
+    for name in os.listdir(tiered.directory):
+        with open(os.path.join(tiered.directory, name), 'rb') as f:
+            assert b'physio' not in f.read()
+    key = app_module.pack_id('old-plan')
+    assert key not in app_module.note_timestamps._rows
+
+    versions = client.get('/api/notes/old-plan/history').get_json()
+    assert [v['content'] for v in versions] == ["Plan: physio."]
+    assert client.get('/api/notes/old-plan/versions/1').get_json()['content'] == "Plan: physio."
+    diff = client.get('/api/notes/old-plan/diff').get_json()
+    assert diff == {"from": 1, "to": 2, "start": 12, "removed": "", "inserted": " twice weekly"}
+    assert client.get('/api/notes/old-plan/history?role=patient').status_code == 404
+    assert 'old-plan' in tiered and all(n.id != key for n in app_module.notes) # Reads leave it cold
+
+    edited = client.put('/api/notes/old-plan', json={"content": "Plan: physio weekly.", "role": "clinician"})
+    assert edited.status_code == 200
+    assert 'old-plan' not in tiered
+    assert any(n.id == key for n in app_module.notes)
+    assert [v['content'] for v in edited.get_json()['history']] == ["Plan: physio.", "Plan: physio twice weekly."]
+
+
+def test_restart_reopens_hot_snapshot_and_segments(client, tiered):
+    app_module.snapshot_store()
+    reopened = ColdStore(tiered.directory, tiered.cipher)
+    reopened.open()
+
+    assert len(reopened) == 1
+    segment, entry = reopened.entries()[0]
+    assert reopened.read(segment, entry)['content'] == "Plan: physio twice weekly."
+    hot = list(app_module.iter_notes(tiered.hot_path, tiered.cipher))
+    assert [n['id'] for n in hot if n['id'].startswith('old')] == ['old-open']
+
+
+def test_plaintext_segments_are_served_without_reparsing(client, tiered, monkeypatch):
+    monkeypatch.setattr(tiered, 'cipher', None)
+    app_module.snapshot_store()
+    segment, entry = tiered.visible_entries(int(app_module.Role.CLINICIAN))[0]
+
+    stored = tiered.raw_record(segment, entry)
+    assert isinstance(stored, memoryview)
+    assert bytes(stored) in client.get('/api/timeline?role=clinician').get_data()
+    assert tiered.visible_entries(int(app_module.Role.STAFF)) == []
+
+
+def test_dismissed_highlight_feedback_survives_restart(client, tiered, tmp_path, monkeypatch):
+    tiered.cipher.save(str(tmp_path / 'secret.key'))
+    monkeypatch.setattr(app_module, 'cipher', tiered.cipher)
+    monkeypatch.setattr(app_module, 'KEY_FILE', str(tmp_path / 'secret.key'))
+    note = client.post('/api/notes', json={"content": "Reports vomiting.", "author_role": "staff",
+                                           "type": "staff_note"}).get_json()
+    client.delete(f"/api/notes/{note['id']}/highlight/{note['highlights'][0]['id']}")
+    dismissed = app_module.highlight_model.priority("vomiting")
+    assert dismissed < 1.0
+
+    app_module.snapshot_store()
+    with open(os.path.join(tiered.directory, 'model.dat'), 'rb') as f:
+        assert b'vomiting' not in f.read() # encrypted like the notes
+    app_module.load_store([]) # Forget everything, as a restart would
+    assert app_module.highlight_model.priority("vomiting") == 1.0
+
+    app_module.load_initial_store(app_module.DATA_FILE)
+    assert app_module.highlight_model.priority("vomiting") == dismissed
+
+
+def test_one_writer_per_tier_directory(tmp_path):
+    first, second = ColdStore(str(tmp_path / 'tiers')), ColdStore(str(tmp_path / 'tiers'))
+    first.lock()
+    first.lock() # Already held: no-op
+    with pytest.raises(RuntimeError, match=f"pid {os.getpid()}"):
+        second.lock()
+    first.unlock()
+    second.lock()
+    second.unlock()
+
+
+def test_readers_keep_segments_a_merge_replaces(client, tiered):
+    app_module.snapshot_store()
+    held = tiered.visible_entries(app_module.Role.CLINICIAN) # As the timeline got them
+    assert tiered.merge(max_segments=0)
+    assert all(not os.path.exists(segment.path) for segment, _ in held)
+    assert [tiered.read(segment, entry)['id'] for segment, entry in held] == ['old-plan']
+    assert bytes(tiered.raw_record(*held[0])).startswith(b'{')
+    assert [n['id'] for n in client.get('/api/timeline?role=clinician').get_json()][-1] == 'old-plan'
+
+
+def cold_done_note():
+    return {"id": "old-done", "content": "Labs back, normal.", "author_role": "staff", "type": "staff_note",
+            "timestamp": OLD, "version": 1, "history": [], "highlights": [],
+            "actions": [{"id": "a-done", "title": "Chase labs", "status": "resolved", "assigned_to_role": "staff"}]}
+
+
+def test_cold_notes_done_actions_stay_listed(client, tiered):
+    app_module.load_store([cold_done_note()])
+    assert app_module.snapshot_store() == 1 and 'old-done' in tiered
+
+    resolved = client.get('/api/actions?role=staff&status=resolved').get_json()
+    assert [a['id'] for a in resolved] == ['a-done']
+    assert client.get('/api/actions?role=staff').get_json() == [] # Open queue: no cold scan
+    admin = client.get('/api/glance?role=admin').get_json()['actions']
+    assert [a['id'] for a in admin] == ['a-done']
+
+
+def test_resolving_a_cold_notes_action_thaws_it(client, tiered):
+    app_module.load_store([cold_done_note()])
+    app_module.snapshot_store()
+
+    forwarded = client.post('/api/actions/a-done/resolve', json={
+        "role": "staff", "resolution_type": "forward", "new_action_title": "Review labs"})
+    assert forwarded.status_code == 200
+    assert 'old-done' not in tiered
+    assert [a['title'] for a in client.get('/api/actions?role=clinician').get_json()] == ["Review labs"]
+    assert client.post('/api/actions/missing/resolve', json={"role": "staff"}).status_code == 404
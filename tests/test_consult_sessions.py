@@ -0,0 +1,97 @@
+import pytest
+
+import app as app_module
+from llm_client import FakeProvider, LLMClient
+
+
+def context_of(prompt):
+    return prompt.split("Context", 1)[1]
+
+
+class RecordingProvider(FakeProvider):
+
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+        self.fail = False
+
+    def generate(self, model, prompt, json_mode=False, timeout=None):
+        if not json_mode:
+            if self.fail:
+                raise RuntimeError("model unavailable")
+            self.prompts.append(prompt)
+        return super().generate(model, prompt, json_mode, timeout)
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = RecordingProvider()
+    monkeypatch.setattr(app_module, 'llm', LLMClient(provider, rate_limit=0))
+    return provider
+
+
+def add_note(client, content):
+    client.post('/api/notes', json={"content": content, "author_role": "staff", "type": "staff_note"})
+
+
+def test_summary_rolls_forward_with_only_new_notes(client, provider):
+    add_note(client, "Before the consult.")
+    client.post('/api/consult/start', json={"role": "clinician"})
+    add_note(client, "BP 150/95 on arrival.")
+    first = client.post('/api/consult/end', json={"role": "clinician"}).get_json()
+
+    assert "BP 150/95" in provider.prompts[-1]
+    assert "Before the consult" not in provider.prompts[-1]
+
+    add_note(client, "Repeat BP 130/85.")
+    client.post('/api/consult/end', json={"role": "clinician"})
+
+    prompt = provider.prompts[-1]
+    assert "Previous Summary:" in prompt and first['content'] in prompt
+    assert "Repeat BP 130/85" in context_of(prompt)
+    assert "BP 150/95" not in context_of(prompt)
+
+
+def test_no_new_notes_reuses_previous_summary(client, provider):
+    client.post('/api/consult/start', json={"role": "staff"})
+    add_note(client, "Dressing changed.")
+    first = client.post('/api/consult/end', json={"role": "staff"}).get_json()
+    calls = len(provider.prompts)
+
+    second = client.post('/api/consult/end', json={"role": "staff"}).get_json()
+    assert len(provider.prompts) == calls
+    assert second['content'] == first['content']
+
+
+def test_long_backlog_is_folded_in_windows(client, provider, monkeypatch):
+    monkeypatch.setattr(app_module, 'CONSULT_WINDOW', 2)
+    client.post('/api/consult/start', json={"role": "clinician"})
+    for i in range(5):
+        add_note(client, f"Observation {i}.")
+    client.post('/api/consult/end', json={"role": "clinician"})
+
+    assert len(provider.prompts) == 3
+    assert [context_of(p).count("Observation") for p in provider.prompts] == [2, 2, 1]
+
+
+def test_sessions_roll_forward_only_visible_clinical_notes(client, provider):
+    client.post('/api/consult/start', json={"role": "clinician"})
+    client.post('/api/consult/start', json={"role": "patient"})
+    client.post('/api/notes', json={"content": "Cough since Monday.", "author_role": "patient",
+                                    "type": "patient_input"})
+    client.post('/api/notes', json={"content": "Start azithromycin.", "author_role": "clinician",
+                                    "type": "clinician_note"})
+    provider.fail = True
+    fallback = client.post('/api/consult/end', json={"role": "clinician"}).get_json()
+    assert "LLM Error" in fallback['content']
+    provider.fail = False
+
+    client.post('/api/consult/end', json={"role": "patient"})
+    patient_context = context_of(provider.prompts[-1])
+    assert "Cough since Monday" in patient_context
+    assert "azithromycin" not in patient_context and "LLM Error" not in patient_context
+
+    client.post('/api/consult/end', json={"role": "clinician"})
+    clinician_context = context_of(provider.prompts[-1])
+    assert "Cough since Monday" in clinician_context and "Start azithromycin" in clinician_context
+    assert f"[{app_module.label(app_module.Role.SYSTEM)}]" not in clinician_context # No summaries fed back
@@ -0,0 +1,67 @@
+import concurrent.futures
+import json
+
+import app as app_module
+from admission import Lane
+from llm_client import FakeProvider, LLMClient
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_stream_without_llm_commits_mock_summary(client):
+    resp = client.post('/api/consult/end/stream', json={"role": "staff"})
+    assert resp.mimetype == 'text/event-stream'
+
+    events = parse_events(resp.get_data(as_text=True))
+    assert [e for e, _ in events] == ['delta', 'note', 'signals', 'done']
+    note = events[1][1]
+    assert note['content'] == events[0][1]['text']
+    assert client.get('/api/timeline?role=staff').get_json()[0]['id'] == note['id']
+
+
+def test_stream_forwards_tokens_and_extracts_signals(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'llm', LLMClient(FakeProvider(), rate_limit=0))
+    client.post('/api/notes', json={"content": "HR 120, chest pain since noon.", "author_role": "staff"})
+
+    events = parse_events(client.post('/api/consult/end/stream', json={"role": "clinician"}).get_data(as_text=True))
+    deltas = [d['text'] for e, d in events if e == 'delta']
+    note = next(d for e, d in events if e == 'note')
+    signals = next(d for e, d in events if e == 'signals')
+
+    assert len(deltas) > 1
+    assert note['content'] == ''.join(deltas).strip()
+    assert signals['note_id'] == note['id']
+    assert signals['actions']
+    queue = client.get(f"/api/actions?role={signals['actions'][0]['assigned_to_role']}").get_json()
+    assert signals['actions'][0]['id'] in [a['id'] for a in queue]
+
+
+def test_stream_rejects_invalid_role(client):
+    assert client.post('/api/consult/end/stream', json={"role": "admin"}).status_code == 400
+
+
+def test_stream_frees_its_llm_lane_slot_before_waiting_on_extraction(client, monkeypatch):
+    lane = Lane('llm', limit=1, queue=0, wait=0)
+    monkeypatch.setitem(app_module.lanes, 'llm', lane)
+    extraction = concurrent.futures.Future() # A slow extractor
+    monkeypatch.setattr(app_module, 'extract_signals_in_background', lambda note, role: extraction)
+
+    chunks = client.post('/api/consult/end/stream', json={"role": "staff"}, buffered=False).response
+    events = []
+    for chunk in chunks:
+        events.extend(e for e, _ in parse_events(chunk.decode() if isinstance(chunk, bytes) else chunk))
+        if events[-1] == 'note':
+            break
+    assert lane.in_flight == 0 # Extraction is still pending
+    assert client.post('/api/notes', json={"content": "Obs stable.", "author_role": "staff"}).status_code == 200
+
+    extraction.set_result(None)
+    rest = b"".join(c if isinstance(c, bytes) else c.encode() for c in chunks).decode()
+    assert [e for e, _ in parse_events(rest)] == ['signals', 'done']
+    assert lane.in_flight == 0
@@ -0,0 +1,65 @@
+import datetime
+
+import numpy as np
+
+from decay import (TimestampArray, decay_weights, parse_timestamp, rank_highlights,
+                   SECONDS_PER_DAY)
+
+
+def days_ago(days):
+    return (datetime.datetime.now() - datetime.timedelta(days=days)).strftime("%Y-%m-%d %H:%M")
+
+
+def test_curves_match_documented_values():
+    now = parse_timestamp("2024-01-15 12:00")
+    epochs = [now - d * SECONDS_PER_DAY for d in (0, 2, 7, 14, 30)]
+
+    hyperbolic = decay_weights(epochs, now=now, curve="hyperbolic")
+    linear = decay_weights(epochs, now=now, curve="linear")
+
+    assert np.allclose(hyperbolic, [1.0, 0.5, 1 / 4.5, 1 / 8.0, 1 / 16.0])
+    assert np.allclose(linear, [1.0, 1 - 2 / 14, 0.5, 0.0, 0.0])
+
+
+def test_unparseable_timestamp_keeps_full_weight():
+    assert decay_weights([parse_timestamp("yesterday")])[0] == 1.0
+
+
+def test_rank_filters_old_items_and_sorts_by_weight_then_recency():
+    weights = np.array([0.5, 0.1, 1.0, 0.5, 0.1])
+    epochs = np.array([100.0, 50.0, 300.0, 200.0, 40.0])
+    critical = [False, False, False, False, True]
+
+    order = rank_highlights(weights, epochs, critical)
+
+    assert order.tolist() == [2, 3, 0, 4]
+
+
+def test_timestamp_array_grows_and_updates_in_place():
+    stamps = TimestampArray(capacity=2)
+    for i in range(5):
+        stamps.set(f"n{i}", days_ago(i))
+    stamps.set("n0", "2024-01-15 12:00")
+
+    assert len(stamps) == 5
+    assert stamps.epochs(["n0"])[0] == parse_timestamp("2024-01-15 12:00")
+
+    stamps.remove("n2")
+    stamps.set("n5", "2024-01-16 12:00") # Takes the freed row
+    assert len(stamps) == 5 and stamps.rows(["n5"])[0] == 2
+    assert stamps.epochs(["n5"])[0] == parse_timestamp("2024-01-16 12:00")
+    assert np.isnan(stamps.epochs(["n2"])[0])
+
+
+def test_glance_reports_decay_weight(client):
+    note = client.post('/api/notes', json={
+        "content": "SpO2 88% on room air",
+        "author_role": "staff",
+        "type": "staff_note",
+        "highlights": [{"id": "h1", "text": "SpO2 88%", "type": "vital", "start": 0, "end": 8}]
+    }).get_json()
+
+    signals = client.get('/api/glance?role=staff').get_json()['key_signals']
+
+    assert signals[0]['source_note_id'] == note['id']
+    assert signals[0]['weight'] == 1.0
@@ -0,0 +1,33 @@
+from enums import (ActionStatus, HighlightType, NoteType, Role, is_ai_note_type, label,
+                   mask_to_scope, scope_allows, scope_to_mask)
+
+
+def test_parse_and_label_round_trip():
+    assert Role.parse("clinician") is Role.CLINICIAN
+    assert HighlightType.parse("user-highlight") is HighlightType.USER_HIGHLIGHT
+    assert label(ActionStatus.UNRESOLVED) == "unresolved"
+    assert label(NoteType.parse("ai_consult_summary")) == "ai_consult_summary"
+
+
+def test_codes_of_different_kinds_never_compare_equal():
+    codes = [m for cls in (Role, NoteType, ActionStatus, HighlightType) for m in cls]
+
+    assert len(set(int(c) for c in codes)) == len(codes)
+
+
+def test_ai_note_types():
+    assert is_ai_note_type(NoteType.AI_NURSE_CONSULT_SUMMARY)
+    assert is_ai_note_type(NoteType.parse("ai_internal_thought"))
+    assert not is_ai_note_type(NoteType.STAFF_NOTE)
+
+
+def test_scope_mask_round_trip_and_checks():
+    scope = {"patient": False, "staff": False, "clinician": True, "admin": True}
+    mask = scope_to_mask(scope)
+
+    assert mask_to_scope(mask) == scope
+    assert scope_allows(mask, Role.CLINICIAN)
+    assert not scope_allows(mask, Role.STAFF)
+    assert not scope_allows(mask, Role.parse("auditor"))
+    # Non-standard dicts are kept as dicts
+    assert scope_to_mask({"clinician": True}) == {"clinician": True}
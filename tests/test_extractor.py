@@ -0,0 +1,61 @@
+import app as app_module
+from extractor import LocalExtractor
+from llm_client import FakeProvider, LLMClient
+
+
+class RecordingProvider(FakeProvider):
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    def generate(self, model, prompt, json_mode=False, timeout=None):
+        self.prompts.append(prompt)
+        return super().generate(model, prompt, json_mode, timeout)
+
+
+def test_abnormal_vitals_and_doses_are_highlighted():
+    result, confident = LocalExtractor().extract(
+        "Vitals: BP 150/95, HR: 110 (Tachycardic), RR 18, SpO2: 92% on room air. Given Solu-Medrol 125mg IV.")
+
+    found = {h['text']: h['reason'] for h in result['highlights']}
+    assert found == {
+        "BP 150/95": "Elevated blood pressure",
+        "HR: 110 (Tachycardic)": "Abnormal heart rate",
+        "SpO2: 92% on room air": "Hypoxia risk",
+        "Solu-Medrol 125mg IV": "Medication dose",
+    }
+    assert confident
+    assert result['actions'][0]['tags'] == ["vitals"]
+
+
+def test_long_uncovered_narrative_is_not_confident():
+    _, confident = LocalExtractor().extract(
+        "Patient was seen with family at the bedside and we discussed the overall goals of care, "
+        "the likely course over the coming weeks, what support is available at home and how the "
+        "family would like to be contacted about changes.")
+    assert not confident
+
+
+def test_user_highlights_teach_the_local_tier(client):
+    first = client.post('/api/notes', json={"content": "Complains of back pain after lifting.",
+                                           "author_role": "staff", "type": "staff_note"}).get_json()
+    assert first['highlights'] == []
+
+    client.post(f"/api/notes/{first['id']}/highlight", json={"text": "back pain", "start": 13, "end": 22})
+    second = client.post('/api/notes', json={"content": "Back pain improving with heat.",
+                                            "author_role": "staff", "type": "staff_note"}).get_json()
+
+    assert [h['text'] for h in second['highlights']] == ["Back pain"]
+    assert second['highlights'][0]['start'] == 0
+
+
+def test_confident_notes_skip_the_llm(client, monkeypatch):
+    provider = RecordingProvider()
+    monkeypatch.setattr(app_module, 'llm', LLMClient(provider, rate_limit=0))
+
+    app_module.analyze_note("HR 128, SpO2 89%.", [])
+    app_module.analyze_note("Discussed discharge planning at length with the patient and both daughters, "
+                            "including transport, medication supply, home nursing visits and the follow "
+                            "up appointment with the respiratory team next month.", [])
+
+    assert len(provider.prompts) == 1
@@ -0,0 +1,33 @@
+import app as app_module
+
+OLD = "2020-03-01 09:00"
+
+
+def test_glance_reads_leave_the_store_untouched(client):
+    app_module.load_store([
+        {"id": "old", "content": "Anaphylaxis to penicillin. Mild cough.", "author_role": "clinician",
+         "type": "clinician_note", "timestamp": OLD, "version": 1, "history": [], "actions": [],
+         "highlights": [{"id": "h1", "text": "Anaphylaxis", "type": "critical", "start": 0, "end": 11},
+                        {"id": "h2", "text": "Mild cough", "type": "symptom", "start": 27, "end": 37}]},
+    ])
+    before = [n.to_dict() for n in app_module.notes]
+
+    signals = client.get('/api/glance?role=clinician').get_json()['key_signals']
+    assert [(s['text'], s['source_note_id'], s['timestamp']) for s in signals] == [("Anaphylaxis", "old", OLD)]
+    assert [n.to_dict() for n in app_module.notes] == before
+
+
+def test_side_sections_follow_writes(client):
+    ai_id = client.post('/api/notes', json={"content": "Cough for 3 days.", "author_role": "ai",
+                                           "type": "ai_doctor_consult_summary"}).get_json()['id']
+    client.post('/api/notes', json={"content": "Plan: chest X-ray.", "author_role": "clinician",
+                                    "type": "clinician_note"})
+    glance = client.get('/api/glance?role=clinician').get_json()
+    assert [n['id'] for n in glance['ai_scribed_notes']] == [ai_id]
+    assert [i['type'] for i in glance['clinician_confirmed']] == ["decision"]
+
+    client.put(f'/api/notes/{ai_id}', json={"content": "Cough for 3 days, improving.", "role": "clinician"})
+    glance = client.get('/api/glance?role=clinician').get_json()
+    assert glance['ai_scribed_notes'][0]['summary'] == "Cough for 3 days, improving."
+    assert [(i['source_note_id'], i['type']) for i in glance['clinician_confirmed']][-1] == (ai_id, "modification")
+    assert client.get('/api/glance?role=staff').get_json()['clinician_confirmed'] == []
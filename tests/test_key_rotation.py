@@ -0,0 +1,150 @@
+import os
+import threading
+
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+import app as app_module
+from cold_store import ColdStore
+from envelope import ENVELOPE_PREFIX, Keyring, read_keys
+from note_file import CHUNKED_HEADER, encode_chunk, iter_notes
+from segments import Segment
+
+OLD = "2020-03-01 09:00"
+
+
+def old_note(i):
+    return {"id": f"old-{i}", "content": f"Plan: physio block {i}.", "author_role": "clinician",
+            "type": "clinician_note", "timestamp": OLD, "version": 1, "history": [], "highlights": [],
+            "actions": []}
+
+
+def test_rotation_rewraps_only_the_data_key():
+    keyring = Keyring.generate()
+    token = keyring.encrypt(b"Anaphylaxis to penicillin")
+    legacy = Fernet(keyring.keys[0]).encrypt(b"legacy record")
+    assert token.startswith(ENVELOPE_PREFIX)
+
+    old_key = keyring.keys[0]
+    keyring.add_key()
+    rotated = keyring.rotate(token)
+    assert rotated.split(b".")[-1] == token.split(b".")[-1] # payload untouched
+    assert rotated != token and keyring.decrypt(rotated) == b"Anaphylaxis to penicillin"
+    assert keyring.decrypt(legacy) == b"legacy record"
+    assert keyring.rotate(legacy).startswith(ENVELOPE_PREFIX)
+
+    keyring.retire()
+    assert keyring.decrypt(rotated) == b"Anaphylaxis to penicillin"
+    with pytest.raises(InvalidToken):
+        keyring.decrypt(token)
+    with pytest.raises(InvalidToken):
+        Keyring([old_key]).decrypt(rotated)
+
+
+def test_key_rotation_runs_under_live_reads(client, tmp_path, monkeypatch):
+    keyring = Keyring.generate()
+    key_file, data_file = tmp_path / 'secret.key', tmp_path / 'notes.nc'
+    keyring.save(str(key_file))
+    first_key = keyring.keys[0]
+    data_file.write_bytes(CHUNKED_HEADER + encode_chunk([old_note(99)], keyring))
+    store = ColdStore(str(tmp_path / 'tiers'), keyring)
+    monkeypatch.setattr(app_module, 'cipher', keyring)
+    monkeypatch.setattr(app_module, 'cold_store', store)
+    monkeypatch.setattr(app_module, 'KEY_FILE', str(key_file))
+    monkeypatch.setitem(app_module.app.config, 'NOTES_FILE', str(data_file))
+    monkeypatch.setattr(app_module.response_cache, 'enabled', False) # Every read goes to the segments
+    for batch in range(4): # One segment each
+        app_module.load_store([old_note(batch * 5 + i) for i in range(5)])
+        app_module.snapshot_store()
+    old_segments = [segment.path for segment in store._segments]
+    expected = {f"old-{i}" for i in range(20)}
+    monkeypatch.setattr(app_module, 'REKEY_BYTES_PER_SEC', sum(map(os.path.getsize, old_segments)) * 2)
+
+    stop = threading.Event()
+    reads, failures = [], []
+
+    def read_timeline():
+        with app_module.app.test_client() as reader:
+            while not stop.is_set():
+                response = reader.get('/api/timeline?role=clinician')
+                ids = {n['id'] for n in response.get_json() or []} if response.status_code == 200 else None
+                (reads if ids == expected else failures).append(response.status_code)
+
+    readers = [threading.Thread(target=read_timeline) for _ in range(2)]
+    for thread in readers:
+        thread.start()
+    try:
+        started = client.post('/api/keys/rotate?role=admin')
+        assert started.status_code == 202
+        assert client.post('/api/keys/rotate?role=admin').status_code == 409 # one job at a time
+        assert client.post('/api/keys/rotate?role=clinician').status_code == 403
+        assert app_module.rekey_lock.acquire(timeout=10)
+        app_module.rekey_lock.release()
+    finally:
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+    assert client.get('/api/keys/rotate?role=admin').get_json()['status'] == 'done'
+    assert failures == [] and len(reads) > 4
+    assert read_keys(str(key_file)) == keyring.keys and keyring.keys[0] != first_key # old key retired
+    new_only = Keyring.load(str(key_file))
+    assert not any(os.path.exists(path) for path in old_segments)
+    for segment in store._segments:
+        reopened = Segment(segment.path, new_only)
+        assert all(reopened.record(i) for i in range(len(reopened._offsets)))
+        reopened.close()
+    assert {r['id'] for r in iter_notes(str(data_file), new_only)} == {"old-99"}
+    store.clear()
+
+
+def test_snapshot_refuses_to_write_under_a_key_rotated_elsewhere(client, tmp_path, monkeypatch):
+    keyring = Keyring.generate()
+    key_file = tmp_path / 'secret.key'
+    keyring.save(str(key_file))
+    store = ColdStore(str(tmp_path / 'tiers'), keyring)
+    monkeypatch.setattr(app_module, 'cipher', keyring)
+    monkeypatch.setattr(app_module, 'cold_store', store)
+    monkeypatch.setattr(app_module, 'KEY_FILE', str(key_file))
+    app_module.load_store([old_note(1)])
+    app_module.snapshot_store()
+    with open(store.hot_path, 'rb') as f:
+        hot = f.read()
+
+    elsewhere = Keyring.load(str(key_file)) # Another process rotates the key file
+    elsewhere.add_key()
+    elsewhere.save(str(key_file))
+    app_module.load_store([old_note(2)])
+    with pytest.raises(RuntimeError, match="stale key"):
+        app_module.snapshot_store()
+    with open(store.hot_path, 'rb') as f:
+        assert f.read() == hot
+    assert len(store) == 1 and 'old-2' not in store
+    store.clear()
+
+
+def test_rekey_survives_a_merge_of_the_segment_it_is_rotating(tmp_path):
+    keyring = Keyring.generate()
+    store = ColdStore(str(tmp_path / 'tiers'), keyring)
+    for batch in range(2):
+        store.freeze([({"id": f"old-{batch}{i}"}, old_note(f"{batch}{i}"), []) for i in range(3)])
+    keyring.add_key()
+    rotate, merged = keyring.rotate, []
+
+    def rotate_during_merge(token):
+        if not merged: # The snapshot thread merges while the first segment is half rotated
+            merged.append(store.merge(max_segments=0))
+        return rotate(token)
+
+    keyring.rotate = rotate_during_merge
+    store.rekey()
+    keyring.retire()
+    assert merged == [True]
+
+    reopened = ColdStore(store.directory, Keyring(keyring.keys))
+    reopened.open()
+    assert sorted(reopened.read(*found)['id'] for found in reopened.entries()) == \
+        sorted(f"old-{b}{i}" for b in range(2) for i in range(3))
+    files = sorted(os.listdir(store.directory))
+    assert len(files) == 2 and files[0] == 'manifest.json' # The merged segment; the discarded copy is gone
+    store.clear()
@@ -0,0 +1,103 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from llm_client import CircuitBreaker, FakeProvider, LLMClient, LLMError, LLMUnavailable, TokenBucket
+
+
+class FlakyProvider:
+    name = "flaky"
+
+    def __init__(self, failures, error=ConnectionError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def generate(self, model, prompt, json_mode=False, timeout=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("provider down")
+        return SimpleNamespace(text="ok")
+
+    def is_transient(self, error):
+        return isinstance(error, ConnectionError)
+
+
+def test_retries_transient_errors_with_backoff():
+    provider = FlakyProvider(failures=2)
+    client = LLMClient(provider, rate_limit=0, max_retries=2, backoff=0)
+
+    assert client.generate("hi") == "ok"
+    assert provider.calls == 3
+
+
+def test_permanent_errors_are_not_retried():
+    provider = FlakyProvider(failures=5, error=ValueError)
+    client = LLMClient(provider, rate_limit=0, max_retries=3, backoff=0)
+
+    with pytest.raises(LLMError):
+        client.generate("hi")
+    assert provider.calls == 1
+
+
+def test_circuit_opens_then_half_opens():
+    provider = FlakyProvider(failures=3)
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+    client = LLMClient(provider, rate_limit=0, max_retries=0, breaker=breaker)
+
+    for _ in range(3):
+        with pytest.raises(LLMError):
+            client.generate("hi")
+    with pytest.raises(LLMUnavailable):
+        client.generate("hi")
+    assert provider.calls == 3
+
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert client.generate("hi") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_token_bucket_limits_bursts():
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    assert bucket.acquire(timeout=0) and bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0.1)
+
+
+def test_fake_provider_is_deterministic():
+    client = LLMClient(FakeProvider(), rate_limit=0)
+    prompt = "Current Note:\n    HR 120, chest pain. Plan: ECG.\n    Task:"
+
+    first = json.loads(client.generate(prompt, json_mode=True))
+    assert first == json.loads(client.generate(prompt, json_mode=True))
+    assert first['highlights'][0]['text'] == "HR 120, chest pain."
+
+
+class StreamingProvider(FlakyProvider):
+
+    def generate_stream(self, model, prompt, timeout=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("provider down")
+        for word in ("one ", "two ", "three"):
+            yield SimpleNamespace(text=word)
+
+
+def test_abandoned_half_open_stream_does_not_wedge_the_circuit():
+    provider = StreamingProvider(failures=1)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    client = LLMClient(provider, rate_limit=0, max_retries=0, breaker=breaker)
+    with pytest.raises(LLMError):
+        list(client.stream("hi"))
+
+    time.sleep(0.06)
+    stream = client.stream("hi") # The half-open trial
+    assert next(stream) == "one "
+    stream.close() # Consumer went away mid-stream
+    assert breaker.state == "open" # Counted as a failed trial, not left running
+
+    time.sleep(0.06)
+    assert "".join(client.stream("hi")) == "one two three"
+    assert breaker.state == "closed"
@@ -0,0 +1,38 @@
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def metrics_enabled():
+    metrics.configure(True)
+    yield
+    metrics.configure(False)
+
+
+def test_metrics_endpoint_is_opt_in(client):
+    assert client.get('/metrics').status_code == 404
+    assert client.post('/debug/profile?seconds=0').status_code == 404
+
+
+def test_route_and_phase_metrics(client, metrics_enabled):
+    before = metrics.PHASE_LATENCY.count('/api/timeline', 'rbac')
+    client.get('/api/timeline?role=staff')
+
+    assert metrics.PHASE_LATENCY.count('/api/timeline', 'rbac') == before + 1
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{route="/api/timeline",method="GET",status="200"}' in body
+    assert 'request_phase_duration_seconds_bucket{route="/api/timeline",phase="serialize",le="+Inf"}' in body
+    assert 'notes_stored 0' in body
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = metrics.Histogram('t_seconds', 'test', ('route',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        hist.observe(value, '/x')
+
+    lines = hist.render()
+    assert 't_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{route="/x",le="1.0"} 2' in lines
+    assert 't_seconds_bucket{route="/x",le="+Inf"} 3' in lines
+    assert 't_seconds_count{route="/x"} 3' in lines
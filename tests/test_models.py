@@ -0,0 +1,71 @@
+import json
+import os
+
+from cryptography.fernet import Fernet
+
+from enums import ActionStatus, NoteType, Role
+from models import MISSING, Action, Highlight, Note, pack_id, unpack_id
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend'))
+
+
+def test_synthetic_notes_round_trip_losslessly():
+    with open(os.path.join(BACKEND_DIR, 'secret.key'), 'rb') as kf:
+        cipher = Fernet(kf.read())
+    with open(os.path.join(BACKEND_DIR, 'note.json'), 'rb') as f:
+        raw_notes = json.loads(cipher.decrypt(f.read()))
+
+    for raw in raw_notes:
+        assert Note.from_dict(raw).to_dict() == raw
+
+
+def test_compact_field_encoding():
+    note = Note.from_dict({
+        "id": "6f1c2a1e-3b7d-4c55-9a0e-2a4f5c6d7e8f",
+        "content": "HR: 110",
+        "timestamp": "2024-03-01 09:30",
+        "provenance_pointer": None,
+        "conflicts": []
+    })
+
+    assert isinstance(note.id, bytes) and len(note.id) == 16
+    assert isinstance(note.timestamp, int)
+    assert note.provenance_pointer is None
+    assert note.version is MISSING
+    assert note.extra == {"conflicts": []}
+    assert unpack_id(note.id) == "6f1c2a1e-3b7d-4c55-9a0e-2a4f5c6d7e8f"
+
+
+def test_non_uuid_ids_and_timestamps_are_kept_as_given():
+    highlight = Highlight.from_dict({"id": "h1", "text": "x", "type": "vital", "start": 0, "end": 1})
+    action = Action.from_dict({"id": "a1", "title": "t", "created_at": "yesterday"})
+
+    assert pack_id("h1") == "h1"
+    assert highlight.to_dict()["id"] == "h1"
+    assert action.to_dict()["created_at"] == "yesterday"
+
+
+def test_snapshot_is_independent_of_live_note():
+    note = Note.from_dict({
+        "id": "n1", "content": "v1", "version": 1, "history": [],
+        "highlights": [{"id": "h1", "text": "v1", "type": "risk", "start": 0, "end": 2}],
+        "actions": [{"id": "a1", "title": "Review", "status": "pending"}]
+    })
+    note.history.append(note.snapshot())
+    note.actions[0].status = ActionStatus.RESOLVED
+
+    assert note.history[0].actions[0].status == ActionStatus.PENDING
+    assert note.history[0].history == []
+
+
+def test_enumerated_fields_are_stored_as_codes():
+    note = Note.from_dict({
+        "id": "n1", "author_role": "clinician", "type": "ai_internal_thought",
+        "visibility_scope": {"patient": False, "staff": True, "clinician": True, "admin": True}
+    })
+
+    assert note.author_role is Role.CLINICIAN
+    assert note.type == "ai_internal_thought" and not isinstance(note.type, NoteType)
+    assert note.visibility_scope == 0b1110
+    assert note.to_dict()["author_role"] == "clinician"
+    assert note.to_dict()["visibility_scope"] == {"patient": False, "staff": True, "clinician": True, "admin": True}
@@ -0,0 +1,50 @@
+import datetime
+import os
+import sys
+
+from envelope import ENVELOPE_PREFIX, Keyring
+from note_file import CHUNKED_HEADER, iter_notes
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import generate_synthetic_data as synthetic  # noqa: E402
+
+NOW = datetime.datetime(2026, 1, 15, 9, 0)
+
+
+def test_generator_is_reproducible_across_worker_counts(tmp_path):
+    serial, pooled = tmp_path / 'serial.nc', tmp_path / 'pooled.nc'
+    synthetic.generate_dataset(6, 20, seed=7, workers=1, chunk_notes=40, output_file=str(serial),
+                               now=NOW, encrypt=False)
+    synthetic.generate_dataset(6, 20, seed=7, workers=2, chunk_notes=40, output_file=str(pooled),
+                               now=NOW, encrypt=False)
+
+    assert serial.read_bytes() == pooled.read_bytes()
+    records = list(iter_notes(str(serial)))
+    assert len(records) == 6 * 20
+    assert len({r['patient_id'] for r in records}) == 6
+
+
+def test_encrypted_chunks_stream_back(tmp_path):
+    key_file, output = tmp_path / 'secret.key', tmp_path / 'notes.nc'
+    total = synthetic.generate_dataset(3, 15, seed=1, workers=1, chunk_notes=15, output_file=str(output),
+                                       key_file=str(key_file), now=NOW)
+
+    with open(output, 'rb') as f:
+        assert f.readline() == CHUNKED_HEADER
+        chunks = f.read().splitlines()
+    assert len(chunks) == 3 # one chunk per patient
+    assert all(chunk.startswith(ENVELOPE_PREFIX) for chunk in chunks)
+    records = list(iter_notes(str(output), Keyring.load(str(key_file))))
+    assert len(records) == total == 45
+
+
+def test_patient_notes_have_histories_and_follow_ups():
+    records = synthetic.build_patient(0, 60, seed=3, now=NOW)
+
+    timestamps = [r['timestamp'] for r in records]
+    assert timestamps == sorted(timestamps, reverse=True)
+    assert any(r['history'] for r in records)
+    assert any(r['type'] == 'system_log' and 'Action Resolved' in r['content'] for r in records)
+    for r in records:
+        for h in r['highlights']:
+            assert r['content'][h['start']:h['end']] == h['text']
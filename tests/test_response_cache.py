@@ -0,0 +1,57 @@
+import app as app_module
+from enums import Role
+from response_cache import ResponseCache
+
+
+def create(client, content, role):
+    return client.post('/api/notes', json={"content": content, "author_role": role,
+                                           "type": f"{role}_note"}).get_json()['id']
+
+
+def test_repeat_reads_are_served_from_cache(client, monkeypatch):
+    create(client, "Ward round done.", "staff")
+    first = client.get('/api/timeline?role=staff').get_data()
+
+    def rebuild(user_role):
+        raise AssertionError("timeline rebuilt")
+    monkeypatch.setattr(app_module, 'build_timeline', rebuild)
+    assert client.get('/api/timeline?role=staff').get_data() == first
+
+
+def test_writes_invalidate_only_roles_that_can_see_them(client):
+    note_id = create(client, "Private assessment.", "clinician")
+    create(client, "Obs taken.", "staff")
+    for role in ("staff", "clinician"):
+        client.get(f'/api/timeline?role={role}')
+        client.get(f'/api/glance?role={role}')
+
+    client.put(f'/api/notes/{note_id}', json={"content": "Private assessment, revised.", "role": "clinician"})
+
+    cache = app_module.response_cache
+    assert cache.get('timeline', Role.STAFF) is not None and cache.get('glance', Role.STAFF) is not None
+    assert cache.get('timeline', Role.CLINICIAN) is None
+    timeline = client.get('/api/timeline?role=clinician').get_json()
+    assert "Private assessment, revised." in [n['content'] for n in timeline]
+
+
+def test_highlight_feedback_drops_every_glance(client):
+    note_id = create(client, "Complains of back pain.", "clinician")
+    client.get('/api/glance?role=staff')
+    client.get('/api/timeline?role=staff')
+
+    client.post(f'/api/notes/{note_id}/highlight', json={"text": "back pain", "start": 13, "end": 22})
+
+    assert app_module.response_cache.get('glance', Role.STAFF) is None
+    assert app_module.response_cache.get('timeline', Role.STAFF) is not None
+
+
+def test_bodies_built_before_a_write_are_not_stored():
+    cache = ResponseCache()
+    generation = cache.generation('timeline', Role.STAFF)
+    cache.invalidate([Role.STAFF])
+    cache.put('timeline', Role.STAFF, b'[]', generation)
+    assert cache.get('timeline', Role.STAFF) is None
+
+    cache.put('timeline', Role.STAFF, b'[]', cache.generation('timeline', Role.STAFF))
+    assert cache.get('timeline', Role.STAFF) == b'[]'
+    assert cache.get('timeline', Role.STAFF, max_age=-1) is None
@@ -0,0 +1,73 @@
+from search_index import tokenize
+
+
+def test_tokenizer_keeps_clinical_tokens():
+    tokens = [t for t, _, _ in tokenize("HR: 110 (Tachycardic) SpO2: 92% BP: 130/85 Solu-Medrol 125mg")]
+
+    assert "hr" in tokens and "110" in tokens
+    assert "spo2" in tokens
+    assert "92%" in tokens and "92" in tokens
+    assert "130/85" in tokens
+    assert "125mg" in tokens and "125" in tokens and "mg" in tokens
+
+
+def test_search_returns_snippet_offsets(client):
+    resp = client.post('/api/notes', json={
+        "content": "Triage: HR: 110 (Tachycardic), SpO2: 92% on room air.",
+        "author_role": "staff",
+        "type": "staff_note"
+    })
+    note_id = resp.get_json()['id']
+
+    resp = client.get('/api/search?q=spo2&role=staff')
+    results = resp.get_json()['results']
+
+    assert len(results) == 1
+    result = results[0]
+    assert result['note_id'] == note_id
+    match = result['matches'][0]
+    content = "Triage: HR: 110 (Tachycardic), SpO2: 92% on room air."
+    assert content[match['start']:match['end']] == "SpO2"
+    assert result['snippet'] == content[result['snippet_start']:result['snippet_start'] + len(result['snippet'])]
+
+
+def test_search_respects_rbac(client):
+    client.post('/api/notes', json={
+        "content": "Plan: Morphine 5mg IV",
+        "author_role": "clinician",
+        "type": "clinician_note"
+    })
+
+    assert len(client.get('/api/search?q=morphine&role=clinician').get_json()['results']) == 1
+    assert client.get('/api/search?q=morphine&role=staff').get_json()['results'] == []
+    assert client.get('/api/search?q=morphine&role=patient').get_json()['results'] == []
+
+
+def test_search_ranks_highlighted_matches_higher(client):
+    plain = client.post('/api/notes', json={
+        "content": "Patient reports wheeze overnight.",
+        "author_role": "staff",
+        "type": "staff_note"
+    }).get_json()
+    highlighted = client.post('/api/notes', json={
+        "content": "Patient reports wheeze this morning.",
+        "author_role": "staff",
+        "type": "staff_note"
+    }).get_json()
+    client.post(f"/api/notes/{highlighted['id']}/highlight", json={"text": "wheeze", "start": 16, "end": 22})
+
+    results = client.get('/api/search?q=wheeze&role=staff').get_json()['results']
+
+    assert [r['note_id'] for r in results] == [highlighted['id'], plain['id']]
+
+
+def test_search_index_follows_edits(client):
+    note_id = client.post('/api/notes', json={
+        "content": "Albuterol nebulizer given",
+        "author_role": "clinician",
+        "type": "clinician_note"
+    }).get_json()['id']
+    client.put(f'/api/notes/{note_id}', json={"content": "Ipratropium nebulizer given", "role": "clinician"})
+
+    assert client.get('/api/search?q=albuterol').get_json()['results'] == []
+    assert len(client.get('/api/search?q=ipratropium').get_json()['results']) == 1
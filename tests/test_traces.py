@@ -0,0 +1,53 @@
+import os
+import sys
+
+import app as app_module
+from trace_recorder import TraceRecorder, read_trace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmarks')))
+from replay import in_process_sender, replay  # noqa: E402
+
+PHI = ["John Doe", "12345678", "555-1234-5678", "wheezing", "nebulizer"]
+
+
+def record_clinic_traffic(client, path, monkeypatch):
+    recorder = TraceRecorder(str(path), app_module.redact_phi)
+    monkeypatch.setattr(app_module, 'trace_recorder', recorder)
+    content = "John Doe (MRN 12345678, call 555-1234-5678) has wheezing; nebulizer started."
+    note = client.post('/api/notes', json={"content": content, "author_role": "clinician",
+                                           "type": "clinician_note"}).get_json()
+    client.put(f"/api/notes/{note['id']}", json={"content": content + " Improving.", "role": "clinician"})
+    client.post(f"/api/notes/{note['id']}/highlight", json={"text": "wheezing", "start": 0, "end": 8,
+                                                            "role": "clinician"})
+    client.get('/api/search?q=John Doe 12345678&role=clinician')
+    client.get('/api/timeline?role=clinician')
+    client.get('/api/glance?role=staff')
+    recorder.close()
+    monkeypatch.setattr(app_module, 'trace_recorder', None)
+    return note
+
+
+def test_traces_are_anonymized(client, tmp_path, monkeypatch):
+    trace_file = tmp_path / 'trace.jsonl'
+    note = record_clinic_traffic(client, trace_file, monkeypatch)
+
+    text = trace_file.read_text()
+    assert not [phrase for phrase in PHI if phrase in text]
+    assert note['id'] not in text
+    entries = read_trace(str(trace_file))
+    assert [e['r'] for e in entries] == ['/api/notes', '/api/notes/<note_id>', '/api/notes/<note_id>/highlight',
+                                         '/api/search', '/api/timeline', '/api/glance']
+    assert entries[0]['b'] == {"author_role": "clinician", "type": "clinician_note"}
+    assert entries[0]['n'] == {"content": len(note['content'])}
+    assert entries[3]['q']['q'] == "<REDACTED_NAME> <REDACTED_ID>"
+
+
+def test_replay_reissues_the_trace(client, tmp_path, monkeypatch):
+    trace_file = tmp_path / 'trace.jsonl'
+    record_clinic_traffic(client, trace_file, monkeypatch)
+    entries = read_trace(str(trace_file))
+
+    report = replay(entries, in_process_sender(app_module.app), speed=100, workers=4)
+    assert report['requests'] == len(entries) and report['errors'] == 0
+    assert sum(r['requests'] for r in report['routes']) == len(entries)
+    assert {r['route'] for r in report['routes']} == {f"{e['m']} {e['r']}" for e in entries}
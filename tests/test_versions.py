@@ -0,0 +1,61 @@
+import json
+
+
+def create_and_edit(client, *contents):
+    note_id = client.post('/api/notes', json={"content": contents[0], "author_role": "clinician",
+                                              "type": "clinician_note"}).get_json()['id']
+    for content in contents[1:]:
+        client.put(f'/api/notes/{note_id}', json={"content": content, "role": "clinician"})
+    return note_id
+
+
+def test_timeline_carries_history_stubs_only(client):
+    note_id = create_and_edit(client, "v1", "v2", "v3")
+
+    note = [n for n in client.get('/api/timeline?role=clinician').get_json() if n['id'] == note_id][0]
+    assert [v['version'] for v in note['history']] == [1, 2]
+    assert all('content' not in v and 'highlights' not in v for v in note['history'])
+
+    history = client.get(f'/api/notes/{note_id}/history?role=clinician').get_json()
+    assert [v['content'] for v in history] == ["v1", "v2"]
+
+
+def test_timeline_payload_grows_by_one_small_stub_per_edit(client):
+    long_content = "Plan: " + "physio and recheck bloods " * 40
+    note_id = create_and_edit(client, long_content, long_content + "1")
+
+    def payload():
+        note = [n for n in client.get('/api/timeline?role=clinician').get_json() if n['id'] == note_id][0]
+        return len(json.dumps(note)), len(note['history'])
+
+    size, count = payload()
+    for i in range(2, 12):
+        client.put(f'/api/notes/{note_id}', json={"content": long_content + str(i % 10), "role": "clinician"})
+    grown, grown_count = payload()
+    assert grown_count == count + 10
+    assert grown - size < 10 * 100 < len(long_content) # Stubs, never copies of the content
+
+
+def test_version_reads_and_diff(client):
+    note_id = create_and_edit(client, "BP 120/80, stable.", "BP 150/95, stable.")
+
+    assert client.get(f'/api/notes/{note_id}/versions/1').get_json()['content'] == "BP 120/80, stable."
+    assert client.get(f'/api/notes/{note_id}/versions/2').get_json()['content'] == "BP 150/95, stable."
+    assert client.get(f'/api/notes/{note_id}/versions/9').status_code == 404
+
+    diff = client.get(f'/api/notes/{note_id}/diff').get_json()
+    assert diff == {"from": 1, "to": 2, "start": 4, "removed": "20/80", "inserted": "50/95"}
+
+
+def test_revert_reads_the_version_store(client):
+    note_id = create_and_edit(client, "Original plan.", "Bad edit.")
+
+    reverted = client.post(f'/api/notes/{note_id}/revert', json={"role": "clinician"}).get_json()
+    assert reverted['content'] == "Original plan."
+    assert [v['content'] for v in reverted['history']] == ["Original plan.", "Bad edit."]
+
+
+def test_version_endpoints_respect_visibility(client):
+    note_id = create_and_edit(client, "Clinician only.", "Clinician only, edited.")
+    assert client.get(f'/api/notes/{note_id}/history?role=patient').status_code == 404
+    assert client.get(f'/api/notes/{note_id}/versions/1?role=patient').status_code == 404